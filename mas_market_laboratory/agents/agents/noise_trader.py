@@ -65,7 +65,7 @@ class NoiseTrader(Agent):
         assert view.economy_insight_view is None
         
         cash = self.account_view.cash
-        shares = self.account_view.shares
+        shares = self.account_view.shares[0]
         
         if self.rng.random() > self.p_trade:
             return []
@@ -0,0 +1,97 @@
+from __future__ import annotations
+from typing import Callable, List
+import time
+import sys
+
+from environment import Environment
+from environment.models.order import OrderType, Side
+
+from .benchmark_utils import INITIALIZE_BENCHMARK_CONFIGS, REPORT
+
+
+RESTING_ORDERS = 2000
+ROUNDS = 5
+
+
+
+def create_environment() -> Environment:
+    environment = Environment()
+    assert environment.register_agent(0, 1e9, 0) is not None #Quoting agent (bids)
+    assert environment.register_agent(1, 0.0, 10 ** 6) is not None #Far away asks, nothing crosses
+
+    for i in range(100):
+        assert environment.create_order(1, OrderType.LIMIT, Side.SELL, 100, 200.0 + i / 100) is not None
+
+    return environment
+
+
+def run_case(name:str, update_quote:Callable[[Environment, int, int], int]) -> None:
+    #update_quote(environment, order_id, round) -> order id of the updated quote
+    samples:List[float] = []
+    for _ in range(ROUNDS):
+        environment = create_environment()
+
+        order_ids = []
+        for i in range(RESTING_ORDERS):
+            order_view = environment.create_order(0, OrderType.LIMIT, Side.BUY, 50, 90.0 + (i % 100) / 100)
+            assert order_view is not None
+            order_ids.append(order_view.order_id)
+
+        start = time.perf_counter()
+        for round_index in range(1, 11):
+            order_ids = [update_quote(environment, order_id, round_index) for order_id in order_ids]
+        samples.append((time.perf_counter() - start) / (10 * RESTING_ORDERS))
+
+        environment.close()
+
+    REPORT(name, samples)
+
+
+def cancel_and_create_reduce(environment:Environment, order_id:int, round_index:int) -> int:
+    order = environment.storage_ledger.get_order(order_id)
+    assert order is not None and order.price is not None
+    environment.cancel_order(0, order_id)
+    order_view = environment.create_order(0, OrderType.LIMIT, Side.BUY, 50 - round_index, order.price / 10000)
+    assert order_view is not None
+    return order_view.order_id
+
+
+def amend_reduce(environment:Environment, order_id:int, round_index:int) -> int:
+    order = environment.storage_ledger.get_order(order_id)
+    assert order is not None and order.price is not None
+    assert environment.amend_order(0, order_id, 50 - round_index, order.price / 10000) is not None
+    return order_id
+
+
+def cancel_and_create_reprice(environment:Environment, order_id:int, round_index:int) -> int:
+    environment.cancel_order(0, order_id)
+    order_view = environment.create_order(0, OrderType.LIMIT, Side.BUY, 50, 90.0 + (order_id + round_index) % 100 / 100)
+    assert order_view is not None
+    return order_view.order_id
+
+
+def amend_reprice(environment:Environment, order_id:int, round_index:int) -> int:
+    assert environment.amend_order(0, order_id, 50, 90.0 + (order_id + round_index) % 100 / 100) is not None
+    return order_id
+
+    
+def main() -> None:
+    config_json_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+    INITIALIZE_BENCHMARK_CONFIGS(
+        config_json_path,
+        {
+            "db_path": ":memory:",
+            "storage_profile": "memory",
+            "trade_tape_path": None,
+            "order_flow_journal_path": None
+        }
+    )
+
+    run_case("cancel + create (reduce)", cancel_and_create_reduce)
+    run_case("amend (reduce)", amend_reduce)
+    run_case("cancel + create (reprice)", cancel_and_create_reprice)
+    run_case("amend (reprice)", amend_reprice)
+
+        
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+from typing import List, Tuple
+import random
+import time
+import sys
+
+from environment import Environment
+from environment.configs.models import MatchingMode
+from environment.models.order import OrderType, Side
+
+from simulation.configs import get_simulation_realtime_data
+
+from .benchmark_utils import INITIALIZE_BENCHMARK_CONFIGS, REPORT
+
+
+AGENTS = 2000
+MICRO_TICKS = 20
+SEED = 7
+
+
+
+def create_flow() -> List[List[Tuple[int, Side, int, float]]]:
+    #Every agent sends one limit order per micro tick around the same price, half of them cross
+    rng = random.Random(SEED)
+
+    return [
+        [(agent_id, rng.choice((Side.BUY, Side.SELL)), rng.randint(1, 10), round(rng.uniform(99.0, 101.0), 2)) for agent_id in range(AGENTS)]
+        for _ in range(MICRO_TICKS)
+    ]
+
+
+def run_mode(config_json_path:str, matching_mode:MatchingMode, flow:List[List[Tuple[int, Side, int, float]]]) -> None:
+    INITIALIZE_BENCHMARK_CONFIGS(
+        config_json_path,
+        {
+            "db_path": ":memory:",
+            "storage_profile": "memory",
+            "trade_tape_path": None,
+            "order_flow_journal_path": None,
+            "book_event_feed": False,
+            "matching_mode": matching_mode.name.lower()
+        }
+    )
+    SIM_REALTIME_DATA = get_simulation_realtime_data()
+
+    environment = Environment()
+    for agent_id in range(AGENTS):
+        assert environment.register_agent(agent_id, 1e6, 10 ** 4) is not None
+
+    samples:List[float] = []
+    trade_count = 0
+    for micro_tick_orders in flow:
+        start = time.perf_counter()
+        for agent_id, side, quantity, price in micro_tick_orders:
+            environment.create_order(agent_id, OrderType.LIMIT, side, quantity, price)
+
+        SIM_REALTIME_DATA.step_hybrid_time()
+        trade_count += environment.get_market_data().trade_count #Batch mode uncrosses here
+        samples.append(time.perf_counter() - start)
+
+    environment.close()
+
+    REPORT(f"{matching_mode.name.lower()} ({trade_count} trades)", samples)
+
+
+def main() -> None:
+    config_json_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+    flow = create_flow()
+
+    for matching_mode in MatchingMode:
+        run_mode(config_json_path, matching_mode, flow)
+
+
+if __name__ == "__main__":
+    main()
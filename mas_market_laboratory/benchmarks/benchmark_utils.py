@@ -0,0 +1,35 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+import statistics
+import json
+
+from simulation.core import SimulationInitializer
+
+
+
+def INITIALIZE_BENCHMARK_CONFIGS(config_json_path:str, environment_overrides:Dict[str, Any]) -> None:
+    with open(config_json_path) as json_file:
+        config:Dict[str, Dict[str, Any]] = json.load(json_file)
+
+    environment_config = config.get("environment_config")
+    assert environment_config is not None
+    environment_config.update(environment_overrides)
+    SimulationInitializer.INITIALIZE_ENVIRONMENT(environment_config)
+
+    simulation_config = config.get("simulation_config")
+    assert simulation_config is not None
+    SimulationInitializer.INITIALIZE_SIMULATION(simulation_config)
+
+    SimulationInitializer.INITIALIZE_REALTIME_DATA()
+
+
+def REPORT(name:str, samples:List[float]) -> None:
+    samples_ms = [sample * 1000 for sample in samples]
+
+    print(
+        f"{name:<32}"
+        f" n={len(samples_ms):<6}"
+        f" mean={statistics.mean(samples_ms):10.3f}ms"
+        f" median={statistics.median(samples_ms):10.3f}ms"
+        f" max={max(samples_ms):10.3f}ms"
+    )
@@ -0,0 +1,97 @@
+from __future__ import annotations
+from typing import Callable, List
+import time
+import sys
+
+from environment import Environment
+from environment.core import SettlementLedger
+
+from simulation.configs import get_simulation_realtime_data
+from simulation.core import SimulationInitializer
+
+from .benchmark_utils import INITIALIZE_BENCHMARK_CONFIGS, REPORT
+
+
+AGENTS = 1000
+DEPOSITS_PER_AGENT = 100 #All with the same term -> one 100k deposit maturity bucket
+TERM = 3
+ROUNDS = 3
+
+
+
+def create_environment() -> Environment:
+    SimulationInitializer.INITIALIZE_REALTIME_DATA()
+    SIM_REALTIME_DATA = get_simulation_realtime_data()
+
+    environment = Environment()
+    SIM_REALTIME_DATA.set_economy_insight(environment.get_economy_insight())
+
+    for agent_id in range(AGENTS):
+        assert environment.register_agent(agent_id, 1e6, 0) is not None
+
+    for agent_id in range(AGENTS):
+        for _ in range(DEPOSITS_PER_AGENT):
+            assert environment.create_deposit(agent_id, TERM, 10.0) is not None
+
+    while SIM_REALTIME_DATA.MACRO_TICK < TERM:
+        assert SIM_REALTIME_DATA.step_hybrid_time()
+
+    return environment
+
+
+def per_deposit_release(settlement_ledger:SettlementLedger) -> None:
+    #The release path check_matured_deposits used before the bucket settlement, one account update per deposit
+    #(the Deposits are still in the unflushed StorageLedger)
+    for deposit in settlement_ledger.storage_ledger.deposits.values():
+        account = settlement_ledger.accounts[deposit.agent_id]
+        assert deposit.deposit_id in account.deposited_cash
+        assert deposit.deposited_cash == account.deposited_cash[deposit.deposit_id]
+
+        del account.deposited_cash[deposit.deposit_id]
+        account.cash += deposit.matured_cash
+        account.version += 1
+
+    settlement_ledger.deposit_buckets[TERM] = {}
+
+
+def bucket_release(settlement_ledger:SettlementLedger) -> None:
+    settlement_ledger.check_matured_deposits()
+
+
+def run_case(name:str, release:Callable[[SettlementLedger], None]) -> None:
+    samples:List[float] = []
+    for _ in range(ROUNDS):
+        environment = create_environment()
+        settlement_ledger = environment.settlement_ledger
+        assert sum(len(maturing_deposits.deposit_ids) for maturing_deposits in settlement_ledger.deposit_buckets[TERM].values()) == AGENTS * DEPOSITS_PER_AGENT
+
+        start = time.perf_counter()
+        release(settlement_ledger)
+        samples.append(time.perf_counter() - start)
+
+        assert not settlement_ledger.deposit_buckets[TERM]
+        assert all(not account.deposited_cash for account in settlement_ledger.accounts.values())
+
+        environment.close()
+
+    REPORT(name, samples)
+
+
+def main() -> None:
+    config_json_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+    INITIALIZE_BENCHMARK_CONFIGS(
+        config_json_path,
+        {
+            "db_path": ":memory:",
+            "storage_profile": "memory",
+            "trade_tape_path": None,
+            "order_flow_journal_path": None
+        }
+    )
+
+    run_case("per deposit release", per_deposit_release)
+    run_case("bucket check_matured_deposits", bucket_release)
+
+
+if __name__ == "__main__":
+    main()
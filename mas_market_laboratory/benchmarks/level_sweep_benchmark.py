@@ -0,0 +1,72 @@
+from __future__ import annotations
+from typing import List
+import time
+import sys
+
+from environment import Environment
+from environment.models.order import OrderLifecycle, OrderType, Side
+
+from .benchmark_utils import INITIALIZE_BENCHMARK_CONFIGS, REPORT
+
+
+MAKERS = 200 #Agents quoting, one order per level each
+LEVELS = 20
+ROUNDS = 5
+
+
+
+def create_environment(level_sweep:bool) -> Environment:
+    #Asks from 100.00 up in 0.01 steps, MAKERS orders of 5 per level, agent MAKERS takes them
+    environment = Environment()
+    for cda_engine in environment.cda_engines:
+        cda_engine.level_sweep = level_sweep
+
+    for agent_id in range(MAKERS):
+        assert environment.register_agent(agent_id, 0.0, 10 ** 6) is not None
+    assert environment.register_agent(MAKERS, 1e9, 0) is not None
+
+    for level in range(LEVELS):
+        for agent_id in range(MAKERS):
+            assert environment.create_order(agent_id, OrderType.LIMIT, Side.SELL, 5, 100.0 + level / 100) is not None
+
+    return environment
+
+
+def run_case(name:str, order_type:OrderType, level_sweep:bool) -> None:
+    samples:List[float] = []
+    trade_count = 0
+    for _ in range(ROUNDS):
+        environment = create_environment(level_sweep)
+        price = 100.0 + LEVELS / 100 if order_type != OrderType.MARKET else None
+
+        start = time.perf_counter()
+        order_view = environment.create_order(MAKERS, order_type, Side.BUY, LEVELS * MAKERS * 5, price)
+        samples.append(time.perf_counter() - start)
+
+        assert order_view is not None and order_view.lifecycle == OrderLifecycle.DONE
+        trade_count = len(order_view.trades)
+
+        environment.close()
+
+    REPORT(f"{name} ({trade_count} trades)", samples)
+
+
+def main() -> None:
+    config_json_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+    INITIALIZE_BENCHMARK_CONFIGS(
+        config_json_path,
+        {
+            "db_path": ":memory:",
+            "storage_profile": "memory",
+            "trade_tape_path": None,
+            "order_flow_journal_path": None
+        }
+    )
+
+    for order_type in (OrderType.LIMIT, OrderType.MARKET):
+        run_case(f"{order_type.name.lower()} maker by maker", order_type, False)
+        run_case(f"{order_type.name.lower()} level sweep", order_type, True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+from typing import Callable, List
+import time
+import sys
+
+from environment import Environment
+from environment.core import CDAEngine
+from environment.models.order import OrderType, Side, OrderLifecycle, OrderEndReasons
+
+from .benchmark_utils import INITIALIZE_BENCHMARK_CONFIGS, REPORT
+
+
+AGENTS = 1000
+ORDERS_PER_AGENT = 100 #Half bids, half asks -> a 100k order book
+ROUNDS = 3
+
+
+
+def create_environment() -> Environment:
+    #Bids below 100, asks above, nothing crosses
+    environment = Environment()
+    for agent_id in range(AGENTS):
+        assert environment.register_agent(agent_id, 1e7, 10 ** 6) is not None
+
+    for agent_id in range(AGENTS):
+        for i in range(ORDERS_PER_AGENT // 2):
+            assert environment.create_order(agent_id, OrderType.LIMIT, Side.BUY, 10, 90.0 + (agent_id + i) % 100 / 10) is not None
+            assert environment.create_order(agent_id, OrderType.LIMIT, Side.SELL, 10, 100.1 + (agent_id + i) % 100 / 10) is not None
+
+    return environment
+
+
+def per_order_expiry(cda_engine:CDAEngine) -> None:
+    #The release path expire_session used before the bulk path, one ledger call per order
+    book = cda_engine.order_book.expire_book()
+    assert book is not None
+
+    bids, asks = book
+    for bid in bids:
+        cda_engine.settlement_ledger.release_cash(bid)
+        bid.lifecycle = OrderLifecycle.DONE
+        bid.end_reason = OrderEndReasons.EXPIRED
+
+    for ask in asks:
+        cda_engine.settlement_ledger.release_shares(ask)
+        ask.lifecycle = OrderLifecycle.DONE
+        ask.end_reason = OrderEndReasons.EXPIRED
+
+
+def bulk_expiry(cda_engine:CDAEngine) -> None:
+    cda_engine.expire_session()
+
+
+def run_case(name:str, expire:Callable[[CDAEngine], None]) -> None:
+    samples:List[float] = []
+    for _ in range(ROUNDS):
+        environment = create_environment()
+        cda_engine = environment.cda_engines[0]
+        assert len(cda_engine.order_book.order_map) == AGENTS * ORDERS_PER_AGENT
+
+        #Held across the expiry, they must follow the emptied book
+        bid_depth_view = environment.get_bid_depth()
+        ask_depth_view = environment.get_ask_depth()
+        assert bid_depth_view.total_quantity > 0 and ask_depth_view.total_quantity > 0
+
+        start = time.perf_counter()
+        expire(cda_engine)
+        samples.append(time.perf_counter() - start)
+
+        assert not cda_engine.order_book.order_map
+        assert bid_depth_view.total_quantity == 0 and bid_depth_view.depth_up_to(0.01) == 0
+        assert ask_depth_view.total_quantity == 0 and ask_depth_view.depth_up_to(1000.0) == 0
+        assert all(not account.reserved_cash and not account.reserved_shares for account in environment.settlement_ledger.accounts.values())
+
+        environment.close()
+
+    REPORT(name, samples)
+
+
+def main() -> None:
+    config_json_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+    INITIALIZE_BENCHMARK_CONFIGS(
+        config_json_path,
+        {
+            "db_path": ":memory:",
+            "storage_profile": "memory",
+            "trade_tape_path": None,
+            "order_flow_journal_path": None,
+            "book_event_feed": False
+        }
+    )
+
+    run_case("per order release", per_order_expiry)
+    run_case("bulk expire_session", bulk_expiry)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from typing import List
+import tempfile
+import time
+import sys
+import os
+
+from environment.configs.models import StorageProfile
+from environment.core import StorageLedger
+from environment.models import MarketData, Order, Trade
+from environment.models.order import OrderType, Side, OrderLifecycle, OrderEndReasons
+
+from simulation.configs import get_simulation_realtime_data
+
+from .benchmark_utils import INITIALIZE_BENCHMARK_CONFIGS, REPORT
+
+
+MACRO_TICKS = 10
+ORDERS_PER_MACRO_TICK = 20000
+TRADES_PER_MACRO_TICK = 10000
+
+
+
+def fill_macro_tick(storage_ledger:StorageLedger, next_id:int) -> int:
+    SIM_REALTIME_DATA = get_simulation_realtime_data()
+
+    for i in range(ORDERS_PER_MACRO_TICK):
+        order = Order(
+            order_id=next_id + i,
+            agent_id=i % 100,
+            timestamp=time.time(),
+            macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+            micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+            order_type=OrderType.LIMIT,
+            side=Side.BUY if i % 2 else Side.SELL,
+            quantity=10,
+            price=1000000 + i % 100,
+            lifecycle=OrderLifecycle.DONE,
+            end_reason=OrderEndReasons.FILLED
+        )
+        assert storage_ledger.add_order(order)
+
+    for i in range(TRADES_PER_MACRO_TICK):
+        trade = Trade(
+            trade_id=next_id + i,
+            timestamp=time.time(),
+            macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+            micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+            seller_agent_id=i % 100,
+            sell_order_id=next_id + 2 * i,
+            buyer_agent_id=(i + 1) % 100,
+            buy_order_id=next_id + 2 * i + 1,
+            price=1000000 + i % 100,
+            quantity=10,
+            fee=1000
+        )
+        assert storage_ledger.add_trade(trade)
+
+    assert storage_ledger.add_market_data(
+        MarketData(
+            timestamp=time.time(),
+            macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+            micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+            symbol=0,
+            book_sequence=0,
+            trade_count=TRADES_PER_MACRO_TICK,
+            trade_volume=10 * TRADES_PER_MACRO_TICK,
+            last_traded_price=1000000,
+            last_trade_size=10,
+            L1_bids=(999900, 10, 1),
+            L1_asks=(1000100, 10, 1),
+            spread=200,
+            mid_price=1000000,
+            micro_price=1000000,
+            L2_bids=((999900, 10, 1),),
+            L2_asks=((1000100, 10, 1),),
+            N=10,
+            bids_depth_N=10,
+            asks_depth_N=10,
+            imbalance_N=0.0,
+            vwap_macro=1000000,
+            vwap_micro=1000000,
+            indicative_clearing_price=None
+        )
+    )
+
+    return next_id + ORDERS_PER_MACRO_TICK
+
+
+def run_profile(config_json_path:str, directory:str, storage_profile:StorageProfile) -> None:
+    INITIALIZE_BENCHMARK_CONFIGS(
+        config_json_path,
+        {
+            "db_path": os.path.join(directory, f"{storage_profile.name.lower()}.db"),
+            "storage_profile": storage_profile.name.lower(),
+            "trade_tape_path": None,
+            "order_flow_journal_path": None
+        }
+    )
+    SIM_REALTIME_DATA = get_simulation_realtime_data()
+    storage_ledger = StorageLedger()
+
+    flush_latencies:List[float] = []
+    next_id = 0
+    for _ in range(MACRO_TICKS):
+        next_id = fill_macro_tick(storage_ledger, next_id)
+
+        start = time.perf_counter()
+        assert storage_ledger.flush()
+        flush_latencies.append(time.perf_counter() - start)
+
+        macro_tick = SIM_REALTIME_DATA.MACRO_TICK
+        while SIM_REALTIME_DATA.MACRO_TICK == macro_tick:
+            SIM_REALTIME_DATA.step_hybrid_time()
+
+    start = time.perf_counter()
+    storage_ledger.close()
+    close_latency = time.perf_counter() - start
+
+    REPORT(f"{storage_profile.name.lower()} flush", flush_latencies)
+    REPORT(f"{storage_profile.name.lower()} close", [close_latency])
+
+    
+def main() -> None:
+    config_json_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+
+    with tempfile.TemporaryDirectory() as directory:
+        for storage_profile in StorageProfile:
+            run_profile(config_json_path, directory, storage_profile)
+
+        
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,36 @@
 from __future__ import annotations
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Optional, Tuple
 
-from .models import EconomyScenario
+from .models import EconomyScenario, MatchingMode, StorageProfile
 
 
 
 class EnvironmentConfiguration(BaseSettings):
+    SYMBOLS:Tuple[str, ...] #Symbol id = index, 0 is the primary symbol
     PRICE_SCALE:int
     DB_PATH:str
+    STORAGE_PROFILE:StorageProfile
+    TRADE_TAPE_PATH:Optional[str]
+    ORDER_FLOW_JOURNAL_PATH:Optional[str]
     
     INSIGHT_L2_DEPTH:int
+    BOOK_EVENT_FEED:bool
+    DEPTH_INDEX_BUCKET_WIDTH:int #Scaled price units
+    DEPTH_INDEX_MAX_PRICE:int #Scaled price units, higher prices share the last bucket
+    MARKET_DATA_STORE_ON_CHANGE:bool #Skip market_data rows identical to the previous one apart from the tick
+    MATCHING_MODE:MatchingMode
+    OPENING_AUCTION:bool #Micro tick 0 collects orders, uncrossed with the market data of micro tick 1
+    CLOSING_AUCTION:bool #The last micro tick collects orders, uncrossed by expire_session before the book expires
+    MESSAGE_RATE_LIMIT:Optional[int] #Gateway messages per agent per micro tick, None -> not throttled
+    MESSAGE_BURST_LIMIT:Optional[int] #Token bucket capacity, None -> MESSAGE_RATE_LIMIT
+    OPEN_ORDER_LIMIT:Optional[int] #Resting + pending stop orders per agent across symbols, None -> unlimited
+    PRE_TRADE_FUNDS_CHECK:bool #Orders the account cannot fund are rejected at the gateway (counted, no Order is created)
+    MAX_ORDER_QUANTITY:Optional[int] #None -> unlimited
+    MAX_ORDER_NOTIONAL:Optional[int] #Scaled price units, None -> unlimited
+    PRICE_COLLAR_PPM:Optional[int] #Max limit price distance from the last trade price, Parts Per Million, None -> no collar
+    NETTED_SETTLEMENT:bool #Trade credits (cash received, shares bought) are applied once per account at the end of the micro tick
+    AUDIT_INTERVAL:Optional[int] #Micro ticks between conservation audits, None -> no periodic audit
     ECONOMY_SCENARIO:EconomyScenario
 
     FEE_RATE_PPM:int #Parts Per Million
@@ -1,5 +1,7 @@
 from .economy_scenario import EconomyScenario
+from .matching_mode import MatchingMode
+from .storage_profile import StorageProfile
 
 
 
-__all__ = ["EconomyScenario"]
+__all__ = ["EconomyScenario", "MatchingMode", "StorageProfile"]
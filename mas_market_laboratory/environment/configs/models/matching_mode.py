@@ -0,0 +1,8 @@
+from __future__ import annotations
+from enum import Enum, auto
+
+
+
+class MatchingMode(Enum):
+    CONTINUOUS = auto() #Every order is matched on arrival (CDA)
+    BATCH_AUCTION = auto() #Orders are collected during the micro tick and uncrossed at one price with the next market data
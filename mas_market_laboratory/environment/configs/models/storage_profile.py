@@ -0,0 +1,9 @@
+from __future__ import annotations
+from enum import Enum, auto
+
+
+
+class StorageProfile(Enum):
+    DURABLE = auto() #On disk, WAL journal, synchronous=NORMAL
+    FAST = auto() #On disk, large page cache + mmap, synchronous=OFF
+    MEMORY = auto() #In memory, copied to DB_PATH with the online backup API
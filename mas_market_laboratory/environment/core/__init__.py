@@ -1,8 +1,16 @@
+from .auction import find_clearing_price
 from .cda_engine import CDAEngine
+from .conservation_audit import AuditInvariant, AuditViolation, ConservationAudit
+from .depth_index import DepthIndex
 from .economy_module import EconomyModule
+from .message_throttle import MessageThrottle
+from .order_flow_journal import OrderFlowEvent, OrderFlowJournal, read_order_flow_journal
+from .risk_gateway import RiskGateway
 from .settlement_ledger import SettlementLedger
 from .storage_ledger import StorageLedger
+from .trigger_book import TriggerBook
+from .trade_tape import TradeTape, read_trade_tape, query_trade_tape
 
 
 
-__all__ = ["CDAEngine", "EconomyModule", "SettlementLedger", "StorageLedger"]
+__all__ = ["AuditInvariant", "AuditViolation", "CDAEngine", "ConservationAudit", "DepthIndex", "EconomyModule", "MessageThrottle", "OrderFlowEvent", "OrderFlowJournal", "read_order_flow_journal", "RiskGateway", "SettlementLedger", "StorageLedger", "TradeTape", "TriggerBook", "find_clearing_price", "read_trade_tape", "query_trade_tape"]
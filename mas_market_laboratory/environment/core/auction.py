@@ -0,0 +1,56 @@
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+
+def find_clearing_price(bid_sizes:Dict[int, int], ask_sizes:Dict[int, int], reference_price:Optional[int]=None) -> Optional[Tuple[int, int]]:
+    #Uniform price uncrossing over aggregated levels (price -> total remaining quantity)
+    #Returns clearing price - executable volume, None if the book does not cross.
+    #The price maximizes the executed volume, then minimizes the demand / supply imbalance,
+    #then is the closest to reference_price (the middle candidate without one), lowest price first on ties.
+    if not bid_sizes or not ask_sizes:
+        return None
+
+    bid_prices = np.fromiter(bid_sizes.keys(), dtype=np.int64, count=len(bid_sizes))
+    bid_quantities = np.fromiter(bid_sizes.values(), dtype=np.int64, count=len(bid_sizes))
+    ask_prices = np.fromiter(ask_sizes.keys(), dtype=np.int64, count=len(ask_sizes))
+    ask_quantities = np.fromiter(ask_sizes.values(), dtype=np.int64, count=len(ask_sizes))
+
+    bid_order = np.argsort(bid_prices)
+    bid_prices = bid_prices[bid_order]
+    bid_quantities = bid_quantities[bid_order]
+
+    ask_order = np.argsort(ask_prices)
+    ask_prices = ask_prices[ask_order]
+    ask_quantities = ask_quantities[ask_order]
+
+    if bid_prices[-1] < ask_prices[0]:
+        return None
+
+    #Demand is flat on (bid, next bid], supply on [ask, next ask), so every flat piece of both curves
+    #inside [best ask, best bid] starts at a level price or one unit above a bid price
+    candidates = np.unique(np.concatenate((bid_prices, bid_prices + 1, ask_prices)))
+    candidates = candidates[(candidates >= ask_prices[0]) & (candidates <= bid_prices[-1])]
+
+    bid_cumulative = np.concatenate(([0], np.cumsum(bid_quantities)))
+    ask_cumulative = np.concatenate(([0], np.cumsum(ask_quantities)))
+
+    demand = bid_cumulative[-1] - bid_cumulative[np.searchsorted(bid_prices, candidates, side="left")] #Bids at or above the candidate
+    supply = ask_cumulative[np.searchsorted(ask_prices, candidates, side="right")] #Asks at or below the candidate
+
+    volumes = np.minimum(demand, supply)
+    imbalances = np.abs(demand - supply)
+
+    is_best = volumes == volumes.max()
+    is_best &= imbalances == imbalances[is_best].min()
+    prices = candidates[is_best]
+
+    if reference_price is not None:
+        distances = np.abs(prices - reference_price)
+        price = prices[distances == distances.min()][0]
+    else:
+        price = prices[(len(prices) - 1) // 2]
+
+    return int(price), int(volumes.max())
@@ -1,36 +1,129 @@
 from __future__ import annotations
-from typing import Callable, Dict, Optional, Tuple, Deque
+from typing import Callable, Dict, List, Optional, Tuple, Deque
 from sortedcontainers import SortedDict
 from collections import deque
+from itertools import chain, takewhile
+import operator
+import heapq
 import time
 
-from environment.models import Order, Trade, MarketData 
-from environment.models.order import OrderType, Side, OrderLifecycle, OrderEndReasons
+from environment.models import BookEvent, BookSnapshot, Order, OrderImpact, Trade, MarketData 
+from environment.models.book_event import BookEventType
+from environment.models.order import LIMIT_ORDER_TYPES, RESTING_ORDER_TYPES, STOP_ORDER_TYPES, OrderType, Side, OrderLifecycle, OrderEndReasons
 from environment.configs import get_environment_configuration
+from environment.configs.models import MatchingMode
 
-from simulation.configs import get_simulation_realtime_data 
+from simulation.configs import get_simulation_configurations, get_simulation_realtime_data 
 
+from .auction import find_clearing_price
+from .depth_index import DepthIndex
 from .settlement_ledger import SettlementLedger
 from .storage_ledger import StorageLedger
+from .trigger_book import TriggerBook
 
 
+BookFields = Tuple[
+    Optional[Tuple[int, int, int]], Optional[Tuple[int, int, int]], #L1 bids - L1 asks
+    Optional[int], Optional[int], Optional[int], #spread - mid_price - micro_price
+    Optional[Tuple[Tuple[int, int, int], ...]], Optional[Tuple[Tuple[int, int, int], ...]], #L2 bids - L2 asks
+    int, int, int, Optional[float] #N - bids_depth_N - asks_depth_N - imbalance_N
+]
+
 
 class OrderBook:
     bids:SortedDict[int, Deque[Order]]
     asks:SortedDict[int, Deque[Order]]
 
     order_map:Dict[int, Order] #OrderID -> Order
+    agent_orders:Dict[int, Dict[int, Order]] #AgentID -> OrderID -> Order
+
+    bid_sizes:Dict[int, int] #price -> total remaining quantity
+    ask_sizes:Dict[int, int] #price -> total remaining quantity
+
+    bid_depth:DepthIndex #Cumulative bid size, best price first
+    ask_depth:DepthIndex #Cumulative ask size, best price first
+
+    sequence:int #Bumped on every book change
+    events:List[BookEvent]
+    publish_events:bool
 
 
     def __init__(self) -> None:
+        ENV_CONFIG = get_environment_configuration()
+        
+        self.sequence = 0
+        self.events = []
+        self.publish_events = ENV_CONFIG.BOOK_EVENT_FEED
+
+        self.bid_depth = DepthIndex(True, ENV_CONFIG.DEPTH_INDEX_BUCKET_WIDTH, ENV_CONFIG.DEPTH_INDEX_MAX_PRICE)
+        self.ask_depth = DepthIndex(False, ENV_CONFIG.DEPTH_INDEX_BUCKET_WIDTH, ENV_CONFIG.DEPTH_INDEX_MAX_PRICE)
+        
         self.__create_clean_book()
 
         
     def __create_clean_book(self) -> None:
-        bid_sort_key_fn:Callable[[int], int] = lambda k: -k
+        bid_sort_key_fn:Callable[[int], int] = operator.neg #Picklable, unlike a lambda
         self.bids = SortedDict(bid_sort_key_fn)
         self.asks = SortedDict()
         self.order_map = {}
+        self.agent_orders = {}
+        self.bid_sizes = {}
+        self.ask_sizes = {}
+
+        #Cleared, not replaced -> DepthIndexViews taken before expire_book stay on the live book
+        self.bid_depth.clear()
+        self.ask_depth.clear()
+
+
+    def __emit(self, event_type:BookEventType, order_id:Optional[int]=None, side:Optional[Side]=None, price:Optional[int]=None, quantity:int=0) -> None:
+        self.sequence += 1
+
+        if not self.publish_events:
+            return
+
+        level_size = 0
+        level_count = 0
+        if price is not None:
+            target_book = self.bids if side == Side.BUY else self.asks
+            target_sizes = self.bid_sizes if side == Side.BUY else self.ask_sizes
+            level_size = target_sizes.get(price, 0)
+            level_count = len(target_book[price]) if price in target_book else 0
+            
+        self.events.append(
+            BookEvent(
+                sequence=self.sequence,
+                event_type=event_type,
+                order_id=order_id,
+                side=side,
+                price=price,
+                quantity=quantity,
+                level_size=level_size,
+                level_count=level_count
+            )
+        )
+
+
+    def __remove_agent_order(self, order:Order) -> None:
+        agent_orders = self.agent_orders[order.agent_id]
+        del agent_orders[order.order_id]
+
+        if not agent_orders:
+            del self.agent_orders[order.agent_id]
+
+
+    def drain_events(self) -> Tuple[BookEvent, ...]:
+        events = tuple(self.events)
+        self.events.clear()
+
+        return events
+
+    
+    def get_snapshot(self) -> BookSnapshot:
+        return BookSnapshot(
+            sequence=self.sequence,
+            bids=tuple((price, self.bid_sizes[price], len(queue)) for price, queue in self.bids.items()),
+            asks=tuple((price, self.ask_sizes[price], len(queue)) for price, queue in self.asks.items())
+        )
         
 
     def is_order_exist(self, order_id:int) -> bool:
@@ -40,14 +133,14 @@ class OrderBook:
     def add_order(self, order:Order) -> bool:
         #Expectations
         # 1-agent_exist (ASSURED)
-        # 2-order_type = Limit
+        # 2-order_type = Limit / Post only
         # 3-price != None && price > 0
         # 4-quantity > 0
         # 5-0 < remaining_quantity < quantity
         # 6-lifecycle = WORKING
         # 7-end_reason = NONE
 
-        assert order.order_type == OrderType.LIMIT #2
+        assert order.order_type in RESTING_ORDER_TYPES #2
         assert order.price is not None #3
         assert order.price > 0 #3
         assert order.quantity > 0 #4
@@ -59,14 +152,22 @@ class OrderBook:
             return False
 
         self.order_map[order.order_id] = order
+        self.agent_orders.setdefault(order.agent_id, {})[order.order_id] = order
 
         target_book = self.bids if order.side == Side.BUY else self.asks
+        target_sizes = self.bid_sizes if order.side == Side.BUY else self.ask_sizes
+        target_depth = self.bid_depth if order.side == Side.BUY else self.ask_depth
         price_key = order.price
 
         if price_key not in target_book:
             target_book[price_key] = deque()
+            target_sizes[price_key] = 0
 
         target_book[price_key].append(order)
+        target_sizes[price_key] += order.remaining_quantity
+        target_depth.update(price_key, order.remaining_quantity)
+
+        self.__emit(BookEventType.ADD, order.order_id, order.side, price_key, order.remaining_quantity)
         
         return True
 
@@ -85,19 +186,188 @@ class OrderBook:
             return None
 
         order = self.order_map.pop(order_id)
+        self.__remove_agent_order(order)
 
         assert order.price is not None
         target_book = self.bids if order.side == Side.BUY else self.asks
+        target_sizes = self.bid_sizes if order.side == Side.BUY else self.ask_sizes
+        target_depth = self.bid_depth if order.side == Side.BUY else self.ask_depth
         price_key = order.price
 
         target_book[price_key].remove(order)
+        target_sizes[price_key] -= order.remaining_quantity
+        target_depth.update(price_key, -order.remaining_quantity)
 
         if not target_book[price_key]:
             del target_book[price_key]
+            del target_sizes[price_key]
 
+        self.__emit(BookEventType.CANCEL, order.order_id, order.side, price_key, order.remaining_quantity)
+        
         return order
+
+
+    def remove_agent_orders(self, agent_id:int, side:Optional[Side]=None, min_price:Optional[int]=None, max_price:Optional[int]=None) -> Tuple[Order, ...]:
+        #Removes the agent's resting orders matching side and [min_price, max_price], O(k) in the agent's orders
+        agent_orders = self.agent_orders.get(agent_id)
+        if not agent_orders:
+            return ()
+
+        removed_orders = []
+        for order in list(agent_orders.values()):
+            assert order.price is not None
+            if side is not None and order.side != side: continue
+            if min_price is not None and order.price < min_price: continue
+            if max_price is not None and order.price > max_price: continue
+
+            removed_order = self.remove_order(order.order_id)
+            assert removed_order is order
+            removed_orders.append(order)
+
+        return tuple(removed_orders)
+
+    
+    def fill_order(self, order:Order, filled_quantity:int) -> bool:
+        #Expectations
+        # 1-order is at the front of the best level
+        # 2-remaining_quantity is already reduced by filled_quantity
+        # (Returns True if the order is completely filled and left the book)
+
+        assert order.price is not None
+        target_book = self.bids if order.side == Side.BUY else self.asks
+        target_sizes = self.bid_sizes if order.side == Side.BUY else self.ask_sizes
+        target_depth = self.bid_depth if order.side == Side.BUY else self.ask_depth
+        price_key = order.price
+
+        level_queue = target_book[price_key]
+        assert level_queue[0] is order #1
+        
+        target_sizes[price_key] -= filled_quantity
+        target_depth.update(price_key, -filled_quantity)
+
+        is_filled = order.remaining_quantity == 0
+        if is_filled:
+            level_queue.popleft()
+            del self.order_map[order.order_id]
+            self.__remove_agent_order(order)
+
+            if not level_queue:
+                del target_book[price_key]
+                del target_sizes[price_key]
+
+        self.__emit(BookEventType.FILL, order.order_id, order.side, price_key, filled_quantity)
+
+        return is_filled
+
+
+    def pop_best_level(self, side:Side) -> Tuple[int, Tuple[Order, ...]]:
+        #Expectations
+        # 1-side has a level
+        # 2-every order of the level is about to be completely filled (remaining_quantity not reduced yet)
+        # (Drops the level at once, the FILL events are the ones fill_order would emit maker by maker)
+
+        target_book = self.bids if side == Side.BUY else self.asks
+        target_sizes = self.bid_sizes if side == Side.BUY else self.ask_sizes
+        target_depth = self.bid_depth if side == Side.BUY else self.ask_depth
+
+        assert target_book #1
+        price_key, level_queue = target_book.popitem(0)
+        level_size = target_sizes.pop(price_key)
+        target_depth.update(price_key, -level_size)
+
+        orders = tuple(level_queue)
+        for order in orders:
+            del self.order_map[order.order_id]
+            self.__remove_agent_order(order)
+
+        if not self.publish_events:
+            self.sequence += len(orders)
+            return price_key, orders
+
+        level_count = len(orders)
+        for order in orders:
+            self.sequence += 1
+            level_size -= order.remaining_quantity
+            level_count -= 1
+            self.events.append(
+                BookEvent(
+                    sequence=self.sequence,
+                    event_type=BookEventType.FILL,
+                    order_id=order.order_id,
+                    side=side,
+                    price=price_key,
+                    quantity=order.remaining_quantity,
+                    level_size=level_size,
+                    level_count=level_count
+                )
+            )
+
+        return price_key, orders
+
+
+    def fill_best_orders(self, side:Side, filled_orders:List[Tuple[Order, int]]) -> None:
+        #Expectations
+        # 1-filled_orders are the front orders of the side in priority order (best level first, FIFO in a level), each once
+        # 2-remaining_quantity is already reduced by the filled quantity, only the last order may keep some
+        # (Bulk fill_order of an uncross: the size and depth of a level move once, the FILL events are one per order)
+
+        target_book = self.bids if side == Side.BUY else self.asks
+        target_sizes = self.bid_sizes if side == Side.BUY else self.ask_sizes
+        target_depth = self.bid_depth if side == Side.BUY else self.ask_depth
+
+        level_price:Optional[int] = None
+        level_quantity = 0
+        for order, filled_quantity in filled_orders:
+            price_key = order.price
+            assert price_key is not None
+
+            if price_key != level_price:
+                if level_price is not None:
+                    target_depth.update(level_price, -level_quantity)
+                level_price = price_key
+                level_quantity = 0
+
+            level_quantity += filled_quantity
+            target_sizes[price_key] -= filled_quantity
+
+            if order.remaining_quantity == 0:
+                level_queue = target_book[price_key]
+                filled_order = level_queue.popleft()
+                assert filled_order is order #1
+                del self.order_map[order.order_id]
+                self.__remove_agent_order(order)
+
+                if not level_queue:
+                    del target_book[price_key]
+                    del target_sizes[price_key]
+
+            else:
+                assert target_book[price_key][0] is order #2
+
+            self.__emit(BookEventType.FILL, order.order_id, side, price_key, filled_quantity)
+
+        if level_price is not None:
+            target_depth.update(level_price, -level_quantity)
+
+
+    def reduce_order(self, order:Order, reduced_quantity:int) -> None:
+        #Shrinks a resting order in place, it keeps its queue position
+        assert order.order_id in self.order_map
+        assert order.price is not None
+        assert 0 < reduced_quantity < order.remaining_quantity
         
+        target_sizes = self.bid_sizes if order.side == Side.BUY else self.ask_sizes
+        target_depth = self.bid_depth if order.side == Side.BUY else self.ask_depth
+        price_key = order.price
+
+        order.quantity -= reduced_quantity
+        order.remaining_quantity -= reduced_quantity
+        target_sizes[price_key] -= reduced_quantity
+        target_depth.update(price_key, -reduced_quantity)
 
+        self.__emit(BookEventType.LEVEL_UPDATE, order.order_id, order.side, price_key, reduced_quantity)
+
+        
     def expire_book(self) -> Optional[Tuple[Tuple[Order, ...], Tuple[Order, ...]]]:
         #Expectations
         # 1-agent_exist (ASSURED)
@@ -115,6 +385,7 @@ class OrderBook:
         asks = [order for level_queue in self.asks.values() for order in level_queue]
 
         self.__create_clean_book()
+        self.__emit(BookEventType.CLEAR)
 
         return tuple(bids), tuple(asks)
 
@@ -133,6 +404,20 @@ class OrderBook:
         return self.asks.keys()[0]
 
 
+    def is_crossing(self, side:Side, price:int) -> bool:
+        #Would an order of side at price take liquidity
+        if side == Side.BUY:
+            best_ask_price = self.get_best_ask_price()
+            return best_ask_price is not None and price >= best_ask_price
+
+        elif side == Side.SELL:
+            best_bid_price = self.get_best_bid_price()
+            return best_bid_price is not None and price <= best_bid_price
+
+        else:
+            assert False
+            
+
     def get_best_bid_order(self) -> Optional[Order]:
         #Expectations
         # 1-agent_exist (ASSURED)
@@ -165,73 +450,61 @@ class OrderBook:
 
 
     def get_l1_bids(self) -> Optional[Tuple[int, int, int]]:
-        price = self.get_best_bid_price()
-        if price is None:
+        if not self.bids:
             return
 
-        bid_queue = self.bids[price]
-
-        number_of_bids = len(bid_queue)
-        bid_size = 0
-        for bid in bid_queue:
-            bid_size += bid.remaining_quantity
+        price, bid_queue = self.bids.peekitem(0)
 
-        return price, bid_size, number_of_bids
+        return price, self.bid_sizes[price], len(bid_queue)
 
 
     def get_l1_asks(self) -> Optional[Tuple[int, int, int]]:
-        price = self.get_best_ask_price()
-        if price is None:
+        if not self.asks:
             return
 
-        ask_queue = self.asks[price]
+        price, ask_queue = self.asks.peekitem(0)
 
-        number_of_asks = len(ask_queue)
-        ask_size = 0
-        for ask in ask_queue:
-            ask_size += ask.remaining_quantity
-
-        return price, ask_size, number_of_asks
+        return price, self.ask_sizes[price], len(ask_queue)
 
 
     def get_l2_bids(self) -> Optional[Tuple[Tuple[int, int, int], ...]]:
         if not self.bids:
             return
 
-        bid_level_data = []
-        for price, bid_queue in self.bids.items():
-            number_of_bids = len(bid_queue)
-            bid_size = 0
-            for bid in bid_queue:
-                bid_size += bid.remaining_quantity
-                
-            bid_level_data.append((price, bid_size, number_of_bids))
-
-        return tuple(bid_level_data)
+        bid_sizes = self.bid_sizes
+        return tuple((price, bid_sizes[price], len(bid_queue)) for price, bid_queue in self.bids.items())
 
     
     def get_l2_asks(self) -> Optional[Tuple[Tuple[int, int, int], ...]]:
         if not self.asks:
             return
 
-        ask_level_data = []
-        for price, ask_queue in self.asks.items():
-            number_of_asks = len(ask_queue)
-            ask_size = 0
-            for ask in ask_queue:
-                ask_size += ask.remaining_quantity
-
-            ask_level_data.append((price, ask_size, number_of_asks))
-
-        return tuple(ask_level_data)
+        ask_sizes = self.ask_sizes
+        return tuple((price, ask_sizes[price], len(ask_queue)) for price, ask_queue in self.asks.items())
 
     
 class CDAEngine:
+    symbol:int #One engine per symbol, sharing the SettlementLedger / StorageLedger
     order_book:OrderBook
+    trigger_book:TriggerBook
     storage_ledger:StorageLedger
     settlement_ledger:SettlementLedger
 
-    __next_trade_id:int
+    book_events:Tuple[BookEvent, ...] #Book changes published with the last market data
+
+    batch_auction:bool #Orders are collected and uncrossed with the next market data instead of matched on arrival
+    opening_auction:bool #Micro tick 0 is a pre-open call, uncrossed with the next market data
+    closing_auction:bool #The last micro tick is a pre-close call, uncrossed by expire_session
+    level_sweep:bool #Whole levels taken by one aggressor are settled in one pass (same trades as maker by maker)
+    __last_clearing_price:Optional[int] #Price of the last uncross, published with the next market data
+    __call_pending:bool #Orders were collected by a call that has not been uncrossed yet
+
+    #OrderBook.sequence -> L1, L2, spread, mid_price, micro_price, N, bids_depth_N, asks_depth_N, imbalance_N
+    __book_fields:Optional[Tuple[int, BookFields]]
+
+    last_trade_price:Optional[int] #Last trade of the run, drives the stop triggers
+    __triggered_orders:Deque[Order] #Stops triggered by the order being processed, run after it
+    __expiry_heap:List[Tuple[int, int, int]] #macro_tick - micro_tick - OrderID of good till orders (lazy, finished orders are skipped)
 
     #__trades:List[Tuple[int, int]] #price - volume
     __last_traded_price:Optional[int]
@@ -244,13 +517,31 @@ class CDAEngine:
     __micro_trade_volume:int
 
     
-    def __init__(self, storage_ledger:StorageLedger, settlement_ledger:SettlementLedger) -> None:
+    def __init__(self, storage_ledger:StorageLedger, settlement_ledger:SettlementLedger, symbol:int=0) -> None:
+        self.symbol = symbol
         self.storage_ledger = storage_ledger
         self.settlement_ledger = settlement_ledger
 
         self.order_book = OrderBook()
+        self.trigger_book = TriggerBook()
+        self.book_events = ()
+        self.__book_fields = None
+
+        ENV_CONFIG = get_environment_configuration()
+        self.batch_auction = ENV_CONFIG.MATCHING_MODE == MatchingMode.BATCH_AUCTION
+        self.opening_auction = ENV_CONFIG.OPENING_AUCTION
+        self.closing_auction = ENV_CONFIG.CLOSING_AUCTION
+        self.level_sweep = True
+        self.__last_clearing_price = None
+        self.__call_pending = False
+
+        SIM_CONFIG = get_simulation_configurations()
+        if self.opening_auction or self.closing_auction:
+            assert SIM_CONFIG.SIMULATION_MICRO_TICK > self.opening_auction + self.closing_auction #At least one continuous micro tick
 
-        self.__next_trade_id = 0
+        self.last_trade_price = None
+        self.__triggered_orders = deque()
+        self.__expiry_heap = []
 
         #self.__trades = []
         self.__last_traded_price = None
@@ -265,25 +556,58 @@ class CDAEngine:
         
     @property
     def trade_id(self) -> int:
-        trade_id = self.__next_trade_id 
-        self.__next_trade_id += 1
+        return self.settlement_ledger.trade_id
+
+
+    @property
+    def is_collecting(self) -> bool:
+        #Resting orders join the book without matching until the next uncross
+        if self.batch_auction:
+            return True
+
+        SIM_CONFIG = get_simulation_configurations()
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
 
-        return trade_id
+        if self.opening_auction and SIM_REALTIME_DATA.MICRO_TICK == 0:
+            return True
+
+        if self.closing_auction and SIM_REALTIME_DATA.MICRO_TICK == SIM_CONFIG.SIMULATION_MICRO_TICK - 1:
+            return True
+
+        return False
+
+
+    def __uncross_ended_call(self) -> None:
+        #The call is uncrossed by the first operation after it ends, before anything can match continuously
+        if self.__call_pending and not self.is_collecting:
+            self.uncross()
 
     
     def process_new_order(self, order:Order) -> None:
+        self.__uncross_ended_call()
+
+        if order.good_till is not None:
+            heapq.heappush(self.__expiry_heap, (order.good_till[0], order.good_till[1], order.order_id))
+            
+        self.__process_order(order)
+        self.__process_triggered_orders()
+
+        
+    def __process_order(self, order:Order) -> None:
         # Expectations:
         # 1-agent_id exist
-        # 2-If Limit -> price != None && price > 0
-        # 3-If Market -> price = None
+        # 2-If Limit / IOC / FOK / Post only / Stop limit -> price != None && price > 0
+        # 3-If Market / Stop -> price = None
         # 4-quantity > 0
         # 5-remaining_quantity = quantity
         # 6-lifecycle = NEW
         # 7-end_reason = NONE
         # 8-average_trade_price = None
         # 9-trades = {}
+        # 10-symbol = engine symbol
 
         assert self.settlement_ledger.is_account_exist(order.agent_id) #1
+        assert order.symbol == self.symbol #10
         assert order.quantity > 0 #4
         assert order.remaining_quantity == order.quantity #5
         assert order.lifecycle == OrderLifecycle.NEW #6
@@ -292,21 +616,78 @@ class CDAEngine:
         assert not order.trades #9
         
         order.lifecycle = OrderLifecycle.WORKING
+
+        if self.is_collecting:
+            self.__call_pending = True
+            self.__process_collected_order(order)
         
-        if order.order_type == OrderType.LIMIT:
+        elif order.order_type == OrderType.LIMIT:
             self.__process_new_limit_order(order)
 
         elif order.order_type == OrderType.MARKET:
             self.__process_new_market_order(order)
 
+        elif order.order_type == OrderType.IOC:
+            self.__process_new_limit_order(order)
+
+        elif order.order_type == OrderType.FOK:
+            self.__process_new_fok_order(order)
+
+        elif order.order_type == OrderType.POST_ONLY:
+            self.__process_new_post_only_order(order)
+
+        elif order.order_type in STOP_ORDER_TYPES:
+            self.__process_new_stop_order(order)
+
         else:
             assert False
+
+
+    def __process_new_stop_order(self, order:Order) -> None:
+        # Expectations:
+        # 1-agent_exist (ASSURED)
+        # 2-order_type = STOP / STOP_LIMIT
+        # 3-stop_price != None && stop_price > 0
+        # 4-lifecycle = WORKING
+
+        assert order.order_type in STOP_ORDER_TYPES #2
+        assert order.stop_price is not None and order.stop_price > 0 #3
+        assert order.lifecycle == OrderLifecycle.WORKING #4
+
+        is_account_available = self.settlement_ledger.stop_check_and_reserve_funds(order)
+        if not is_account_available:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.REJECTED_INSUFFICIENT_FUND
+            return
+
+        #Already crossed by the last trade -> triggers right away
+        if self.last_trade_price is not None:
+            if (order.side == Side.BUY and self.last_trade_price >= order.stop_price) or (order.side == Side.SELL and self.last_trade_price <= order.stop_price):
+                self.__triggered_orders.append(order)
+                return
+            
+        is_added = self.trigger_book.add_order(order)
+        assert is_added
+
+
+    def __process_triggered_orders(self) -> None:
+        #Triggered stops re-enter process_new_order as MARKET / LIMIT orders, in trigger order
+        #(collected during matching, so a cascade never runs inside another order's matching loop)
+        while self.__triggered_orders:
+            order = self.__triggered_orders.popleft()
+
+            self.settlement_ledger.release_stop_funds(order)
+
+            order.order_type = OrderType.MARKET if order.order_type == OrderType.STOP else OrderType.LIMIT
+            order.lifecycle = OrderLifecycle.NEW
+            
+            self.__process_order(order)
         
 
     def __process_new_limit_order(self, order:Order) -> None:
         # Expectations:
         # 1-agent_exist (ASSURED)
-        # 2-order_type = LIMIT  
+        # 2-order_type = LIMIT / IOC
         # 3-price != None && price > 0
         # 4-quantity > 0 (ASSURED)
         # 5-remaining_quantity = quantity (ASSURED) 
@@ -315,7 +696,7 @@ class CDAEngine:
         # 8-average_trade_price = None (ASSURED)
         # 9-trades = {} (ASSURED)
         
-        assert order.order_type == OrderType.LIMIT #2
+        assert order.order_type in (OrderType.LIMIT, OrderType.IOC) #2
         assert order.price is not None #3
         assert order.price > 0 #3
         assert order.lifecycle == OrderLifecycle.WORKING #6
@@ -326,10 +707,110 @@ class CDAEngine:
             order.end_reason = OrderEndReasons.REJECTED_INSUFFICIENT_FUND
             return
 
+        self.__match_limit_order(order)
+
+
+    def __process_collected_order(self, order:Order) -> None:
+        # Expectations:
+        # 1-agent_exist (ASSURED)
+        # 2-lifecycle = WORKING
+        # (The book may cross until the next uncross, order types that need to match on arrival are rejected)
+
+        assert order.lifecycle == OrderLifecycle.WORKING #2
+
+        if order.order_type == OrderType.POST_ONLY:
+            self.__process_new_post_only_order(order)
+            return
+
+        if order.order_type != OrderType.LIMIT:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.REJECTED_DURING_CALL
+            return
+
+        assert order.price is not None
+        assert order.price > 0
+
+        is_account_available = self.settlement_ledger.limit_check_and_reserve_funds(order)
+        if not is_account_available:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.REJECTED_INSUFFICIENT_FUND
+            return
+
+        is_added = self.order_book.add_order(order)
+        assert is_added
+
+        
+    def __process_new_fok_order(self, order:Order) -> None:
+        # Expectations:
+        # 1-agent_exist (ASSURED)
+        # 2-order_type = FOK
+        # 3-price != None && price > 0
+        # 4-lifecycle = WORKING
+        # (The dry run decides first, a killed FOK never reserves or touches the book)
+
+        assert order.order_type == OrderType.FOK #2
+        assert order.price is not None #3
+        assert order.price > 0 #3
+        assert order.lifecycle == OrderLifecycle.WORKING #4
+
+        order_impact = self.simulate_order(order.agent_id, order.order_type, order.side, order.quantity, order.price)
+        if order_impact.end_reason != OrderEndReasons.FILLED:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = order_impact.end_reason
+            return
+
+        is_reserved = self.settlement_ledger.limit_check_and_reserve_funds(order)
+        assert is_reserved
+        self.__match_limit_order(order)
+        assert order.end_reason == OrderEndReasons.FILLED
+
+
+    def __process_new_post_only_order(self, order:Order) -> None:
+        # Expectations:
+        # 1-agent_exist (ASSURED)
+        # 2-order_type = POST_ONLY
+        # 3-price != None && price > 0
+        # 4-lifecycle = WORKING
+
+        assert order.order_type == OrderType.POST_ONLY #2
+        assert order.price is not None #3
+        assert order.price > 0 #3
+        assert order.lifecycle == OrderLifecycle.WORKING #4
+
+        if self.order_book.is_crossing(order.side, order.price):
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.REJECTED_POST_ONLY_WOULD_CROSS
+            return
+
+        is_account_available = self.settlement_ledger.limit_check_and_reserve_funds(order)
+        if not is_account_available:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.REJECTED_INSUFFICIENT_FUND
+            return
+
+        is_added = self.order_book.add_order(order)
+        assert is_added
+
+
+    def __match_limit_order(self, order:Order) -> None:
+        # Expectations:
+        # 1-order_type in LIMIT_ORDER_TYPES (ASSURED)
+        # 2-price != None && price > 0 (ASSURED)
+        # 3-0 < remaining_quantity <= quantity
+        # 4-lifecycle = WORKING (ASSURED)
+        # 5-remaining_quantity is reserved in the account
+        # 6-order not in book
+
+        assert 0 < order.remaining_quantity <= order.quantity #3
+        assert not self.order_book.is_order_exist(order.order_id) #6
+        
         wash_trade = False
         insufficient_market_depth = False
         non_crossing = False
         while order.remaining_quantity > 0:
+            if self.level_sweep and self.__sweep_level(order):
+                continue
+
             if order.side == Side.BUY:
                 maker_order = self.order_book.get_best_ask_order()
                 seller_order = maker_order
@@ -393,14 +874,13 @@ class CDAEngine:
                 buy_order_id=buyer_order.order_id,
                 price=trade_price,
                 quantity=trade_quantity,
-                fee=trade_price * trade_quantity * ENV_CONFIG.FEE_RATE_PPM // 1000000
+                fee=trade_price * trade_quantity * ENV_CONFIG.FEE_RATE_PPM // 1000000,
+                symbol=self.symbol
             )
 
             self.__execute_trade(buyer_order, seller_order, trade)
 
-            if maker_order.remaining_quantity == 0:
-                maker_order = self.order_book.remove_order(maker_order.order_id)
-                assert maker_order is not None
+            if self.order_book.fill_order(maker_order, trade.quantity):
                 maker_order.lifecycle = OrderLifecycle.DONE
                 maker_order.end_reason = OrderEndReasons.FILLED
 
@@ -414,8 +894,19 @@ class CDAEngine:
             order.end_reason= OrderEndReasons.KILLED_WASH_TRADE
             return 
             
+        if (insufficient_market_depth or non_crossing) and order.order_type in RESTING_ORDER_TYPES:
+            is_added = self.order_book.add_order(order)
+            assert is_added
+            return
+
         if insufficient_market_depth or non_crossing:
-            assert self.order_book.add_order(order)
+            #IOC remainder is dropped without ever entering the book
+            if order.side == Side.BUY: self.settlement_ledger.release_cash(order)
+            elif order.side == Side.SELL: self.settlement_ledger.release_shares(order)
+            else: assert False
+            
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.KILLED_IOC
             return
 
         order.lifecycle = OrderLifecycle.DONE
@@ -441,6 +932,9 @@ class CDAEngine:
         insufficient_market_depth = False
         insufficient_funds = False
         while order.remaining_quantity > 0:
+            if self.level_sweep and self.__sweep_level(order):
+                continue
+
             if order.side == Side.BUY:
                 maker_order = self.order_book.get_best_ask_order()
                 seller_order = maker_order
@@ -507,14 +1001,13 @@ class CDAEngine:
                 buy_order_id=buyer_order.order_id,
                 price=trade_price,
                 quantity=trade_quantity,
-                fee=trade_price * trade_quantity * ENV_CONFIG.FEE_RATE_PPM // 1000000
+                fee=trade_price * trade_quantity * ENV_CONFIG.FEE_RATE_PPM // 1000000,
+                symbol=self.symbol
             )
 
             self.__execute_trade(buyer_order, seller_order, trade)
 
-            if maker_order.remaining_quantity == 0:
-                maker_order = self.order_book.remove_order(maker_order.order_id)
-                assert maker_order is not None
+            if self.order_book.fill_order(maker_order, trade.quantity):
                 maker_order.lifecycle = OrderLifecycle.DONE
                 maker_order.end_reason = OrderEndReasons.FILLED
 
@@ -535,10 +1028,167 @@ class CDAEngine:
         order.end_reason = OrderEndReasons.FILLED
 
         
+    def simulate_order(self, agent_id:int, order_type:OrderType, side:Side, quantity:int, price:Optional[int]=None) -> OrderImpact:
+        # Expectations:
+        # 1-agent_id exist
+        # 2-If Limit / IOC / FOK / Post only -> price != None && price > 0
+        # 3-If Market -> price = None
+        # 4-quantity > 0
+        # (Same crossing, wash trade and fund rules as process_new_order, walked level by level over the live book.
+        #  Nothing is reserved, traded or stored; fees are taken per level, so they may differ from the per-trade
+        #  fees by rounding.)
+
+        account = self.settlement_ledger.accounts.get(agent_id)
+        assert account is not None #1
+        if order_type in LIMIT_ORDER_TYPES: assert price is not None and price > 0 #2
+        elif order_type == OrderType.MARKET: assert price is None #3
+        else: assert False
+        assert quantity > 0 #4
+
+        ENV_CONFIG = get_environment_configuration()
+
+        if order_type == OrderType.POST_ONLY:
+            assert price is not None
+            if self.order_book.is_crossing(side, price):
+                return self.__create_unfilled_impact(quantity, OrderEndReasons.REJECTED_POST_ONLY_WOULD_CROSS)
+        
+        if order_type in LIMIT_ORDER_TYPES:
+            assert price is not None
+            if side == Side.BUY:
+                trade_cost = quantity * price
+                is_account_available = account.cash >= trade_cost + trade_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+            elif side == Side.SELL:
+                is_account_available = account.shares[self.symbol] >= quantity
+            else:
+                assert False
+
+            if not is_account_available:
+                return self.__create_unfilled_impact(quantity, OrderEndReasons.REJECTED_INSUFFICIENT_FUND)
+
+        if side == Side.BUY:
+            maker_side = Side.SELL
+            maker_book = self.order_book.asks
+            maker_sizes = self.order_book.ask_sizes
+        elif side == Side.SELL:
+            maker_side = Side.BUY
+            maker_book = self.order_book.bids
+            maker_sizes = self.order_book.bid_sizes
+        else:
+            assert False
+
+        #Matching stops in front of the agent's own best resting order on the maker side
+        own_prices = [order.price for order in self.order_book.agent_orders.get(agent_id, {}).values() if order.side == maker_side]
+        wash_price = None
+        if own_prices:
+            wash_price = min(own_prices) if side == Side.BUY else max(own_prices)
+
+        cash = account.cash
+        shares = account.shares[self.symbol]
+
+        remaining_quantity = quantity
+        filled_quantity = 0
+        notional = 0
+        fees = 0
+        last_price = None
+        levels_touched = 0
+        end_reason = None
+        
+        for level_price, level_queue in maker_book.items():
+            if order_type in LIMIT_ORDER_TYPES:
+                assert price is not None
+                if (side == Side.BUY and price < level_price) or (side == Side.SELL and price > level_price):
+                    end_reason = OrderEndReasons.NONE #Non crossing -> rests
+                    break
+
+            is_wash_level = level_price == wash_price
+            if is_wash_level:
+                available_quantity = 0
+                for maker_order in level_queue:
+                    if maker_order.agent_id == agent_id:
+                        break
+                    available_quantity += maker_order.remaining_quantity
+            else:
+                available_quantity = maker_sizes[level_price]
+
+            trade_quantity = min(remaining_quantity, available_quantity)
+            if order_type == OrderType.MARKET:
+                if side == Side.BUY:
+                    trade_fee = level_price * ENV_CONFIG.FEE_RATE_PPM // 1000000
+                    trade_quantity = min(trade_quantity, cash // (level_price + trade_fee))
+                else:
+                    trade_quantity = min(trade_quantity, shares)
+
+            if trade_quantity > 0:
+                trade_cost = level_price * trade_quantity
+                trade_fee = trade_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+                
+                cash -= trade_cost + trade_fee
+                shares -= trade_quantity
+
+                remaining_quantity -= trade_quantity
+                filled_quantity += trade_quantity
+                notional += trade_cost
+                fees += trade_fee
+                last_price = level_price
+                levels_touched += 1
+
+            if remaining_quantity == 0:
+                end_reason = OrderEndReasons.FILLED
+                break
+
+            if trade_quantity < available_quantity:
+                end_reason = OrderEndReasons.REJECTED_INSUFFICIENT_FUND #Only market orders are capped by funds
+                break
+
+            if is_wash_level:
+                end_reason = OrderEndReasons.KILLED_WASH_TRADE
+                break
+
+        if end_reason is None:
+            end_reason = OrderEndReasons.NONE if order_type in LIMIT_ORDER_TYPES else OrderEndReasons.REJECTED_INSUFFICIENT_MARKET_DEPTH
+
+        if order_type == OrderType.IOC and end_reason == OrderEndReasons.NONE:
+            end_reason = OrderEndReasons.KILLED_IOC
+
+        if order_type == OrderType.FOK and end_reason != OrderEndReasons.FILLED:
+            return self.__create_unfilled_impact(quantity, OrderEndReasons.KILLED_FOK)
+
+        return OrderImpact(
+            filled_quantity=filled_quantity,
+            notional=notional,
+            fees=fees,
+            average_price=notional // filled_quantity if filled_quantity > 0 else None,
+            last_price=last_price,
+            levels_touched=levels_touched,
+            remaining_quantity=remaining_quantity,
+            lifecycle=OrderLifecycle.WORKING if end_reason == OrderEndReasons.NONE else OrderLifecycle.DONE,
+            end_reason=end_reason
+        )
+
+        
+    @staticmethod
+    def __create_unfilled_impact(quantity:int, end_reason:OrderEndReasons) -> OrderImpact:
+        return OrderImpact(
+            filled_quantity=0,
+            notional=0,
+            fees=0,
+            average_price=None,
+            last_price=None,
+            levels_touched=0,
+            remaining_quantity=quantity,
+            lifecycle=OrderLifecycle.DONE,
+            end_reason=end_reason
+        )
+
+        
     def __execute_trade(self, buyer_order:Order, seller_order:Order, trade:Trade) -> None:
         self.settlement_ledger.settle_trade(buyer_order, seller_order, trade)
         self.storage_ledger.add_trade(trade)
 
+        self.last_trade_price = trade.price
+        if self.trigger_book.order_map:
+            self.__triggered_orders.extend(self.trigger_book.pop_triggered_orders(trade.price))
+
         #self.__trades.append((trade.price, trade.quantity))
         self.__last_traded_price = trade.price
         self.__last_trade_volume = trade.quantity
@@ -549,7 +1199,370 @@ class CDAEngine:
         self.__micro_trade_count += 1
         self.__micro_trade_value += trade.price * trade.quantity
         self.__micro_trade_volume += trade.quantity
+
+
+    def __sweep_level(self, order:Order) -> bool:
+        #Fast path of the matching loops: the aggressor takes the whole best opposite level.
+        #Same trades (one per maker, FIFO) as the per maker loop, settled in one pass and the level dropped at once.
+        #Returns False without touching anything if the per maker loop has to decide (partial level, own order in it, funds)
+        maker_side = Side.SELL if order.side == Side.BUY else Side.BUY
+        maker_book = self.order_book.asks if order.side == Side.BUY else self.order_book.bids
+        maker_sizes = self.order_book.ask_sizes if order.side == Side.BUY else self.order_book.bid_sizes
+        if not maker_book:
+            return False
+
+        level_price, level_queue = maker_book.peekitem(0)
+        if len(level_queue) < 2:
+            return False
+
+        if order.price is not None:
+            if (order.side == Side.BUY and order.price < level_price) or (order.side == Side.SELL and order.price > level_price):
+                return False
+
+        if order.remaining_quantity < maker_sizes[level_price]:
+            return False
+
+        agent_orders = self.order_book.agent_orders.get(order.agent_id)
+        if agent_orders:
+            for agent_order in agent_orders.values():
+                if agent_order.side == maker_side and agent_order.price == level_price:
+                    return False #Wash trade inside the level
+
+        ENV_CONFIG = get_environment_configuration()
+
+        if order.order_type == OrderType.MARKET:
+            account = self.settlement_ledger.accounts[order.agent_id]
+            if order.side == Side.BUY:
+                #Every maker must pass market_calculate_possible_quantities with the cash left by the previous ones
+                cash = account.cash
+                unit_cost = level_price + level_price * ENV_CONFIG.FEE_RATE_PPM // 1000000
+                for maker_order in level_queue:
+                    if cash // unit_cost < maker_order.remaining_quantity:
+                        return False
+                    trade_cost = level_price * maker_order.remaining_quantity
+                    cash -= trade_cost + trade_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+            elif account.shares[self.symbol] < maker_sizes[level_price]:
+                return False
+
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        timestamp = time.time()
+
+        _, maker_orders = self.order_book.pop_best_level(maker_side)
+
+        trades = []
+        for maker_order in maker_orders:
+            buyer_order = order if order.side == Side.BUY else maker_order
+            seller_order = maker_order if order.side == Side.BUY else order
+            trades.append(
+                Trade(
+                    trade_id=self.trade_id,
+                    timestamp=timestamp,
+                    macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+                    micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+                    seller_agent_id=seller_order.agent_id,
+                    sell_order_id=seller_order.order_id,
+                    buyer_agent_id=buyer_order.agent_id,
+                    buy_order_id=buyer_order.order_id,
+                    price=level_price,
+                    quantity=maker_order.remaining_quantity,
+                    fee=level_price * maker_order.remaining_quantity * ENV_CONFIG.FEE_RATE_PPM // 1000000,
+                    symbol=self.symbol
+                )
+            )
+
+        self.settlement_ledger.settle_level(order, maker_orders, trades)
+
+        level_volume = 0
+        for maker_order, trade in zip(maker_orders, trades):
+            maker_order.lifecycle = OrderLifecycle.DONE
+            maker_order.end_reason = OrderEndReasons.FILLED
+            self.storage_ledger.add_trade(trade)
+            level_volume += trade.quantity
+
+        #One price for the whole level -> the stop triggers and trade stats move once
+        self.last_trade_price = level_price
+        if self.trigger_book.order_map:
+            self.__triggered_orders.extend(self.trigger_book.pop_triggered_orders(level_price))
+
+        self.__last_traded_price = level_price
+        self.__last_trade_volume = trades[-1].quantity
+
+        self.__macro_trade_value += level_price * level_volume
+        self.__macro_trade_volume += level_volume
+
+        self.__micro_trade_count += len(trades)
+        self.__micro_trade_value += level_price * level_volume
+        self.__micro_trade_volume += level_volume
+
+        return True
+
+    
+    def amend_order(self, order_id:int, quantity:int, price:int) -> bool:
+        #Expectations
+        # 1-order in book
+        # 2-quantity > 0 (new remaining quantity)
+        # 3-price > 0
+        # (Same price and less quantity -> reduced in place, keeps queue priority.
+        #  Otherwise the order is re-queued (and may trade) with only the net reservation difference moved.
+        #  Returns False and leaves the order untouched if the account cannot cover the difference
+        #  or a post only order would cross.)
+
+        self.__uncross_ended_call()
+
+        order = self.order_book.order_map.get(order_id)
+        assert order is not None #1
+        assert quantity > 0 #2
+        assert price > 0 #3
+        assert order.price is not None
+
+        if price == order.price and quantity == order.remaining_quantity:
+            return True
         
+        if price == order.price and quantity < order.remaining_quantity:
+            reduced_quantity = order.remaining_quantity - quantity
+            if order.side == Side.BUY:
+                self.settlement_ledger.release_cash(order, traded_quantity=reduced_quantity)
+            elif order.side == Side.SELL:
+                self.settlement_ledger.release_shares(order, traded_quantity=reduced_quantity)
+            else:
+                assert False
+
+            self.order_book.reduce_order(order, reduced_quantity)
+            return True
+
+        if order.order_type == OrderType.POST_ONLY and self.order_book.is_crossing(order.side, price):
+            return False
+        
+        is_account_available = self.settlement_ledger.limit_adjust_reserved_funds(order, quantity, price)
+        if not is_account_available:
+            return False
+
+        removed_order = self.order_book.remove_order(order_id)
+        assert removed_order is order
+        
+        order.quantity += quantity - order.remaining_quantity
+        order.remaining_quantity = quantity
+        order.price = price
+
+        if self.is_collecting:
+            self.__call_pending = True
+            is_added = self.order_book.add_order(order)
+            assert is_added
+            return True
+        
+        self.__match_limit_order(order)
+        self.__process_triggered_orders()
+        return True
+
+
+    def uncross(self) -> Optional[Tuple[int, int]]:
+        #Clears the crossed part of the book at one uniform price, price-time priority on both sides.
+        #Returns clearing price - executed volume, None if the book does not cross.
+        #(A self match kills the newer of the two orders, as an incoming wash trade is killed in CDA,
+        # so the executed volume can fall short of the volume the price was chosen for)
+
+        uncrossed = self.__uncross()
+        self.__process_triggered_orders()
+        return uncrossed
+
+
+    def __uncross(self) -> Optional[Tuple[int, int]]:
+        #Stops triggered by the uncross are left in __triggered_orders for the caller
+        self.__call_pending = False
+
+        best_bid_price = self.order_book.get_best_bid_price()
+        best_ask_price = self.order_book.get_best_ask_price()
+        if best_bid_price is None or best_ask_price is None or best_bid_price < best_ask_price:
+            return None #Continuous matching never leaves a crossed book, only a batch / call does
+        
+        clearing = find_clearing_price(self.order_book.bid_sizes, self.order_book.ask_sizes, self.last_trade_price)
+        if clearing is None:
+            return None
+
+        clearing_price, _ = clearing
+        self.__last_clearing_price = clearing_price
+
+        executed_volume = 0
+        while True:
+            matches, wash_match = self.__pair_crossed_orders(clearing_price)
+            if matches:
+                executed_volume += self.__execute_uncross(clearing_price, matches)
+
+            if wash_match is None:
+                break
+
+            #Both orders are now at the front of their side
+            buyer_order, seller_order = wash_match
+            wash_order = buyer_order if buyer_order.order_id > seller_order.order_id else seller_order
+            removed_order = self.order_book.remove_order(wash_order.order_id)
+            assert removed_order is wash_order
+
+            if wash_order.side == Side.BUY: self.settlement_ledger.release_cash(wash_order)
+            elif wash_order.side == Side.SELL: self.settlement_ledger.release_shares(wash_order)
+            else: assert False
+
+            wash_order.lifecycle = OrderLifecycle.DONE
+            wash_order.end_reason = OrderEndReasons.KILLED_WASH_TRADE
+
+        return clearing_price, executed_volume
+
+
+    def __pair_crossed_orders(self, clearing_price:int) -> Tuple[List[Tuple[Order, Order, int]], Optional[Tuple[Order, Order]]]:
+        #Walks both crossed sides in price-time priority without touching the book.
+        #Returns buyer - seller - quantity of every trade up to the first self match, and that self match (None if there is none)
+        buyer_orders = chain.from_iterable(level_queue for _, level_queue in takewhile(lambda level: level[0] >= clearing_price, self.order_book.bids.items()))
+        seller_orders = chain.from_iterable(level_queue for _, level_queue in takewhile(lambda level: level[0] <= clearing_price, self.order_book.asks.items()))
+
+        matches:List[Tuple[Order, Order, int]] = []
+        buyer_order = next(buyer_orders, None)
+        seller_order = next(seller_orders, None)
+        buyer_quantity = buyer_order.remaining_quantity if buyer_order is not None else 0
+        seller_quantity = seller_order.remaining_quantity if seller_order is not None else 0
+        while buyer_order is not None and seller_order is not None:
+            if buyer_order.agent_id == seller_order.agent_id:
+                return matches, (buyer_order, seller_order)
+
+            trade_quantity = min(buyer_quantity, seller_quantity)
+            matches.append((buyer_order, seller_order, trade_quantity))
+
+            buyer_quantity -= trade_quantity
+            if buyer_quantity == 0:
+                buyer_order = next(buyer_orders, None)
+                buyer_quantity = buyer_order.remaining_quantity if buyer_order is not None else 0
+
+            seller_quantity -= trade_quantity
+            if seller_quantity == 0:
+                seller_order = next(seller_orders, None)
+                seller_quantity = seller_order.remaining_quantity if seller_order is not None else 0
+
+        return matches, None
+
+
+    def __execute_uncross(self, clearing_price:int, matches:List[Tuple[Order, Order, int]]) -> int:
+        #One Trade per match, settled in one pass per account and filled in the book once per level.
+        #Same trades as the trade by trade loop, every trade has the clearing price -> the stop triggers and trade stats move once
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        ENV_CONFIG = get_environment_configuration()
+        timestamp = time.time()
+
+        trades = [
+            Trade(
+                trade_id=self.trade_id,
+                timestamp=timestamp,
+                macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+                micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+                seller_agent_id=seller_order.agent_id,
+                sell_order_id=seller_order.order_id,
+                buyer_agent_id=buyer_order.agent_id,
+                buy_order_id=buyer_order.order_id,
+                price=clearing_price,
+                quantity=trade_quantity,
+                fee=clearing_price * trade_quantity * ENV_CONFIG.FEE_RATE_PPM // 1000000,
+                symbol=self.symbol
+            )
+            for buyer_order, seller_order, trade_quantity in matches
+        ]
+
+        buyer_orders = [buyer_order for buyer_order, _, _ in matches]
+        seller_orders = [seller_order for _, seller_order, _ in matches]
+        self.settlement_ledger.settle_uncross(buyer_orders, seller_orders, trades)
+
+        #Filled quantity per order, in priority order (consecutive matches share an order)
+        for side, orders in ((Side.BUY, buyer_orders), (Side.SELL, seller_orders)):
+            filled_orders:List[Tuple[Order, int]] = []
+            for order, trade in zip(orders, trades):
+                if filled_orders and filled_orders[-1][0] is order:
+                    filled_orders[-1] = (order, filled_orders[-1][1] + trade.quantity)
+                else:
+                    filled_orders.append((order, trade.quantity))
+
+            self.order_book.fill_best_orders(side, filled_orders)
+
+            for order, _ in filled_orders:
+                if order.remaining_quantity == 0:
+                    order.lifecycle = OrderLifecycle.DONE
+                    order.end_reason = OrderEndReasons.FILLED
+
+        executed_volume = 0
+        for trade in trades:
+            self.storage_ledger.add_trade(trade)
+            executed_volume += trade.quantity
+
+        self.last_trade_price = clearing_price
+        if self.trigger_book.order_map:
+            self.__triggered_orders.extend(self.trigger_book.pop_triggered_orders(clearing_price))
+
+        self.__last_traded_price = clearing_price
+        self.__last_trade_volume = trades[-1].quantity
+
+        self.__macro_trade_value += clearing_price * executed_volume
+        self.__macro_trade_volume += executed_volume
+
+        self.__micro_trade_count += len(trades)
+        self.__micro_trade_value += clearing_price * executed_volume
+        self.__micro_trade_volume += executed_volume
+
+        return executed_volume
+
+    
+    def cancel_agent_orders(self, agent_id:int, side:Optional[Side]=None, min_price:Optional[int]=None, max_price:Optional[int]=None) -> Tuple[Order, ...]:
+        #Expectations
+        # 1-agent_exist (ASSURED)
+        # (Mass cancel, reservations are released in one pass on the account.
+        #  Pending stops have no book price, they are included only when no price bound is given)
+
+        self.__uncross_ended_call()
+
+        orders = self.order_book.remove_agent_orders(agent_id, side, min_price, max_price)
+        if orders:
+            self.settlement_ledger.release_orders(agent_id, orders)
+
+        stop_orders:Tuple[Order, ...] = ()
+        if min_price is None and max_price is None:
+            stop_orders = self.trigger_book.remove_agent_orders(agent_id, side)
+            for stop_order in stop_orders:
+                self.settlement_ledger.release_stop_funds(stop_order)
+
+        for order in orders + stop_orders:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.CANCELLED
+
+        return orders + stop_orders
+
+    
+    def expire_due_orders(self) -> Tuple[Order, ...]:
+        #Good till orders whose tick has come, O(expired) -> the heap only yields due entries
+        self.__uncross_ended_call()
+
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        hybrid_time = (SIM_REALTIME_DATA.MACRO_TICK, SIM_REALTIME_DATA.MICRO_TICK)
+
+        expired_orders:Dict[int, List[Order]] = {} #AgentID -> book orders
+        expired_stop_orders:List[Order] = []
+        while self.__expiry_heap and self.__expiry_heap[0][:2] <= hybrid_time:
+            _, _, order_id = heapq.heappop(self.__expiry_heap)
+
+            order = self.order_book.remove_order(order_id)
+            if order is not None:
+                expired_orders.setdefault(order.agent_id, []).append(order)
+                continue
+
+            stop_order = self.trigger_book.remove_order(order_id)
+            if stop_order is not None:
+                self.settlement_ledger.release_stop_funds(stop_order)
+                expired_stop_orders.append(stop_order)
+
+        for agent_id, orders in expired_orders.items():
+            self.settlement_ledger.release_orders(agent_id, orders)
+
+        orders = tuple(order for orders in expired_orders.values() for order in orders) + tuple(expired_stop_orders)
+        for order in orders:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.EXPIRED
+
+        return orders
+
     
     def cancel_order(self, order_id:int) -> None:
         #Expectations
@@ -561,8 +1574,17 @@ class CDAEngine:
         # 6-0 < remaining_quantity < quantity (ASSURED)
         # 7-lifecycle = Working (ASSURED)
         # 8-end_reason = None (ASSURED)
-        # 9-order in book
+        # 9-order in book or pending in the trigger book
 
+        self.__uncross_ended_call()
+
+        stop_order = self.trigger_book.remove_order(order_id)
+        if stop_order is not None:
+            self.settlement_ledger.release_stop_funds(stop_order)
+            stop_order.lifecycle = OrderLifecycle.DONE
+            stop_order.end_reason = OrderEndReasons.CANCELLED
+            return
+        
         order = self.order_book.remove_order(order_id)
         assert order is not None #9
         
@@ -586,29 +1608,42 @@ class CDAEngine:
         # 5-0 < remaining_quantity < quantity (ASSURED)
         # 6-lifecycle = WORKING (ASSURED)
         # 7-end_reason = NONE (ASSURED)
-        
-        book = self.order_book.expire_book()
-        if book is None:
-            return
 
-        bids, asks = book
-        
-        for bid in bids:
-            self.settlement_ledger.release_cash(bid)
-            bid.lifecycle = OrderLifecycle.DONE
-            bid.end_reason = OrderEndReasons.EXPIRED
+        if self.closing_auction:
+            #The session ends with the call, stops triggered by the closing uncross expire with their reservation
+            self.__uncross()
+
+            #The closing trades belong to the ended session, not to the first market data of the next one
+            self.__last_traded_price = None
+            self.__last_trade_volume = None
+            self.__micro_trade_count = 0
+            self.__micro_trade_value = 0
+            self.__micro_trade_volume = 0
 
-        for ask in asks:
-            self.settlement_ledger.release_shares(ask)
-            ask.lifecycle = OrderLifecycle.DONE
-            ask.end_reason = OrderEndReasons.EXPIRED
+        self.__expiry_heap.clear() #Everything still working expires below
 
         self.__macro_trade_value = 0
         self.__macro_trade_volume = 0
+
+        #Pending (and just triggered) stops and the resting book are released together, summed per account
+        stop_orders = self.trigger_book.expire_book() + tuple(self.__triggered_orders)
+        self.__triggered_orders.clear()
+
+        book = self.order_book.expire_book()
+        if book is None:
+            self.settlement_ledger.expire_orders(stop_orders)
+            return
+
+        bids, asks = book
+        self.settlement_ledger.expire_orders(stop_orders + bids + asks)
         
             
-    def get_market_data(self) -> MarketData:
-        SIM_REALTIME_DATA = get_simulation_realtime_data()
+    def __get_book_fields(self) -> BookFields:
+        #Reuses the previous snapshot while the book is untouched (sequence is bumped on every book change)
+        sequence = self.order_book.sequence
+        if self.__book_fields is not None and self.__book_fields[0] == sequence:
+            return self.__book_fields[1]
+        
         ENV_CONFIG = get_environment_configuration()
         
         l1_bids = self.order_book.get_l1_bids()
@@ -645,6 +1680,24 @@ class CDAEngine:
         else:
             imbalance_N = (bids_depth_N - asks_depth_N) / (bids_depth_N + asks_depth_N) 
 
+        book_fields = (l1_bids, l1_asks, spread, mid_price, micro_price, l2_bids, l2_asks, N, bids_depth_N, asks_depth_N, imbalance_N)
+        self.__book_fields = (sequence, book_fields)
+
+        return book_fields
+
+    
+    def get_market_data(self) -> MarketData:
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+
+        if self.batch_auction or not self.is_collecting:
+            self.uncross() #The batch / the call collected until now
+
+        indicative_clearing_price = self.__last_clearing_price
+        self.__last_clearing_price = None
+
+        book_sequence = self.order_book.sequence
+        l1_bids, l1_asks, spread, mid_price, micro_price, l2_bids, l2_asks, N, bids_depth_N, asks_depth_N, imbalance_N = self.__get_book_fields()
+
         last_traded_price = self.__last_traded_price
         last_trade_volume = self.__last_trade_volume
             
@@ -666,11 +1719,15 @@ class CDAEngine:
         self.__micro_trade_count = 0
         self.__micro_trade_value = 0
         self.__micro_trade_volume = 0
+
+        self.book_events = self.order_book.drain_events()
         
         return MarketData(
             timestamp=time.time(),
             macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
             micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+            symbol=self.symbol,
+            book_sequence=book_sequence,
             trade_count=trade_count,
             trade_volume=trade_volume,
             last_traded_price=last_traded_price,
@@ -687,6 +1744,18 @@ class CDAEngine:
             asks_depth_N=asks_depth_N,
             imbalance_N=imbalance_N,
             vwap_macro=vwap_macro,
-            vwap_micro=vwap_micro
+            vwap_micro=vwap_micro,
+            indicative_clearing_price=indicative_clearing_price
         )
 
+
+    def get_book_snapshot(self) -> BookSnapshot:
+        return self.order_book.get_snapshot()
+
+
+    def get_bid_depth(self) -> DepthIndex:
+        return self.order_book.bid_depth
+
+
+    def get_ask_depth(self) -> DepthIndex:
+        return self.order_book.ask_depth
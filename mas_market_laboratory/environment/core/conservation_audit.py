@@ -0,0 +1,189 @@
+from __future__ import annotations
+from typing import Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+from enum import Enum, auto
+from itertools import chain
+import numpy as np
+
+from environment.models.order import OrderType, Side
+from environment.configs import get_environment_configuration
+
+from simulation.configs import get_simulation_configurations, get_simulation_realtime_data
+
+from .cda_engine import CDAEngine
+from .settlement_ledger import SettlementLedger
+from .storage_ledger import StorageLedger
+
+
+
+class AuditInvariant(Enum):
+    CASH = auto() #Free + reserved + deposited + pending cash + collected fees = issued cash
+    SHARES = auto() #Free + reserved + pending shares = issued shares, per symbol
+    RESERVED_CASH = auto() #Cash reservations = resting bids + pending buy stop limits (orders, quantity, notional)
+    RESERVED_SHARES = auto() #Share reservations = resting asks + pending sell stops (orders, quantity)
+
+
+@dataclass(frozen=True)
+class AuditViolation:
+    macro_tick:int
+    micro_tick:int
+    invariant:AuditInvariant
+    expected:int
+    actual:int
+    context:str #What was summed (symbol, measure)
+
+
+class ConservationAudit:
+    #Global invariants checked every interval micro ticks from whole-ledger sums, instead of per operation.
+    #The sums are taken over numpy arrays built in one pass over the accounts and the book levels,
+    #violations are kept, stored and returned, the run goes on (asserts may be off, python -O)
+    settlement_ledger:SettlementLedger
+    cda_engines:Tuple[CDAEngine, ...]
+    storage_ledger:StorageLedger
+
+    interval:Optional[int] #Micro ticks between audits, None -> audited only on demand
+    audit_count:int
+    violations:List[AuditViolation]
+
+    __last_audit_micro_tick_index:Optional[int]
+
+
+    def __init__(self, settlement_ledger:SettlementLedger, cda_engines:Tuple[CDAEngine, ...], storage_ledger:StorageLedger) -> None:
+        self.settlement_ledger = settlement_ledger
+        self.cda_engines = cda_engines
+        self.storage_ledger = storage_ledger
+
+        ENV_CONFIG = get_environment_configuration()
+        self.interval = ENV_CONFIG.AUDIT_INTERVAL
+        assert self.interval is None or self.interval > 0
+
+        self.audit_count = 0
+        self.violations = []
+        self.__last_audit_micro_tick_index = None
+
+
+    def audit_if_due(self) -> Tuple[AuditViolation, ...]:
+        if self.interval is None:
+            return ()
+
+        SIM_CONFIG = get_simulation_configurations()
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        micro_tick_index = SIM_REALTIME_DATA.MACRO_TICK * SIM_CONFIG.SIMULATION_MICRO_TICK + SIM_REALTIME_DATA.MICRO_TICK
+
+        if self.__last_audit_micro_tick_index is not None and micro_tick_index - self.__last_audit_micro_tick_index < self.interval:
+            return ()
+
+        self.__last_audit_micro_tick_index = micro_tick_index
+        return self.audit()
+
+
+    def audit(self) -> Tuple[AuditViolation, ...]:
+        ENV_CONFIG = get_environment_configuration()
+        settlement_ledger = self.settlement_ledger
+        accounts = tuple(settlement_ledger.accounts.values())
+        symbol_count = len(self.cda_engines)
+
+        violations:List[AuditViolation] = []
+
+        #Account side
+        free_cash = self.__sum(account.cash for account in accounts)
+        deposited_cash = self.__sum(chain.from_iterable(account.deposited_cash.values() for account in accounts))
+        pending_cash = self.__sum(settlement_ledger.pending_cash.values())
+
+        reservations = np.fromiter(
+            chain.from_iterable(account.reserved_cash.values() for account in accounts),
+            dtype=np.dtype((np.int64, 2))
+        ).reshape(-1, 2)
+        reserved_quantities = reservations[:, 0]
+        reserved_costs = reserved_quantities * reservations[:, 1]
+        reserved_cash = int(reserved_costs.sum()) + int(self.__get_fees(reserved_costs, ENV_CONFIG.FEE_RATE_PPM).sum())
+
+        free_shares = np.fromiter(
+            chain.from_iterable(account.shares.values() for account in accounts),
+            dtype=np.int64
+        ).reshape(-1, symbol_count).sum(axis=0)
+        reserved_shares = self.__sum(chain.from_iterable(account.reserved_shares.values() for account in accounts))
+        reserved_share_orders = sum(len(account.reserved_shares) for account in accounts)
+
+        pending_shares = [0] * symbol_count
+        for (_, symbol), shares in settlement_ledger.pending_shares.items():
+            pending_shares[symbol] += shares
+
+        #Book side
+        book_bid_orders = book_bid_quantity = book_bid_notional = 0
+        book_ask_orders = 0
+        book_ask_quantities:List[int] = [] #Symbol -> reserved shares
+        for cda_engine in self.cda_engines:
+            order_book = cda_engine.order_book
+            bid_levels = np.fromiter(order_book.bid_sizes.items(), dtype=np.dtype((np.int64, 2))).reshape(-1, 2)
+            bid_order_count = sum(map(len, order_book.bids.values()))
+            book_bid_orders += bid_order_count
+            book_bid_quantity += int(bid_levels[:, 1].sum())
+            book_bid_notional += int((bid_levels[:, 0] * bid_levels[:, 1]).sum())
+
+            ask_quantity = self.__sum(order_book.ask_sizes.values())
+            book_ask_orders += len(order_book.order_map) - bid_order_count
+
+            for stop_order in cda_engine.trigger_book.order_map.values():
+                if stop_order.side == Side.SELL:
+                    book_ask_orders += 1
+                    ask_quantity += stop_order.quantity
+
+                elif stop_order.order_type == OrderType.STOP_LIMIT:
+                    assert stop_order.price is not None
+                    book_bid_orders += 1
+                    book_bid_quantity += stop_order.quantity
+                    book_bid_notional += stop_order.quantity * stop_order.price
+
+            book_ask_quantities.append(ask_quantity)
+
+        book_ask_quantity = sum(book_ask_quantities)
+
+        #Invariants
+        cash = free_cash + reserved_cash + deposited_cash + pending_cash + settlement_ledger.collected_fees
+        self.__check(violations, AuditInvariant.CASH, settlement_ledger.issued_cash, cash, f"free={free_cash} reserved={reserved_cash} deposited={deposited_cash} pending={pending_cash} fees={settlement_ledger.collected_fees}")
+
+        for symbol in range(symbol_count):
+            shares = int(free_shares[symbol]) + book_ask_quantities[symbol] + pending_shares[symbol]
+            self.__check(violations, AuditInvariant.SHARES, settlement_ledger.issued_shares[symbol], shares, f"symbol={symbol} free={int(free_shares[symbol])} reserved={book_ask_quantities[symbol]} pending={pending_shares[symbol]}")
+
+        self.__check(violations, AuditInvariant.RESERVED_CASH, book_bid_orders, len(reserved_quantities), "orders")
+        self.__check(violations, AuditInvariant.RESERVED_CASH, book_bid_quantity, int(reserved_quantities.sum()), "quantity")
+        self.__check(violations, AuditInvariant.RESERVED_CASH, book_bid_notional, int(reserved_costs.sum()), "notional")
+        self.__check(violations, AuditInvariant.RESERVED_SHARES, book_ask_orders, reserved_share_orders, "orders")
+        self.__check(violations, AuditInvariant.RESERVED_SHARES, book_ask_quantity, reserved_shares, "quantity")
+
+        self.audit_count += 1
+        self.violations.extend(violations)
+        for violation in violations:
+            self.storage_ledger.add_audit_violation(violation)
+
+        return tuple(violations)
+
+
+    def __check(self, violations:List[AuditViolation], invariant:AuditInvariant, expected:int, actual:int, context:str) -> None:
+        if expected == actual:
+            return
+
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        violations.append(
+            AuditViolation(
+                macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+                micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+                invariant=invariant,
+                expected=expected,
+                actual=actual,
+                context=context
+            )
+        )
+
+
+    @staticmethod
+    def __sum(values:Iterable[int]) -> int:
+        return int(np.fromiter(values, dtype=np.int64).sum())
+
+
+    @staticmethod
+    def __get_fees(costs:np.ndarray, fee_rate_ppm:int) -> np.ndarray:
+        #cost * fee_rate_ppm // 1000000 of every reservation, split so the product stays in int64
+        return costs // 1000000 * fee_rate_ppm + costs % 1000000 * fee_rate_ppm // 1000000
@@ -0,0 +1,191 @@
+from __future__ import annotations
+from typing import Iterator, List, Optional, Tuple
+from sortedcontainers import SortedDict
+
+from environment.views import DepthIndexView
+
+
+
+class DepthIndex:
+    #Cumulative depth of one book side in sweep order (asks ascending, bids descending).
+    #Fenwick trees over a bucketed price grid keep size and notional per bucket,
+    #levels inside a bucket are resolved exactly, so every query is O(log n) + one bucket walk.
+    descending:bool
+    bucket_width:int
+    bucket_count:int
+
+    levels:SortedDict[int, int] #price -> total remaining quantity
+    total_quantity:int
+
+    __quantity_tree:List[int] #1-based Fenwick tree, bucket -> quantity
+    __notional_tree:List[int] #1-based Fenwick tree, bucket -> price * quantity
+    __top_step:int
+
+
+    def __init__(self, descending:bool, bucket_width:int, max_price:int) -> None:
+        assert bucket_width > 0
+        assert max_price > 0
+
+        self.descending = descending
+        self.bucket_width = bucket_width
+        self.bucket_count = max_price // bucket_width + 1 #Prices above max_price share the last bucket
+
+        self.levels = SortedDict()
+        self.total_quantity = 0
+
+        self.__quantity_tree = [0] * (self.bucket_count + 1)
+        self.__notional_tree = [0] * (self.bucket_count + 1)
+
+        self.__top_step = 1
+        while self.__top_step * 2 <= self.bucket_count:
+            self.__top_step *= 2
+
+
+    def clear(self) -> None:
+        #Emptied in place, views handed out before keep following this index
+        self.levels.clear()
+        self.total_quantity = 0
+
+        for position in range(self.bucket_count + 1):
+            self.__quantity_tree[position] = 0
+            self.__notional_tree[position] = 0
+
+
+    def __get_bucket(self, price:int) -> int:
+        return min(max(price // self.bucket_width, 0), self.bucket_count - 1)
+
+
+    def __get_position(self, bucket:int) -> int:
+        #bucket -> 0-based position in sweep order
+        if self.descending:
+            return self.bucket_count - 1 - bucket
+
+        return bucket
+
+
+    def __get_bucket_bounds(self, bucket:int) -> Tuple[Optional[int], Optional[int]]:
+        minimum = bucket * self.bucket_width if bucket > 0 else None
+        maximum = (bucket + 1) * self.bucket_width - 1 if bucket < self.bucket_count - 1 else None
+
+        return minimum, maximum
+
+
+    def __iterate_bucket(self, bucket:int, minimum:Optional[int]=None, maximum:Optional[int]=None) -> Iterator[Tuple[int, int]]:
+        #Levels of a bucket in sweep order, optionally narrowed to [minimum, maximum]
+        bucket_minimum, bucket_maximum = self.__get_bucket_bounds(bucket)
+        if minimum is None: minimum = bucket_minimum
+        if maximum is None: maximum = bucket_maximum
+
+        for price in self.levels.irange(minimum, maximum, reverse=self.descending):
+            yield price, self.levels[price]
+
+
+    def update(self, price:int, quantity_delta:int) -> None:
+        if quantity_delta == 0:
+            return
+
+        level_size = self.levels.get(price, 0) + quantity_delta
+        assert level_size >= 0
+
+        if level_size == 0:
+            del self.levels[price]
+        else:
+            self.levels[price] = level_size
+
+        self.total_quantity += quantity_delta
+
+        notional_delta = price * quantity_delta
+        i = self.__get_position(self.__get_bucket(price)) + 1
+        while i <= self.bucket_count:
+            self.__quantity_tree[i] += quantity_delta
+            self.__notional_tree[i] += notional_delta
+            i += i & -i
+
+
+    def __prefix(self, position:int) -> Tuple[int, int]:
+        #Quantity - notional of the buckets before position (sweep order)
+        quantity = 0
+        notional = 0
+        i = position
+        while i > 0:
+            quantity += self.__quantity_tree[i]
+            notional += self.__notional_tree[i]
+            i -= i & -i
+
+        return quantity, notional
+
+
+    def __search(self, quantity:int) -> Tuple[int, int, int]:
+        #First bucket (sweep order) where the cumulative quantity reaches quantity
+        #Returns position - quantity before it - notional before it
+        position = 0
+        quantity_before = 0
+        notional_before = 0
+        step = self.__top_step
+        while step > 0:
+            next_position = position + step
+            if next_position <= self.bucket_count and quantity_before + self.__quantity_tree[next_position] < quantity:
+                position = next_position
+                quantity_before += self.__quantity_tree[next_position]
+                notional_before += self.__notional_tree[next_position]
+            step >>= 1
+
+        return position, quantity_before, notional_before
+
+
+    def depth_up_to(self, price:int) -> int:
+        #Total quantity at prices equal or better than price (asks <= price, bids >= price)
+        bucket = self.__get_bucket(price)
+        quantity, _ = self.__prefix(self.__get_position(bucket))
+
+        if self.descending:
+            bucket_levels = self.__iterate_bucket(bucket, minimum=price)
+        else:
+            bucket_levels = self.__iterate_bucket(bucket, maximum=price)
+
+        for _, level_size in bucket_levels:
+            quantity += level_size
+
+        return quantity
+
+
+    def __sweep(self, quantity:int) -> Optional[Tuple[int, int]]:
+        #Last price touched - notional paid while taking quantity in sweep order
+        if not 0 < quantity <= self.total_quantity:
+            return None
+
+        position, quantity_before, notional = self.__search(quantity)
+        bucket = self.__get_position(position) #The mapping is its own inverse
+
+        remaining_quantity = quantity - quantity_before
+        for price, level_size in self.__iterate_bucket(bucket):
+            taken_quantity = min(level_size, remaining_quantity)
+            notional += price * taken_quantity
+            remaining_quantity -= taken_quantity
+
+            if remaining_quantity == 0:
+                return price, notional
+
+        assert False
+
+
+    def price_for_quantity(self, quantity:int) -> Optional[int]:
+        #Worst price reached when taking quantity, None if the side is too thin
+        sweep = self.__sweep(quantity)
+        if sweep is None:
+            return None
+
+        return sweep[0]
+
+
+    def sweep_cost(self, quantity:int) -> Optional[int]:
+        #Notional (sum of price * quantity, before fees) of taking quantity, None if the side is too thin
+        sweep = self.__sweep(quantity)
+        if sweep is None:
+            return None
+
+        return sweep[1]
+
+
+    def create_view(self) -> DepthIndexView:
+        return DepthIndexView(self)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+from typing import Dict, List, Optional
+
+from environment.configs import get_environment_configuration
+
+from simulation.configs import get_simulation_configurations, get_simulation_realtime_data
+
+
+
+class MessageThrottle:
+    #Per-agent token buckets over the hybrid time, one token per gateway message.
+    #Buckets refill lazily (message_rate tokens per micro tick, up to message_burst) on the agent's next message,
+    #so an agent costs nothing between its messages.
+    message_rate:Optional[int] #Tokens per micro tick, None -> messages are not throttled
+    message_burst:int #Bucket capacity
+    max_open_orders:Optional[int] #Resting + pending stop orders across symbols, None -> unlimited
+
+    message_counts:Dict[int, int] #AgentID -> messages seen (throttled ones included)
+    throttled_counts:Dict[int, int] #AgentID -> messages rejected by the bucket
+    open_order_rejection_counts:Dict[int, int] #AgentID -> orders rejected by max_open_orders
+
+    __buckets:Dict[int, List[int]] #AgentID -> [tokens, micro tick index of the last refill]
+
+
+    def __init__(self) -> None:
+        ENV_CONFIG = get_environment_configuration()
+        self.message_rate = ENV_CONFIG.MESSAGE_RATE_LIMIT
+        self.message_burst = ENV_CONFIG.MESSAGE_BURST_LIMIT if ENV_CONFIG.MESSAGE_BURST_LIMIT is not None else (self.message_rate or 0)
+        self.max_open_orders = ENV_CONFIG.OPEN_ORDER_LIMIT
+
+        assert self.message_rate is None or self.message_rate > 0
+        assert self.message_rate is None or self.message_burst >= self.message_rate
+        assert self.max_open_orders is None or self.max_open_orders > 0
+
+        self.message_counts = {}
+        self.throttled_counts = {}
+        self.open_order_rejection_counts = {}
+        self.__buckets = {}
+
+
+    def admit_message(self, agent_id:int) -> bool:
+        if self.message_rate is None:
+            return True
+
+        SIM_CONFIG = get_simulation_configurations()
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        micro_tick_index = SIM_REALTIME_DATA.MACRO_TICK * SIM_CONFIG.SIMULATION_MICRO_TICK + SIM_REALTIME_DATA.MICRO_TICK
+
+        bucket = self.__buckets.get(agent_id)
+        if bucket is None:
+            bucket = [self.message_burst, micro_tick_index]
+            self.__buckets[agent_id] = bucket
+
+        elif bucket[1] != micro_tick_index:
+            bucket[0] = min(self.message_burst, bucket[0] + (micro_tick_index - bucket[1]) * self.message_rate)
+            bucket[1] = micro_tick_index
+
+        self.message_counts[agent_id] = self.message_counts.get(agent_id, 0) + 1
+
+        if bucket[0] == 0:
+            self.throttled_counts[agent_id] = self.throttled_counts.get(agent_id, 0) + 1
+            return False
+
+        bucket[0] -= 1
+        return True
+
+
+    def admit_open_order(self, agent_id:int, open_order_count:int) -> bool:
+        if self.max_open_orders is None or open_order_count < self.max_open_orders:
+            return True
+
+        self.open_order_rejection_counts[agent_id] = self.open_order_rejection_counts.get(agent_id, 0) + 1
+        return False
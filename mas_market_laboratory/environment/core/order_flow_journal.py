@@ -0,0 +1,222 @@
+from __future__ import annotations
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple, Union
+from enum import Enum, auto
+import struct
+import math
+import os
+
+from environment.models.order import OrderType, Side
+
+from simulation.configs import get_simulation_realtime_data
+
+
+
+class OrderFlowEvent(Enum):
+    REGISTER_AGENT = auto()
+    CREATE_ORDER = auto()
+    CANCEL_ORDER = auto()
+    CREATE_DEPOSIT = auto()
+    EXPIRE_SESSION = auto()
+    ECONOMY_INSIGHT = auto()
+    MARKET_DATA = auto()
+    MATURE_DEPOSITS = auto()
+    AMEND_ORDER = auto()
+    CANCEL_AGENT_ORDERS = auto()
+    EXPIRE_DUE_ORDERS = auto()
+
+
+JournalPayload = Tuple[Union[int, float, None], ...]
+
+
+JOURNAL_HEADER_STRUCT = struct.Struct("<Bii") #event - macro_tick - micro_tick
+JOURNAL_PAYLOAD_STRUCTS:Dict[OrderFlowEvent, struct.Struct] = {
+    OrderFlowEvent.REGISTER_AGENT: struct.Struct("<qdq"), #agent_id - initial_cash - initial_shares
+    OrderFlowEvent.CREATE_ORDER: struct.Struct("<qBBqddiii"), #agent_id - order_type - side - quantity - price - stop_price (NaN = None) - good_till (-1 = None) - symbol
+    OrderFlowEvent.CANCEL_ORDER: struct.Struct("<qq"), #agent_id - order_id
+    OrderFlowEvent.CREATE_DEPOSIT: struct.Struct("<qqd"), #agent_id - term - deposited_cash
+    OrderFlowEvent.EXPIRE_SESSION: struct.Struct("<"),
+    OrderFlowEvent.ECONOMY_INSIGHT: struct.Struct("<"),
+    OrderFlowEvent.MARKET_DATA: struct.Struct("<i"), #symbol
+    OrderFlowEvent.MATURE_DEPOSITS: struct.Struct("<"),
+    OrderFlowEvent.AMEND_ORDER: struct.Struct("<qqqd"), #agent_id - order_id - quantity - price
+    OrderFlowEvent.CANCEL_AGENT_ORDERS: struct.Struct("<qBddi"), #agent_id - side (0 = None) - min_price - max_price (NaN = None) - symbol (-1 = None)
+    OrderFlowEvent.EXPIRE_DUE_ORDERS: struct.Struct("<")
+}
+
+
+class OrderFlowJournal:
+    path:str
+    position:int #Bytes already written to the file
+
+    __buffer:bytearray
+    __buffer_capacity:int
+    __file:BinaryIO
+
+    
+    def __init__(self, path:str, buffer_capacity:int=1 << 20) -> None:
+        self.path = path
+        self.position = 0
+        
+        self.__buffer = bytearray()
+        self.__buffer_capacity = buffer_capacity
+        self.__file = open(self.path, "wb")
+
+        
+    def __record(self, event:OrderFlowEvent, *payload:Union[int, float]) -> None:
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+
+        self.__buffer += JOURNAL_HEADER_STRUCT.pack(event.value, SIM_REALTIME_DATA.MACRO_TICK, SIM_REALTIME_DATA.MICRO_TICK)
+        self.__buffer += JOURNAL_PAYLOAD_STRUCTS[event].pack(*payload)
+
+        if len(self.__buffer) >= self.__buffer_capacity:
+            self.flush()
+
+            
+    def record_register_agent(self, agent_id:int, initial_cash:float, initial_shares:int) -> None:
+        self.__record(OrderFlowEvent.REGISTER_AGENT, agent_id, initial_cash, initial_shares)
+
+
+    def record_create_order(
+            self,
+            agent_id:int,
+            order_type:OrderType,
+            side:Side,
+            quantity:int,
+            price:Optional[float],
+            stop_price:Optional[float],
+            good_till:Optional[Tuple[int, int]],
+            symbol:int
+    ) -> None:
+        self.__record(
+            OrderFlowEvent.CREATE_ORDER,
+            agent_id,
+            order_type.value,
+            side.value,
+            quantity,
+            math.nan if price is None else price,
+            math.nan if stop_price is None else stop_price,
+            -1 if good_till is None else good_till[0],
+            -1 if good_till is None else good_till[1],
+            symbol
+        )
+
+
+    def record_cancel_order(self, agent_id:int, order_id:int) -> None:
+        self.__record(OrderFlowEvent.CANCEL_ORDER, agent_id, order_id)
+
+
+    def record_amend_order(self, agent_id:int, order_id:int, quantity:int, price:float) -> None:
+        self.__record(OrderFlowEvent.AMEND_ORDER, agent_id, order_id, quantity, price)
+
+        
+    def record_cancel_agent_orders(self, agent_id:int, side:Optional[Side], min_price:Optional[float], max_price:Optional[float], symbol:Optional[int]) -> None:
+        self.__record(
+            OrderFlowEvent.CANCEL_AGENT_ORDERS,
+            agent_id,
+            0 if side is None else side.value,
+            math.nan if min_price is None else min_price,
+            math.nan if max_price is None else max_price,
+            -1 if symbol is None else symbol
+        )
+
+        
+    def record_create_deposit(self, agent_id:int, term:int, deposited_cash:float) -> None:
+        self.__record(OrderFlowEvent.CREATE_DEPOSIT, agent_id, term, deposited_cash)
+
+        
+    def record_expire_due_orders(self) -> None:
+        self.__record(OrderFlowEvent.EXPIRE_DUE_ORDERS)
+
+        
+    def record_expire_session(self) -> None:
+        self.__record(OrderFlowEvent.EXPIRE_SESSION)
+
+
+    def record_economy_insight(self) -> None:
+        self.__record(OrderFlowEvent.ECONOMY_INSIGHT)
+
+
+    def record_market_data(self, symbol:int) -> None:
+        self.__record(OrderFlowEvent.MARKET_DATA, symbol)
+
+
+    def record_mature_deposits(self) -> None:
+        self.__record(OrderFlowEvent.MATURE_DEPOSITS)
+
+        
+    def flush(self) -> None:
+        if not self.__buffer:
+            return
+
+        self.__file.write(self.__buffer)
+        self.__file.flush()
+        self.position += len(self.__buffer)
+        self.__buffer.clear()
+
+
+    def close(self) -> None:
+        self.flush()
+        self.__file.close()
+
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_OrderFlowJournal__file"]
+
+        return state
+
+
+    def __setstate__(self, state:Dict[str, Any]) -> None:
+        #Events recorded after the checkpoint are dropped, buffered ones come back with the state
+        self.__dict__.update(state)
+
+        self.__file = open(self.path, "r+b" if os.path.exists(self.path) else "wb")
+        self.__file.truncate(self.position)
+        self.__file.seek(0, os.SEEK_END)
+
+
+def read_order_flow_journal(path:str) -> Iterator[Tuple[OrderFlowEvent, int, int, JournalPayload]]:
+    with open(path, "rb") as journal_file:
+        data = journal_file.read()
+
+    events = {event.value: event for event in OrderFlowEvent}
+    order_types = {order_type.value: order_type for order_type in OrderType}
+    sides = {side.value: side for side in Side}
+        
+    offset = 0
+    while offset + JOURNAL_HEADER_STRUCT.size <= len(data):
+        event_value, macro_tick, micro_tick = JOURNAL_HEADER_STRUCT.unpack_from(data, offset)
+        offset += JOURNAL_HEADER_STRUCT.size
+
+        event = events[event_value]
+        payload_struct = JOURNAL_PAYLOAD_STRUCTS[event]
+        if offset + payload_struct.size > len(data): #Torn tail record
+            return
+
+        payload:JournalPayload = payload_struct.unpack_from(data, offset)
+        offset += payload_struct.size
+
+        if event == OrderFlowEvent.CREATE_ORDER:
+            agent_id, order_type, side, quantity, price, stop_price, good_till_macro_tick, good_till_micro_tick, symbol = payload
+            payload = (
+                agent_id,
+                order_types[order_type], #type:ignore[index]
+                sides[side], #type:ignore[index]
+                quantity,
+                None if math.isnan(price) else price, #type:ignore[arg-type]
+                None if math.isnan(stop_price) else stop_price, #type:ignore[arg-type]
+                None if good_till_macro_tick == -1 else (good_till_macro_tick, good_till_micro_tick), #type:ignore[assignment]
+                symbol
+            )
+
+        elif event == OrderFlowEvent.CANCEL_AGENT_ORDERS:
+            agent_id, side, min_price, max_price, symbol = payload
+            payload = (
+                agent_id,
+                None if side == 0 else sides[side], #type:ignore[index]
+                None if math.isnan(min_price) else min_price, #type:ignore[arg-type]
+                None if math.isnan(max_price) else max_price, #type:ignore[arg-type]
+                None if symbol == -1 else symbol
+            )
+            
+        yield event, macro_tick, micro_tick, payload
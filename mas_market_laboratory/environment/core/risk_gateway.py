@@ -0,0 +1,118 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+
+from environment.configs import get_environment_configuration
+from environment.models.order import LIMIT_ORDER_TYPES, OrderType, OrderEndReasons, Side
+
+from .cda_engine import CDAEngine
+from .settlement_ledger import SettlementLedger
+
+
+
+class RiskGateway:
+    #Pre-trade checks on the raw create_order / amend_order arguments, before an Order is built.
+    #Buying power and sellable shares are the account's free cash and shares, the ledger already keeps them net of
+    #every reservation, so each check is O(1) and mirrors the engine's own reserve checks.
+    settlement_ledger:SettlementLedger
+    cda_engines:Tuple[CDAEngine, ...]
+
+    funds_check:bool #Insufficient funds are rejected here instead of by the engine
+    max_order_quantity:Optional[int]
+    max_order_notional:Optional[int] #Scaled, quantity * (limit price or last trade price)
+    price_collar_ppm:Optional[int] #Max distance of a limit price from the last trade price, parts per million of it
+
+
+    def __init__(self, settlement_ledger:SettlementLedger, cda_engines:Tuple[CDAEngine, ...]) -> None:
+        self.settlement_ledger = settlement_ledger
+        self.cda_engines = cda_engines
+
+        ENV_CONFIG = get_environment_configuration()
+        self.funds_check = ENV_CONFIG.PRE_TRADE_FUNDS_CHECK
+        self.max_order_quantity = ENV_CONFIG.MAX_ORDER_QUANTITY
+        self.max_order_notional = ENV_CONFIG.MAX_ORDER_NOTIONAL
+        self.price_collar_ppm = ENV_CONFIG.PRICE_COLLAR_PPM
+
+        assert self.max_order_quantity is None or self.max_order_quantity > 0
+        assert self.max_order_notional is None or self.max_order_notional > 0
+        assert self.price_collar_ppm is None or self.price_collar_ppm >= 0
+
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.funds_check or self.max_order_quantity is not None or self.max_order_notional is not None or self.price_collar_ppm is not None
+
+
+    def check_order(self, agent_id:int, order_type:OrderType, side:Side, quantity:int, price:Optional[int], stop_price:Optional[int], symbol:int) -> OrderEndReasons:
+        #Expectations
+        # 1-agent_exist
+        # 2-symbol exist
+        # 3-arguments are valid for order_type (checked by the gateway)
+        #Returns NONE if the order may be created
+        cda_engine = self.cda_engines[symbol] #2
+
+        end_reason = self.check_order_limits(quantity, price, symbol)
+        if end_reason != OrderEndReasons.NONE:
+            return end_reason
+
+        if self.max_order_notional is not None and price is None:
+            #Unpriced orders are valued at the stop price or the last trade, not checked before the first trade
+            reference_price = stop_price if stop_price is not None else cda_engine.last_trade_price
+            if reference_price is not None and quantity * reference_price > self.max_order_notional:
+                return OrderEndReasons.REJECTED_MAX_NOTIONAL
+
+        if not self.funds_check:
+            return OrderEndReasons.NONE
+
+        account = self.settlement_ledger.accounts.get(agent_id)
+        assert account is not None #1
+
+        ENV_CONFIG = get_environment_configuration()
+
+        if side == Side.BUY:
+            if order_type in LIMIT_ORDER_TYPES or order_type == OrderType.STOP_LIMIT:
+                assert price is not None #3
+                trade_cost = quantity * price
+                required_cash = trade_cost + trade_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+            elif order_type == OrderType.MARKET:
+                #Not even one share of the best ask -> the engine would reject it on the first level
+                best_ask_price = cda_engine.order_book.get_best_ask_price()
+                if best_ask_price is None:
+                    return OrderEndReasons.NONE
+                required_cash = best_ask_price + best_ask_price * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+            else:
+                return OrderEndReasons.NONE #Buy stops are funded when they trigger
+
+            if account.cash < required_cash:
+                return OrderEndReasons.REJECTED_INSUFFICIENT_FUND
+
+        elif side == Side.SELL:
+            #Market sells fill what the account holds, the others reserve the whole quantity
+            required_shares = 1 if order_type == OrderType.MARKET else quantity
+            if account.shares[symbol] < required_shares:
+                return OrderEndReasons.REJECTED_INSUFFICIENT_FUND
+
+        else:
+            assert False
+
+        return OrderEndReasons.NONE
+
+
+    def check_order_limits(self, quantity:int, price:Optional[int], symbol:int) -> OrderEndReasons:
+        #Size, notional and collar rules only (also used by amend_order, which the engine funds itself)
+        if self.max_order_quantity is not None and quantity > self.max_order_quantity:
+            return OrderEndReasons.REJECTED_MAX_ORDER_SIZE
+
+        if price is None:
+            return OrderEndReasons.NONE
+
+        if self.max_order_notional is not None and quantity * price > self.max_order_notional:
+            return OrderEndReasons.REJECTED_MAX_NOTIONAL
+
+        if self.price_collar_ppm is not None:
+            reference_price = self.cda_engines[symbol].last_trade_price
+            if reference_price is not None and abs(price - reference_price) > reference_price * self.price_collar_ppm // 1000000:
+                return OrderEndReasons.REJECTED_PRICE_COLLAR
+
+        return OrderEndReasons.NONE
@@ -1,10 +1,10 @@
 from __future__ import annotations
-from sortedcontainers import SortedDict
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from dataclasses import dataclass
 import time
 
 from environment.models import Account, Deposit, Order, Trade
-from environment.models.order import OrderType, Side, OrderLifecycle, OrderEndReasons
+from environment.models.order import LIMIT_ORDER_TYPES, STOP_ORDER_TYPES, OrderType, Side, OrderLifecycle, OrderEndReasons
 from environment.configs import get_environment_configuration
 
 from simulation.configs.simulation_configurations import get_simulation_configurations
@@ -14,21 +14,52 @@ from .storage_ledger import StorageLedger
 
 
 
+@dataclass
+class MaturingDeposits:
+    #Deposits of one account maturing at the same macro tick, summed as they are created
+    deposit_ids:List[int]
+    deposited_cash:int
+    matured_cash:int
+
+
 class SettlementLedger:
     storage_ledger:StorageLedger
     
     accounts:Dict[int, Account] #AgentID -> Account
-    open_deposits:SortedDict[int, List[Deposit]]
+    deposit_buckets:List[Dict[int, MaturingDeposits]] #Maturity macro_tick -> AgentID -> open deposits, preallocated up to SIMULATION_MACRO_TICK
+
+    netted_settlement:bool #Trade credits are applied once per account at the end of the micro tick
+    pending_cash:Dict[int, int] #AgentID -> cash credited since the last apply_netted_credits
+    pending_shares:Dict[Tuple[int, int], int] #(AgentID, Symbol) -> shares credited since the last apply_netted_credits
+
+    #Conservation totals (see ConservationAudit)
+    issued_cash:int #Initial cash + deposit interest
+    issued_shares:Dict[int, int] #Symbol -> initial shares
+    collected_fees:int #Trade fees of both sides + the reservation fee rounding kept on partial releases
     
     __next_account_id:int
     __next_deposit_id:int
+    __next_trade_id:int #Shared by every symbol's CDAEngine, trade ids stay unique and increasing
+    __next_maturity_macro_tick:int #Buckets below it are settled
 
     
     def __init__(self, storage_ledger:StorageLedger) -> None:
         self.accounts = {}
-        self.open_deposits = SortedDict()
+        SIM_CONFIG = get_simulation_configurations()
+        self.deposit_buckets = [{} for _ in range(SIM_CONFIG.SIMULATION_MACRO_TICK + 1)]
+        self.__next_maturity_macro_tick = 0
         self.__next_account_id = 0
         self.__next_deposit_id = 0
+        self.__next_trade_id = 0
+
+        ENV_CONFIG = get_environment_configuration()
+        self.netted_settlement = ENV_CONFIG.NETTED_SETTLEMENT
+        self.pending_cash = {}
+        self.pending_shares = {}
+
+        self.issued_cash = 0
+        self.issued_shares = {symbol: 0 for symbol in range(len(ENV_CONFIG.SYMBOLS))}
+        self.collected_fees = 0
 
         self.storage_ledger = storage_ledger
 
@@ -48,8 +79,17 @@ class SettlementLedger:
 
         return deposit_id
 
+
+    @property
+    def trade_id(self) -> int:
+        trade_id = self.__next_trade_id
+        self.__next_trade_id += 1
+
+        return trade_id
+
     
     def register_account(self, agent_id:int, initial_cash:float=0.0, initial_shares:int=0) -> Account:
+        #initial_shares is given in every symbol
         assert agent_id not in self.accounts
         assert initial_cash >= 0
         assert initial_shares >= 0
@@ -59,11 +99,15 @@ class SettlementLedger:
             self.account_id,
             agent_id,
             int(initial_cash * ENV_CONFIG.PRICE_SCALE),
-            initial_shares
+            {symbol: initial_shares for symbol in range(len(ENV_CONFIG.SYMBOLS))}
         )
 
         self.accounts[agent_id] = account
 
+        self.issued_cash += account.cash
+        for symbol in self.issued_shares:
+            self.issued_shares[symbol] += initial_shares
+
         return account
 
 
@@ -83,7 +127,7 @@ class SettlementLedger:
         # 8-average_trade_price = None
         # 9-trades = {}
         
-        assert order.order_type == OrderType.LIMIT #2
+        assert order.order_type in LIMIT_ORDER_TYPES #2
         assert order.price is not None #3
         assert order.price > 0 #3
         assert order.quantity > 0 #4
@@ -108,22 +152,162 @@ class SettlementLedger:
 
             account.reserved_cash[order.order_id] = (order.quantity, order.price)
             account.cash -= required_cash
+            account.version += 1
             return True
             
         elif order.side == Side.SELL:
             required_shares = order.quantity
 
-            if account.shares < required_shares:
+            if account.shares[order.symbol] < required_shares:
                 return False
 
             account.reserved_shares[order.order_id] = order.quantity
-            account.shares -= required_shares
+            account.shares[order.symbol] -= required_shares
+            account.version += 1
             return True
         
         else:
             assert False
 
             
+    def limit_adjust_reserved_funds(self, order:Order, quantity:int, price:int) -> bool:
+        # Expectations:
+        # 1-agent_exist
+        # 2-order_type = Limit
+        # 3-lifecycle = WORKING
+        # 4-end_reason = NONE
+        # 5-remaining_quantity is reserved in the account
+        # 6-quantity > 0 && price > 0
+        # (Moves only the net difference between the current and the new (quantity, price) reservation)
+
+        account = self.accounts.get(order.agent_id)
+        assert account is not None #1
+
+        assert order.order_type in LIMIT_ORDER_TYPES #2
+        assert order.lifecycle == OrderLifecycle.WORKING #3
+        assert order.end_reason == OrderEndReasons.NONE #4
+        assert quantity > 0 and price > 0 #6
+
+        ENV_CONFIG = get_environment_configuration()
+        
+        if order.side == Side.BUY:
+            assert account.reserved_cash[order.order_id] == (order.remaining_quantity, order.price) #5
+            reserved_quantity, reserved_price = account.reserved_cash[order.order_id]
+            
+            reserved_cost = reserved_quantity * reserved_price
+            reserved_cash = reserved_cost + reserved_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+            trade_cost = quantity * price
+            required_cash = trade_cost + trade_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+            if account.cash < required_cash - reserved_cash:
+                return False
+
+            account.reserved_cash[order.order_id] = (quantity, price)
+            account.cash -= required_cash - reserved_cash
+            account.version += 1
+            return True
+
+        elif order.side == Side.SELL:
+            assert account.reserved_shares[order.order_id] == order.remaining_quantity #5
+            reserved_quantity = account.reserved_shares[order.order_id]
+
+            if account.shares[order.symbol] < quantity - reserved_quantity:
+                return False
+
+            account.reserved_shares[order.order_id] = quantity
+            account.shares[order.symbol] -= quantity - reserved_quantity
+            account.version += 1
+            return True
+        
+        else:
+            assert False
+
+            
+    def stop_check_and_reserve_funds(self, order:Order) -> bool:
+        # Expectations:
+        # 1-agent_exist
+        # 2-order_type = Stop / Stop limit
+        # 3-If Stop limit -> price != None && price > 0
+        # 4-quantity > 0
+        # 5-remaining_quantity = quantity
+        # 6-lifecycle = WORKING
+        # 7-end_reason = NONE
+        # (Sell stops hold their shares, buy stop limits their cash like a limit order,
+        #  buy stops are checked against the cash only when they trigger, like market orders)
+
+        account = self.accounts.get(order.agent_id)
+        assert account is not None #1
+
+        assert order.order_type in STOP_ORDER_TYPES #2
+        if order.order_type == OrderType.STOP_LIMIT: assert order.price is not None and order.price > 0 #3
+        assert order.quantity > 0 #4
+        assert order.remaining_quantity == order.quantity #5
+        assert order.lifecycle == OrderLifecycle.WORKING #6
+        assert order.end_reason == OrderEndReasons.NONE #7
+
+        if order.side == Side.BUY:
+            if order.order_type == OrderType.STOP:
+                return True
+
+            assert order.price is not None
+            ENV_CONFIG = get_environment_configuration()
+            trade_cost = order.quantity * order.price
+            required_cash = trade_cost + trade_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+            if account.cash < required_cash:
+                return False
+
+            account.reserved_cash[order.order_id] = (order.quantity, order.price)
+            account.cash -= required_cash
+            account.version += 1
+            return True
+
+        elif order.side == Side.SELL:
+            if account.shares[order.symbol] < order.quantity:
+                return False
+
+            account.reserved_shares[order.order_id] = order.quantity
+            account.shares[order.symbol] -= order.quantity
+            account.version += 1
+            return True
+
+        else:
+            assert False
+
+
+    def release_stop_funds(self, order:Order) -> None:
+        # Expectations:
+        # 1-agent_exist
+        # 2-order_type = Stop / Stop limit (pending)
+        # 3-lifecycle = WORKING
+        # 4-end_reason = NONE
+        # (Gives back everything stop_check_and_reserve_funds took)
+
+        account = self.accounts.get(order.agent_id)
+        assert account is not None #1
+
+        assert order.order_type in STOP_ORDER_TYPES #2
+        assert order.lifecycle == OrderLifecycle.WORKING #3
+        assert order.end_reason == OrderEndReasons.NONE #4
+
+        if order.side == Side.BUY:
+            if order.order_type == OrderType.STOP:
+                return
+
+            ENV_CONFIG = get_environment_configuration()
+            reserved_quantity, reserved_price = account.reserved_cash.pop(order.order_id)
+            reserved_cost = reserved_quantity * reserved_price
+            account.cash += reserved_cost + reserved_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+        elif order.side == Side.SELL:
+            account.shares[order.symbol] += account.reserved_shares.pop(order.order_id)
+
+        else:
+            assert False
+
+        account.version += 1
+
+            
     def market_calculate_possible_quantities(self, order:Order, trade_price:Optional[int]=None) -> int:
         # Expectations
         # 1-agent_exist
@@ -151,7 +335,7 @@ class SettlementLedger:
             return min(account.cash // (trade_price + trade_fee), order.remaining_quantity)
 
         elif order.side == Side.SELL:
-            return min(order.remaining_quantity, account.shares)
+            return min(order.remaining_quantity, account.shares[order.symbol])
         
         else:
             assert False
@@ -175,7 +359,7 @@ class SettlementLedger:
             account = self.accounts.get(order.agent_id)
             assert account is not None #1
 
-        assert order.order_type == OrderType.LIMIT #2
+        assert order.order_type in LIMIT_ORDER_TYPES #2
         assert order.price is not None #3
         assert order.price > 0 #3
         assert order.quantity > 0 #4
@@ -201,7 +385,11 @@ class SettlementLedger:
         if account.reserved_cash[order.order_id][0] == 0:
             del account.reserved_cash[order.order_id]
 
+        else:
+            self.collected_fees += self.__get_fee_rounding(reserved_quantity, released_quantity, reserved_price, released_fee)
+
         account.cash += released_cash
+        account.version += 1
 
         
     def release_shares(self, order:Order, account:Optional[Account]=None, traded_quantity:Optional[int]=None) -> None:
@@ -220,7 +408,7 @@ class SettlementLedger:
             account = self.accounts.get(order.agent_id)
             assert account is not None #1
 
-        assert order.order_type == OrderType.LIMIT #2
+        assert order.order_type in LIMIT_ORDER_TYPES #2
         assert order.price is not None #3
         assert order.price > 0 #3
         assert order.quantity > 0 #4
@@ -239,7 +427,127 @@ class SettlementLedger:
         if account.reserved_shares[order.order_id] == 0:
             del account.reserved_shares[order.order_id]
 
-        account.shares += released_quantity
+        account.shares[order.symbol] += released_quantity
+        account.version += 1
+
+        
+    def release_orders(self, agent_id:int, orders:Iterable[Order]) -> None:
+        # Expectations (for every order)
+        # 1-agent_exist
+        # 2-order.agent_id = agent_id
+        # 3-order_type = Limit
+        # 4-lifecycle = WORKING
+        # 5-end_reason = NONE
+        # 6-remaining_quantity is reserved in the account
+        # (Bulk release_cash / release_shares of the full remaining quantity, same per order fee rounding)
+
+        account = self.accounts.get(agent_id)
+        assert account is not None #1
+
+        ENV_CONFIG = get_environment_configuration()
+
+        released_cash = 0
+        released_shares:Dict[int, int] = {} #Symbol -> shares
+        for order in orders:
+            assert order.agent_id == agent_id #2
+            assert order.order_type in LIMIT_ORDER_TYPES #3
+            assert order.lifecycle == OrderLifecycle.WORKING #4
+            assert order.end_reason == OrderEndReasons.NONE #5
+
+            if order.side == Side.BUY:
+                reserved_quantity, reserved_price = account.reserved_cash.pop(order.order_id)
+                assert (reserved_quantity, reserved_price) == (order.remaining_quantity, order.price) #6
+                
+                released_cost = reserved_quantity * reserved_price
+                released_cash += released_cost + released_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+            elif order.side == Side.SELL:
+                reserved_quantity = account.reserved_shares.pop(order.order_id)
+                assert reserved_quantity == order.remaining_quantity #6
+                
+                released_shares[order.symbol] = released_shares.get(order.symbol, 0) + reserved_quantity
+                
+            else:
+                assert False
+
+        account.cash += released_cash
+        for symbol, shares in released_shares.items():
+            account.shares[symbol] += shares
+        account.version += 1
+
+
+    def expire_orders(self, orders:Tuple[Order, ...]) -> None:
+        # Expectations (for every order)
+        # 1-agent_exist (ASSURED)
+        # 2-order_type = Limit / Post only (resting) or Stop / Stop limit (pending) (ASSURED)
+        # 3-lifecycle = WORKING (ASSURED)
+        # 4-end_reason = NONE (ASSURED)
+        # 5-remaining_quantity is reserved in the account, buy stops reserve nothing (ASSURED)
+        # (Session end, one pass over the orders: releases are summed per account with the per order fee rounding,
+        #  an account whose every reservation expires has its reservation dicts cleared at once)
+
+        ENV_CONFIG = get_environment_configuration()
+        fee_rate_ppm = ENV_CONFIG.FEE_RATE_PPM
+
+        released_cash:Dict[int, int] = {} #AgentID -> cash
+        released_cash_counts:Dict[int, int] = {} #AgentID -> expired cash reservations
+        released_shares:Dict[Tuple[int, int], int] = {} #(AgentID, Symbol) -> shares
+        released_share_counts:Dict[int, int] = {} #AgentID -> expired share reservations
+        for order in orders:
+            order.lifecycle = OrderLifecycle.DONE
+            order.end_reason = OrderEndReasons.EXPIRED
+
+            agent_id = order.agent_id
+            if order.side == Side.BUY:
+                if order.price is None: #Buy stop
+                    continue
+
+                released_cost = order.remaining_quantity * order.price
+                released_cash[agent_id] = released_cash.get(agent_id, 0) + released_cost + released_cost * fee_rate_ppm // 1000000
+                released_cash_counts[agent_id] = released_cash_counts.get(agent_id, 0) + 1
+
+            else:
+                share_key = (agent_id, order.symbol)
+                released_shares[share_key] = released_shares.get(share_key, 0) + order.remaining_quantity
+                released_share_counts[agent_id] = released_share_counts.get(agent_id, 0) + 1
+
+        #Accounts that keep reservations elsewhere (other symbols) drop the expired ones one by one below
+        partial_agent_ids:Set[int] = set()
+
+        for agent_id, cash in released_cash.items():
+            account = self.accounts[agent_id]
+            if released_cash_counts[agent_id] == len(account.reserved_cash):
+                account.reserved_cash.clear()
+            else:
+                partial_agent_ids.add(agent_id)
+
+            account.cash += cash
+            account.version += 1
+
+        for agent_id, count in released_share_counts.items():
+            account = self.accounts[agent_id]
+            if count == len(account.reserved_shares):
+                account.reserved_shares.clear()
+            else:
+                partial_agent_ids.add(agent_id)
+
+        for (agent_id, symbol), shares in released_shares.items():
+            account = self.accounts[agent_id]
+            account.shares[symbol] += shares
+            account.version += 1
+
+        if not partial_agent_ids:
+            return
+
+        for order in orders:
+            if order.agent_id not in partial_agent_ids:
+                continue
+
+            account = self.accounts[order.agent_id]
+            if order.side == Side.BUY:
+                account.reserved_cash.pop(order.order_id, None)
+            else:
+                account.reserved_shares.pop(order.order_id, None)
 
         
     def settle_trade(self, buyer_order:Order, seller_order:Order, trade:Trade) -> None:
@@ -258,6 +566,7 @@ class SettlementLedger:
         # 11-trade.sell_order_id = seller_order.order_id
         # 12-price > 0
         # 13-quantity > 0
+        # 14-symbol = buyer_order.symbol = seller_order.symbol
 
         buyer_account = self.accounts.get(buyer_order.agent_id)
         seller_account = self.accounts.get(seller_order.agent_id)
@@ -277,27 +586,37 @@ class SettlementLedger:
         assert trade.sell_order_id == seller_order.order_id # 11
         assert trade.price > 0 #12
         assert trade.quantity > 0 #13
+        assert trade.symbol == buyer_order.symbol == seller_order.symbol #14
         
-        if buyer_order.order_type == OrderType.LIMIT:
-            self.release_cash(buyer_order, buyer_account, trade.quantity)
-        
-        if seller_order.order_type == OrderType.LIMIT:
-            self.release_shares(seller_order, seller_account, trade.quantity)
+        if self.netted_settlement:
+            self.__settle_trade_netted(buyer_order, seller_order, trade, buyer_account, seller_account)
+
+        else:
+            if buyer_order.order_type in LIMIT_ORDER_TYPES:
+                self.release_cash(buyer_order, buyer_account, trade.quantity)
             
-        trade_cost = trade.quantity * trade.price
+            if seller_order.order_type in LIMIT_ORDER_TYPES:
+                self.release_shares(seller_order, seller_account, trade.quantity)
+                
+            trade_cost = trade.quantity * trade.price
+
+            buyer_account.cash -= trade_cost
+            buyer_account.shares[trade.symbol] += trade.quantity
+            buyer_account.cash -= trade.fee
+            
+            seller_account.cash += trade_cost
+            seller_account.shares[trade.symbol] -= trade.quantity
+            seller_account.cash -= trade.fee
 
-        buyer_account.cash -= trade_cost
-        buyer_account.shares += trade.quantity
-        buyer_account.cash -= trade.fee
-        
-        seller_account.cash += trade_cost
-        seller_account.shares -= trade.quantity
-        seller_account.cash -= trade.fee
-        
-        assert buyer_account.cash >= 0
-        assert buyer_account.shares >= 0
-        assert seller_account.cash >= 0
-        assert seller_account.shares >= 0
+            self.collected_fees += 2 * trade.fee
+
+            buyer_account.version += 1
+            seller_account.version += 1
+            
+            assert buyer_account.cash >= 0
+            assert buyer_account.shares[trade.symbol] >= 0
+            assert seller_account.cash >= 0
+            assert seller_account.shares[trade.symbol] >= 0
 
         buyer_order.remaining_quantity -= trade.quantity
         seller_order.remaining_quantity -= trade.quantity
@@ -305,6 +624,275 @@ class SettlementLedger:
         buyer_order.trades[trade.trade_id] = trade
         seller_order.trades[trade.trade_id] = trade
 
+        buyer_order.version += 1
+        seller_order.version += 1
+
+
+    def __settle_trade_netted(self, buyer_order:Order, seller_order:Order, trade:Trade, buyer_account:Account, seller_account:Account) -> None:
+        #settle_trade of the netted mode: the reservations are consumed now, the balances move through __settle_account
+        ENV_CONFIG = get_environment_configuration()
+        trade_cost = trade.quantity * trade.price
+
+        buyer_cash = -(trade_cost + trade.fee)
+        if buyer_order.order_type in LIMIT_ORDER_TYPES:
+            reserved_quantity, reserved_price = buyer_account.reserved_cash[buyer_order.order_id]
+            assert reserved_quantity == buyer_order.remaining_quantity
+            if reserved_quantity == trade.quantity:
+                del buyer_account.reserved_cash[buyer_order.order_id]
+            else:
+                buyer_account.reserved_cash[buyer_order.order_id] = (reserved_quantity - trade.quantity, reserved_price)
+
+            released_cost = trade.quantity * reserved_price
+            released_fee = released_cost * ENV_CONFIG.FEE_RATE_PPM // 1000000
+            buyer_cash += released_cost + released_fee
+            if reserved_quantity != trade.quantity:
+                self.collected_fees += self.__get_fee_rounding(reserved_quantity, trade.quantity, reserved_price, released_fee)
+
+        seller_shares = -trade.quantity
+        if seller_order.order_type in LIMIT_ORDER_TYPES:
+            reserved_quantity = seller_account.reserved_shares[seller_order.order_id]
+            assert reserved_quantity == seller_order.remaining_quantity
+            if reserved_quantity == trade.quantity:
+                del seller_account.reserved_shares[seller_order.order_id]
+            else:
+                seller_account.reserved_shares[seller_order.order_id] = reserved_quantity - trade.quantity
+
+            seller_shares = 0 #Released shares leave again with the trade
+
+        self.collected_fees += 2 * trade.fee
+
+        self.__settle_account(buyer_account, trade.symbol, buyer_cash, trade.quantity)
+        self.__settle_account(seller_account, trade.symbol, trade_cost - trade.fee, seller_shares)
+
+
+    def __settle_account(self, account:Account, symbol:int, cash_delta:int, shares_delta:int) -> None:
+        #Netted mode: credits are accumulated until apply_netted_credits, debits (only unreserved market orders pay or deliver
+        #at trade time) are applied right away, so account.cash / shares never exceed what the agent can actually spend
+        if self.netted_settlement:
+            if cash_delta > 0:
+                self.pending_cash[account.agent_id] = self.pending_cash.get(account.agent_id, 0) + cash_delta
+                cash_delta = 0
+
+            if shares_delta > 0:
+                share_key = (account.agent_id, symbol)
+                self.pending_shares[share_key] = self.pending_shares.get(share_key, 0) + shares_delta
+                shares_delta = 0
+
+            if cash_delta == 0 and shares_delta == 0:
+                account.version += 1 #The callers consumed a reservation, cached AccountViews must refresh
+                return
+
+        account.cash += cash_delta
+        account.shares[symbol] += shares_delta
+        account.version += 1
+
+        assert account.cash >= 0
+        assert account.shares[symbol] >= 0
+
+
+    def __get_fee_rounding(self, reserved_quantity:int, released_quantity:int, price:int, released_fee:int) -> int:
+        #The reservation fee is floored once for the reserved quantity, the releases floor theirs separately,
+        #the difference (>= 0) stays with the exchange like a fee
+        ENV_CONFIG = get_environment_configuration()
+        reserved_fee = reserved_quantity * price * ENV_CONFIG.FEE_RATE_PPM // 1000000
+        remaining_fee = (reserved_quantity - released_quantity) * price * ENV_CONFIG.FEE_RATE_PPM // 1000000
+
+        return reserved_fee - remaining_fee - released_fee
+
+
+    def apply_netted_credits(self) -> None:
+        #One update per account for everything it received since the last call (end of the micro tick)
+        for agent_id, cash in self.pending_cash.items():
+            account = self.accounts[agent_id]
+            account.cash += cash
+            account.version += 1
+
+        for (agent_id, symbol), shares in self.pending_shares.items():
+            account = self.accounts[agent_id]
+            account.shares[symbol] += shares
+            account.version += 1
+
+        self.pending_cash.clear()
+        self.pending_shares.clear()
+
+
+    def settle_level(self, aggressor_order:Order, maker_orders:Tuple[Order, ...], trades:List[Trade]) -> None:
+        #Expectations
+        # 1-agent_exist (aggressor / makers)
+        # 2-makers are resting limit orders of one level on the other side, in FIFO order, and trades[i] fills maker_orders[i] completely
+        # 3-lifecycle = WORKING / end_reason = NONE (aggressor / makers)
+        # 4-aggressor remaining_quantity >= sum of the trade quantities
+        # 5-aggressor agent_id not in the makers (no wash trade)
+        # 6-trades share one price, crossed by the aggressor
+        # (settle_trade of every trade in order, the aggressor's account and reservation are updated once.
+        #  Releases and fees keep the per trade rounding, so the balances are exactly those of the per trade path)
+
+        aggressor_account = self.accounts.get(aggressor_order.agent_id)
+        assert aggressor_account is not None #1
+        assert len(maker_orders) == len(trades) #2
+        assert aggressor_order.lifecycle == OrderLifecycle.WORKING and aggressor_order.end_reason == OrderEndReasons.NONE #3
+
+        ENV_CONFIG = get_environment_configuration()
+        fee_rate_ppm = ENV_CONFIG.FEE_RATE_PPM
+
+        is_aggressor_buyer = aggressor_order.side == Side.BUY
+        is_aggressor_reserved = aggressor_order.order_type in LIMIT_ORDER_TYPES
+        symbol = aggressor_order.symbol
+
+        aggressor_cash = 0
+        aggressor_released_cash = 0
+        traded_quantity = 0
+        fees = 0
+        for maker_order, trade in zip(maker_orders, trades):
+            maker_account = self.accounts.get(maker_order.agent_id)
+            assert maker_account is not None #1
+            assert maker_order.order_type in LIMIT_ORDER_TYPES and maker_order.side != aggressor_order.side #2
+            assert maker_order.remaining_quantity == trade.quantity > 0 #2
+            assert maker_order.lifecycle == OrderLifecycle.WORKING and maker_order.end_reason == OrderEndReasons.NONE #3
+            assert maker_order.agent_id != aggressor_order.agent_id #5
+            assert trade.price == maker_order.price #6
+            assert trade.symbol == symbol == maker_order.symbol
+
+            trade_cost = trade.quantity * trade.price
+            if is_aggressor_buyer:
+                maker_reserved_shares = maker_account.reserved_shares.pop(maker_order.order_id)
+                assert maker_reserved_shares == trade.quantity #2
+                self.__settle_account(maker_account, symbol, trade_cost - trade.fee, 0) #Released shares leave again with the trade
+
+                if is_aggressor_reserved:
+                    assert aggressor_order.price is not None
+                    released_cost = trade.quantity * aggressor_order.price
+                    aggressor_released_cash += released_cost + released_cost * fee_rate_ppm // 1000000
+                aggressor_cash -= trade_cost + trade.fee
+
+            else:
+                maker_reserved_cash = maker_account.reserved_cash.pop(maker_order.order_id)
+                assert maker_reserved_cash == (trade.quantity, trade.price) #2
+                self.__settle_account(maker_account, symbol, trade_cost * fee_rate_ppm // 1000000 - trade.fee, trade.quantity) #Reserved at the trade price
+
+                aggressor_cash += trade_cost - trade.fee
+
+            traded_quantity += trade.quantity
+            fees += trade.fee
+            maker_order.remaining_quantity = 0
+            maker_order.trades[trade.trade_id] = trade
+            maker_order.version += 1
+
+            aggressor_order.trades[trade.trade_id] = trade
+
+        assert aggressor_order.remaining_quantity >= traded_quantity #4
+
+        aggressor_shares = 0
+        if is_aggressor_buyer:
+            if is_aggressor_reserved:
+                reserved_quantity, reserved_price = aggressor_account.reserved_cash[aggressor_order.order_id]
+                assert reserved_quantity == aggressor_order.remaining_quantity
+                if reserved_quantity == traded_quantity:
+                    del aggressor_account.reserved_cash[aggressor_order.order_id]
+                else:
+                    aggressor_account.reserved_cash[aggressor_order.order_id] = (reserved_quantity - traded_quantity, reserved_price)
+
+                #The per trade releases may round below the reservation they consume
+                released_fees = aggressor_released_cash - traded_quantity * reserved_price
+                self.collected_fees += self.__get_fee_rounding(reserved_quantity, traded_quantity, reserved_price, released_fees)
+
+            aggressor_shares = traded_quantity
+
+        else:
+            if is_aggressor_reserved:
+                reserved_quantity = aggressor_account.reserved_shares[aggressor_order.order_id]
+                assert reserved_quantity == aggressor_order.remaining_quantity
+                if reserved_quantity == traded_quantity:
+                    del aggressor_account.reserved_shares[aggressor_order.order_id]
+                else:
+                    aggressor_account.reserved_shares[aggressor_order.order_id] = reserved_quantity - traded_quantity
+
+            else:
+                aggressor_shares = -traded_quantity
+
+        self.__settle_account(aggressor_account, symbol, aggressor_released_cash + aggressor_cash, aggressor_shares)
+        self.collected_fees += 2 * fees
+
+        aggressor_order.remaining_quantity -= traded_quantity
+        aggressor_order.version += 1
+
+
+    def settle_uncross(self, buyer_orders:List[Order], seller_orders:List[Order], trades:List[Trade]) -> None:
+        #Expectations
+        # 1-agent_exist (buyers / sellers)
+        # 2-buyers / sellers are resting limit orders and trades[i] is between buyer_orders[i] and seller_orders[i]
+        # 3-lifecycle = WORKING / end_reason = NONE (buyers / sellers)
+        # 4-trades share one price, crossed by every buyer and seller
+        # 5-no self match
+        # (settle_trade of every trade in order, every account is updated once.
+        #  Releases and fees keep the per trade rounding, so the balances are exactly those of the per trade path)
+
+        assert len(buyer_orders) == len(seller_orders) == len(trades) #2
+
+        ENV_CONFIG = get_environment_configuration()
+        fee_rate_ppm = ENV_CONFIG.FEE_RATE_PPM
+
+        symbol = trades[0].symbol
+        cash_deltas:Dict[int, int] = {} #AgentID -> cash
+        share_deltas:Dict[int, int] = {} #AgentID -> shares
+        fees = 0
+        for buyer_order, seller_order, trade in zip(buyer_orders, seller_orders, trades):
+            buyer_account = self.accounts.get(buyer_order.agent_id)
+            seller_account = self.accounts.get(seller_order.agent_id)
+            assert buyer_account is not None and seller_account is not None #1
+            assert buyer_order.order_type in LIMIT_ORDER_TYPES and seller_order.order_type in LIMIT_ORDER_TYPES #2
+            assert buyer_order.side == Side.BUY and seller_order.side == Side.SELL #2
+            assert trade.buy_order_id == buyer_order.order_id and trade.sell_order_id == seller_order.order_id #2
+            assert buyer_order.lifecycle == OrderLifecycle.WORKING and seller_order.lifecycle == OrderLifecycle.WORKING #3
+            assert buyer_order.end_reason == OrderEndReasons.NONE and seller_order.end_reason == OrderEndReasons.NONE #3
+            assert trade.price == trades[0].price and trade.symbol == symbol == buyer_order.symbol == seller_order.symbol #4
+            assert buyer_order.agent_id != seller_order.agent_id #5
+
+            trade_cost = trade.quantity * trade.price
+
+            reserved_quantity, reserved_price = buyer_account.reserved_cash[buyer_order.order_id]
+            assert reserved_quantity == buyer_order.remaining_quantity >= trade.quantity
+            assert reserved_price >= trade.price #4
+            if reserved_quantity == trade.quantity:
+                del buyer_account.reserved_cash[buyer_order.order_id]
+            else:
+                buyer_account.reserved_cash[buyer_order.order_id] = (reserved_quantity - trade.quantity, reserved_price)
+
+            released_cost = trade.quantity * reserved_price
+            released_fee = released_cost * fee_rate_ppm // 1000000
+            if reserved_quantity != trade.quantity:
+                self.collected_fees += self.__get_fee_rounding(reserved_quantity, trade.quantity, reserved_price, released_fee)
+
+            cash_deltas[buyer_order.agent_id] = cash_deltas.get(buyer_order.agent_id, 0) + released_cost + released_fee - trade_cost - trade.fee
+            share_deltas[buyer_order.agent_id] = share_deltas.get(buyer_order.agent_id, 0) + trade.quantity
+
+            reserved_quantity = seller_account.reserved_shares[seller_order.order_id]
+            assert reserved_quantity == seller_order.remaining_quantity >= trade.quantity
+            assert seller_order.price is not None and seller_order.price <= trade.price #4
+            if reserved_quantity == trade.quantity:
+                del seller_account.reserved_shares[seller_order.order_id]
+            else:
+                seller_account.reserved_shares[seller_order.order_id] = reserved_quantity - trade.quantity
+
+            cash_deltas[seller_order.agent_id] = cash_deltas.get(seller_order.agent_id, 0) + trade_cost - trade.fee #Released shares leave again with the trade
+            share_deltas.setdefault(seller_order.agent_id, 0)
+
+            fees += trade.fee
+
+            buyer_order.remaining_quantity -= trade.quantity
+            seller_order.remaining_quantity -= trade.quantity
+
+            buyer_order.trades[trade.trade_id] = trade
+            seller_order.trades[trade.trade_id] = trade
+
+            buyer_order.version += 1
+            seller_order.version += 1
+
+        for agent_id, cash_delta in cash_deltas.items():
+            self.__settle_account(self.accounts[agent_id], symbol, cash_delta, share_deltas[agent_id])
+
+        self.collected_fees += 2 * fees
+
 
     def create_deposit(self, agent_id:int, term:int, deposit_cash:float) -> Optional[Deposit]:
         assert self.is_account_exist(agent_id)
@@ -334,10 +922,14 @@ class SettlementLedger:
         if not is_account_available:
             return
         
-        if deposit.maturity_macro_tick not in self.open_deposits:
-            self.open_deposits[deposit.maturity_macro_tick] = [deposit]
+        maturing_deposits = self.deposit_buckets[deposit.maturity_macro_tick].get(agent_id)
+        if maturing_deposits is None:
+            self.deposit_buckets[deposit.maturity_macro_tick][agent_id] = MaturingDeposits([deposit.deposit_id], deposit.deposited_cash, deposit.matured_cash)
         else:
-            self.open_deposits[deposit.maturity_macro_tick].append(deposit)
+            maturing_deposits.deposit_ids.append(deposit.deposit_id)
+            maturing_deposits.deposited_cash += deposit.deposited_cash
+            maturing_deposits.matured_cash += deposit.matured_cash
+        self.__next_maturity_macro_tick = min(self.__next_maturity_macro_tick, deposit.maturity_macro_tick) #A term 0 deposit matures with the next check
 
         return deposit
         
@@ -353,6 +945,7 @@ class SettlementLedger:
 
         account.deposited_cash[deposit.deposit_id] = required_cash
         account.cash -= required_cash
+        account.version += 1
 
         return True
 
@@ -360,26 +953,38 @@ class SettlementLedger:
     def check_matured_deposits(self) -> None:
         SIM_REALTIME_DATA = get_simulation_realtime_data()
         
-        while True:
-            if not self.open_deposits:
-                return
-            
-            closest_maturity_macro_tick = self.open_deposits.keys()[0]
-            if closest_maturity_macro_tick > SIM_REALTIME_DATA.MACRO_TICK:
-                return
+        while self.__next_maturity_macro_tick <= SIM_REALTIME_DATA.MACRO_TICK:
+            maturity_macro_tick = self.__next_maturity_macro_tick
+            self.__next_maturity_macro_tick += 1
 
-            for mature_deposit in self.open_deposits[closest_maturity_macro_tick]:
-                self.release_deposit(mature_deposit)
-
-            del self.open_deposits[closest_maturity_macro_tick]
+            if self.deposit_buckets[maturity_macro_tick]:
+                self.release_deposits(maturity_macro_tick, self.deposit_buckets[maturity_macro_tick])
+                self.deposit_buckets[maturity_macro_tick] = {}
             
     
-    def release_deposit(self, deposit:Deposit) -> None:
-        account = self.accounts.get(deposit.agent_id)
-        assert account is not None
-
-        assert deposit.deposit_id in account.deposited_cash
-        assert deposit.deposited_cash == account.deposited_cash[deposit.deposit_id]
-
-        del account.deposited_cash[deposit.deposit_id]
-        account.cash += deposit.matured_cash
+    def release_deposits(self, maturity_macro_tick:int, deposit_bucket:Dict[int, MaturingDeposits]) -> None:
+        # Expectations (for every account in the bucket)
+        # 1-agent_exist (ASSURED)
+        # 2-deposit_ids are in account.deposited_cash (ASSURED)
+        # (The bucket was summed per account as the deposits were created: one credit and one maturity row per account,
+        #  an account whose every deposit matures has its deposited_cash cleared at once)
+
+        for agent_id, maturing_deposits in deposit_bucket.items():
+            account = self.accounts[agent_id]
+            if len(maturing_deposits.deposit_ids) == len(account.deposited_cash):
+                account.deposited_cash.clear()
+            else:
+                for deposit_id in maturing_deposits.deposit_ids:
+                    del account.deposited_cash[deposit_id]
+
+            account.cash += maturing_deposits.matured_cash
+            account.version += 1
+
+            self.issued_cash += maturing_deposits.matured_cash - maturing_deposits.deposited_cash
+            self.storage_ledger.add_deposit_maturity(
+                maturity_macro_tick,
+                agent_id,
+                len(maturing_deposits.deposit_ids),
+                maturing_deposits.deposited_cash,
+                maturing_deposits.matured_cash
+            )
@@ -1,13 +1,20 @@
 from __future__ import annotations
-from typing import Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 import sqlite3
 import json
 
 from environment.models import Account, Deposit, EconomyInsight, MarketData, Order, Trade 
+from environment.models.order import OrderEndReasons
 from environment.configs import get_environment_configuration
+from environment.configs.models import StorageProfile
 
 from simulation.configs import get_simulation_realtime_data
 
+from .trade_tape import TradeTape
+
+if TYPE_CHECKING:
+    from .conservation_audit import AuditViolation
+
 
 
 class StorageLedger:
@@ -15,13 +22,29 @@ class StorageLedger:
     orders:Dict[int, Order] #OrderID -> Order
     trades:Dict[int, Trade] #TradeID -> Trade
     deposits:Dict[int, Deposit] #DepositID -> Deposit
+    deposit_maturities:Dict[Tuple[int, int], Tuple[int, int, int]] #(maturity_macro_tick, agent_id) -> deposit count - deposited cash - matured cash
     economy_insights:Dict[int, EconomyInsight] #macro_tick -> Deposit
-    market_data:Dict[Tuple[int, int], MarketData] #(macro_tick, micro_tick) -> MarketData 
+    market_data:Dict[Tuple[int, int, int], MarketData] #(macro_tick, micro_tick, symbol) -> MarketData 
+    rejections:Dict[Tuple[int, OrderEndReasons], int] #(agent_id, end_reason) -> gateway rejections since the last flush
+    audit_violations:List[AuditViolation] #Found since the last flush
     
     db_path:str
+    storage_profile:StorageProfile
     connection:sqlite3.Connection
+    trade_tape:Optional[TradeTape]
+    market_data_store_on_change:bool
 
     __last_flush_macro_tick:int
+
+    #Flush position -> everything below these keys is already in the database
+    __flushed_order_id:int
+    __flushed_trade_id:int
+    __flushed_deposit_id:int
+    __flushed_deposit_maturity_macro_tick:int
+    __flushed_economy_insight_macro_tick:int
+    __flushed_market_data_hybrid_time:Tuple[int, int]
+
+    __last_stored_market_data_states:Dict[int, Tuple[int, int]] #Symbol -> macro_tick - book_sequence
     
     
     def __init__(self) -> None:
@@ -29,20 +52,31 @@ class StorageLedger:
         self.orders = {}
         self.trades = {}
         self.deposits = {}
+        self.deposit_maturities = {}
         self.economy_insights = {}
         self.market_data = {}
+        self.rejections = {}
+        self.audit_violations = []
         self.__last_flush_macro_tick = -1
+        
+        self.__flushed_order_id = 0
+        self.__flushed_trade_id = 0
+        self.__flushed_deposit_id = 0
+        self.__flushed_deposit_maturity_macro_tick = 0
+        self.__flushed_economy_insight_macro_tick = 0
+        self.__flushed_market_data_hybrid_time = (0, 0)
+        self.__last_stored_market_data_states = {}
 
         ENV_CONFIG = get_environment_configuration()
         self.db_path = ENV_CONFIG.DB_PATH
-        self.connection = sqlite3.connect(self.db_path)
-
-        self.connection.execute("PRAGMA journal_mode=WAL;")
-        self.connection.execute("PRAGMA synchronous=NORMAL;")
-        self.connection.execute("PRAGMA foreign_keys = ON;")
+        self.storage_profile = ENV_CONFIG.STORAGE_PROFILE
+        self.market_data_store_on_change = ENV_CONFIG.MARKET_DATA_STORE_ON_CHANGE
 
-        self.__create_sheme()
+        self.__connect()
 
+        self.trade_tape = None
+        if ENV_CONFIG.TRADE_TAPE_PATH is not None:
+            self.trade_tape = TradeTape(ENV_CONFIG.TRADE_TAPE_PATH)
 
 
     def add_account(self, account:Account) -> bool:
@@ -66,6 +100,10 @@ class StorageLedger:
             return False
 
         self.trades[trade.trade_id] = trade
+
+        if self.trade_tape is not None:
+            self.trade_tape.append(trade)
+            
         return True
 
 
@@ -76,6 +114,11 @@ class StorageLedger:
         self.deposits[deposit.deposit_id] = deposit
         return True
 
+
+    def add_deposit_maturity(self, maturity_macro_tick:int, agent_id:int, deposit_count:int, deposited_cash:int, matured_cash:int) -> None:
+        #One row per account and maturity macro tick, the deposits are settled together
+        self.deposit_maturities[(maturity_macro_tick, agent_id)] = (deposit_count, deposited_cash, matured_cash)
+
     
     def add_economy_insight(self, economy_insight:EconomyInsight) -> bool:
         if economy_insight.macro_tick in self.economy_insights:
@@ -86,13 +129,31 @@ class StorageLedger:
 
 
     def add_market_data(self, market_data:MarketData) -> bool:
-        if (market_data.macro_tick, market_data.micro_tick) in self.market_data:
+        market_data_key = (market_data.macro_tick, market_data.micro_tick, market_data.symbol)
+        if market_data_key in self.market_data:
             return False
 
-        self.market_data[(market_data.macro_tick, market_data.micro_tick)] = market_data
+        #Store on change -> a tick without trades on an untouched book repeats the last row, readers carry it forward
+        #(the first row of each macro tick is always kept, vwap_macro resets there)
+        market_data_state = (market_data.macro_tick, market_data.book_sequence)
+        if self.market_data_store_on_change and market_data.trade_count == 0 and market_data_state == self.__last_stored_market_data_states.get(market_data.symbol):
+            return True
+
+        self.__last_stored_market_data_states[market_data.symbol] = market_data_state
+        self.market_data[market_data_key] = market_data
         return True
     
 
+    def add_rejection(self, agent_id:int, end_reason:OrderEndReasons) -> None:
+        #Rejected before an Order exists -> only counted, one row per agent and reason at the next flush
+        rejection_key = (agent_id, end_reason)
+        self.rejections[rejection_key] = self.rejections.get(rejection_key, 0) + 1
+
+
+    def add_audit_violation(self, audit_violation:AuditViolation) -> None:
+        self.audit_violations.append(audit_violation)
+
+
     def get_account(self, account_id:int) -> Optional[Account]:
         return self.accounts.get(account_id)
 
@@ -113,8 +174,8 @@ class StorageLedger:
         return self.economy_insights.get(macro_tick)
 
 
-    def get_market_data(self, hybrid_time:Tuple[int, int]) -> Optional[MarketData]:
-        return self.market_data.get(hybrid_time)
+    def get_market_data(self, hybrid_time:Tuple[int, int], symbol:int=0) -> Optional[MarketData]:
+        return self.market_data.get((hybrid_time[0], hybrid_time[1], symbol))
     
     
     def flush(self) -> bool:
@@ -135,30 +196,140 @@ class StorageLedger:
 
         for deposit in self.deposits.values():
             self.__record_deposit(cursor, deposit)
+
+        for (maturity_macro_tick, agent_id), (deposit_count, deposited_cash, matured_cash) in self.deposit_maturities.items():
+            self.__record_deposit_maturity(cursor, maturity_macro_tick, agent_id, deposit_count, deposited_cash, matured_cash)
             
         for economy_insight in self.economy_insights.values():
             self.__record_economy_insight(cursor, economy_insight)
 
         for market_data in self.market_data.values():
             self.__record_market_data(cursor, market_data)
+
+        for (agent_id, end_reason), count in self.rejections.items():
+            self.__record_rejection(cursor, agent_id, end_reason, count)
+
+        for audit_violation in self.audit_violations:
+            self.__record_audit_violation(cursor, audit_violation)
             
         self.connection.commit()
+
+        if self.trade_tape is not None:
+            self.trade_tape.flush()
+
+        if self.orders: self.__flushed_order_id = next(reversed(self.orders)) + 1
+        if self.trades: self.__flushed_trade_id = next(reversed(self.trades)) + 1
+        if self.deposits: self.__flushed_deposit_id = next(reversed(self.deposits)) + 1
+        if self.deposit_maturities: self.__flushed_deposit_maturity_macro_tick = next(reversed(self.deposit_maturities))[0] + 1
+        if self.economy_insights: self.__flushed_economy_insight_macro_tick = next(reversed(self.economy_insights)) + 1
+        if self.market_data:
+            macro_tick, micro_tick, _ = next(reversed(self.market_data))
+            self.__flushed_market_data_hybrid_time = (macro_tick, micro_tick + 1)
         
         self.orders.clear()
         self.trades.clear()
         self.deposits.clear()
+        self.deposit_maturities.clear()
         self.economy_insights.clear()
         self.market_data.clear()
+        self.rejections.clear()
+        self.audit_violations.clear()
         
         self.__last_flush_macro_tick = SIM_REALTIME_DATA.MACRO_TICK
         
         return True
 
     
+    def backup(self) -> bool:
+        if self.storage_profile != StorageProfile.MEMORY:
+            return False
+
+        target = sqlite3.connect(self.db_path)
+        self.connection.backup(target)
+        target.close()
+
+        return True
+
+    
     def close(self) -> None:
+        if self.trade_tape is not None:
+            self.trade_tape.close()
+            
+        self.backup()
         self.connection.close()
 
 
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["connection"]
+
+        return state
+
+
+    def __setstate__(self, state:Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+
+        self.__connect(restore_backup=True)
+        self.__rollback_to_flush_position()
+
+        
+    def __connect(self, restore_backup:bool=False) -> None:
+        if self.storage_profile == StorageProfile.MEMORY:
+            self.connection = sqlite3.connect(":memory:")
+
+            if restore_backup:
+                source = sqlite3.connect(self.db_path)
+                source.backup(self.connection)
+                source.close()
+            
+        else:
+            self.connection = sqlite3.connect(self.db_path)
+
+        self.__apply_storage_profile()
+        self.connection.execute("PRAGMA foreign_keys = ON;")
+
+        self.__create_sheme()
+
+
+    def __rollback_to_flush_position(self) -> None:
+        #Rows flushed after the checkpoint are written again from the restored pending state
+        cursor = self.connection.cursor()
+
+        cursor.execute("DELETE FROM orders WHERE order_id >= ?;", (self.__flushed_order_id,))
+        cursor.execute("DELETE FROM trades WHERE trade_id >= ?;", (self.__flushed_trade_id,))
+        cursor.execute("DELETE FROM deposits WHERE deposit_id >= ?;", (self.__flushed_deposit_id,))
+        cursor.execute("DELETE FROM deposit_maturities WHERE maturity_macro_tick >= ?;", (self.__flushed_deposit_maturity_macro_tick,))
+        cursor.execute("DELETE FROM economy_insights WHERE macro_tick >= ?;", (self.__flushed_economy_insight_macro_tick,))
+        cursor.execute("DELETE FROM market_data WHERE (macro_tick, micro_tick) >= (?, ?);", self.__flushed_market_data_hybrid_time)
+        cursor.execute("DELETE FROM accounts WHERE macro_tick > ?;", (self.__last_flush_macro_tick,))
+        cursor.execute("DELETE FROM rejections WHERE macro_tick > ?;", (self.__last_flush_macro_tick,))
+        cursor.execute("DELETE FROM audit_violations WHERE flush_macro_tick > ?;", (self.__last_flush_macro_tick,))
+
+        cursor.close()
+        self.connection.commit()
+        
+    
+    def __apply_storage_profile(self) -> None:
+        if self.storage_profile == StorageProfile.DURABLE:
+            self.connection.execute("PRAGMA journal_mode=WAL;")
+            self.connection.execute("PRAGMA synchronous=NORMAL;")
+
+        elif self.storage_profile == StorageProfile.FAST:
+            self.connection.execute("PRAGMA journal_mode=WAL;")
+            self.connection.execute("PRAGMA synchronous=OFF;")
+            self.connection.execute("PRAGMA cache_size=-262144;") #256 MiB
+            self.connection.execute("PRAGMA mmap_size=1073741824;") #1 GiB
+            self.connection.execute("PRAGMA temp_store=MEMORY;")
+
+        elif self.storage_profile == StorageProfile.MEMORY:
+            self.connection.execute("PRAGMA journal_mode=MEMORY;")
+            self.connection.execute("PRAGMA synchronous=OFF;")
+            self.connection.execute("PRAGMA temp_store=MEMORY;")
+
+        else:
+            assert False
+
+
     def __create_sheme(self) -> None:
         cursor = self.connection.cursor()
         
@@ -167,7 +338,10 @@ class StorageLedger:
         self.__create_account_table(cursor)
         self.__create_economy_insight_table(cursor)
         self.__create_deposit_table(cursor)
+        self.__create_deposit_maturity_table(cursor)
         self.__create_market_data_table(cursor)
+        self.__create_rejection_table(cursor)
+        self.__create_audit_violation_table(cursor)
         
         cursor.close()
         self.connection.commit()
@@ -189,6 +363,10 @@ class StorageLedger:
 
             quantity INTEGER NOT NULL,
             price INTEGER,
+            stop_price INTEGER,
+            good_till_macro_tick INTEGER,
+            good_till_micro_tick INTEGER,
+            symbol INTEGER NOT NULL,
 
             lifecycle TEXT NOT NULL,
             end_reason TEXT NOT NULL,
@@ -204,6 +382,7 @@ class StorageLedger:
             """
             CREATE TABLE IF NOT EXISTS trades (
             trade_id INTEGER PRIMARY KEY,
+            symbol INTEGER NOT NULL,
             timestamp  REAL NOT NULL,
             macro_tick INTEGER NOT NULL,
             micro_tick INTEGER NOT NULL,
@@ -230,7 +409,7 @@ class StorageLedger:
             agent_id INTEGER NOT NULL,
 
             cash INTEGER NOT NULL,
-            shares INTEGER NOT NULL,
+            shares TEXT NOT NULL,
 
             reserved_cash INTEGER NOT NULL,
             reserved_shares INTEGER NOT NULL,
@@ -275,13 +454,31 @@ class StorageLedger:
         )
 
 
+    def __create_deposit_maturity_table(self, cursor:sqlite3.Cursor) -> None:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deposit_maturities (
+            maturity_macro_tick INTEGER NOT NULL,
+            agent_id INTEGER NOT NULL,
+            deposit_count INTEGER NOT NULL,
+            deposited_cash INTEGER NOT NULL,
+            matured_cash INTEGER NOT NULL,
+
+            PRIMARY KEY (maturity_macro_tick, agent_id)
+            );
+            """
+        )
+
+
     def __create_market_data_table(self, cursor:sqlite3.Cursor) -> None:
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS market_data (
             macro_tick INTEGER NOT NULL,
             micro_tick INTEGER NOT NULL,
+            symbol INTEGER NOT NULL,
             timestamp REAL NOT NULL,
+            book_sequence INTEGER NOT NULL,
             trade_count INTEGER NOT NULL,
             trade_volume INTEGER NOT NULL,
             last_traded_price INTEGER,
@@ -298,7 +495,39 @@ class StorageLedger:
             asks_depth_N INTEGER NOT NULL,
             imbalance_N REAL,
             vwap_macro INTEGER,
-            vwap_micro INTEGER
+            vwap_micro INTEGER,
+            indicative_clearing_price INTEGER
+            );
+            """
+        )
+    
+        
+    def __create_rejection_table(self, cursor:sqlite3.Cursor) -> None:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rejections (
+            macro_tick INTEGER NOT NULL,
+            agent_id INTEGER NOT NULL,
+            end_reason TEXT NOT NULL,
+            count INTEGER NOT NULL,
+
+            PRIMARY KEY (macro_tick, agent_id, end_reason)
+            );
+            """
+        )
+    
+        
+    def __create_audit_violation_table(self, cursor:sqlite3.Cursor) -> None:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_violations (
+            flush_macro_tick INTEGER NOT NULL,
+            macro_tick INTEGER NOT NULL,
+            micro_tick INTEGER NOT NULL,
+            invariant TEXT NOT NULL,
+            expected INTEGER NOT NULL,
+            actual INTEGER NOT NULL,
+            context TEXT NOT NULL
             );
             """
         )
@@ -317,11 +546,15 @@ class StorageLedger:
             side,
             quantity,
             price,
+            stop_price,
+            good_till_macro_tick,
+            good_till_micro_tick,
+            symbol,
             lifecycle,
             end_reason,
             remaining_quantity
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
             """,
             (
                 order.order_id,
@@ -333,6 +566,10 @@ class StorageLedger:
                 order.side.name,
                 order.quantity,
                 order.price,
+                order.stop_price,
+                order.good_till[0] if order.good_till is not None else None,
+                order.good_till[1] if order.good_till is not None else None,
+                order.symbol,
                 order.lifecycle.name,
                 order.end_reason.name,
                 order.remaining_quantity
@@ -345,6 +582,7 @@ class StorageLedger:
             """
             INSERT INTO trades (
             trade_id,
+            symbol,
             timestamp,
             macro_tick,
             micro_tick,
@@ -356,10 +594,11 @@ class StorageLedger:
             quantity,
             fee
             )
-            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
             """,
             (
                 trade.trade_id,
+                trade.symbol,
                 trade.timestamp,
                 trade.macro_tick,
                 trade.micro_tick,
@@ -395,7 +634,7 @@ class StorageLedger:
                 account.account_id,
                 account.agent_id,
                 account.cash,
-                account.shares,
+                json.dumps(account.shares),
                 account.get_total_reserved_cash(),
                 account.get_total_reserved_shares(),
                 account.get_total_deposited_cash()
@@ -457,13 +696,37 @@ class StorageLedger:
         )
 
 
+    def __record_deposit_maturity(self, cursor:sqlite3.Cursor, maturity_macro_tick:int, agent_id:int, deposit_count:int, deposited_cash:int, matured_cash:int) -> None:
+        cursor.execute(
+            """
+            INSERT INTO deposit_maturities (
+            maturity_macro_tick,
+            agent_id,
+            deposit_count,
+            deposited_cash,
+            matured_cash
+            )
+            VALUES(?, ?, ?, ?, ?);
+            """,
+            (
+                maturity_macro_tick,
+                agent_id,
+                deposit_count,
+                deposited_cash,
+                matured_cash
+            )
+        )
+
+
     def __record_market_data(self, cursor:sqlite3.Cursor, market_data:MarketData) -> None:
         cursor.execute(
             """
             INSERT INTO market_data (
             macro_tick,
             micro_tick,
+            symbol,
             timestamp,
+            book_sequence,
             trade_count,
             trade_volume,
             last_traded_price,
@@ -480,14 +743,17 @@ class StorageLedger:
             asks_depth_N,
             imbalance_N,
             vwap_macro,
-            vwap_micro
+            vwap_micro,
+            indicative_clearing_price
             )
-            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
             """,
             (
                 market_data.macro_tick,
                 market_data.micro_tick,
+                market_data.symbol,
                 market_data.timestamp,
+                market_data.book_sequence,
                 market_data.trade_count,
                 market_data.trade_volume,
                 market_data.last_traded_price,
@@ -504,6 +770,55 @@ class StorageLedger:
                 market_data.asks_depth_N,
                 market_data.imbalance_N,
                 market_data.vwap_macro,
-                market_data.vwap_micro
+                market_data.vwap_micro,
+                market_data.indicative_clearing_price
+            )
+        )
+
+
+    def __record_rejection(self, cursor:sqlite3.Cursor, agent_id:int, end_reason:OrderEndReasons, count:int) -> None:
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        cursor.execute(
+            """
+            INSERT INTO rejections (
+            macro_tick,
+            agent_id,
+            end_reason,
+            count
+            )
+            VALUES(?, ?, ?, ?);
+            """,
+            (
+                SIM_REALTIME_DATA.MACRO_TICK,
+                agent_id,
+                end_reason.name,
+                count
+            )
+        )
+
+
+    def __record_audit_violation(self, cursor:sqlite3.Cursor, audit_violation:AuditViolation) -> None:
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        cursor.execute(
+            """
+            INSERT INTO audit_violations (
+            flush_macro_tick,
+            macro_tick,
+            micro_tick,
+            invariant,
+            expected,
+            actual,
+            context
+            )
+            VALUES(?, ?, ?, ?, ?, ?, ?);
+            """,
+            (
+                SIM_REALTIME_DATA.MACRO_TICK,
+                audit_violation.macro_tick,
+                audit_violation.micro_tick,
+                audit_violation.invariant.name,
+                audit_violation.expected,
+                audit_violation.actual,
+                audit_violation.context
             )
         )
@@ -0,0 +1,127 @@
+from __future__ import annotations
+from typing import Any, BinaryIO, Dict, Tuple
+import bisect
+import struct
+import os
+
+import numpy as np
+
+from environment.models import Trade
+
+
+
+TRADE_TAPE_DTYPE = np.dtype(
+    [
+        ("trade_id", "<i8"),
+        ("symbol", "<i8"),
+        ("timestamp", "<f8"),
+        ("macro_tick", "<i8"),
+        ("micro_tick", "<i8"),
+        ("seller_agent_id", "<i8"),
+        ("sell_order_id", "<i8"),
+        ("buyer_agent_id", "<i8"),
+        ("buy_order_id", "<i8"),
+        ("price", "<i8"),
+        ("quantity", "<i8"),
+        ("fee", "<i8")
+    ]
+)
+TRADE_TAPE_STRUCT = struct.Struct("<qqdqqqqqqqqq")
+assert TRADE_TAPE_STRUCT.size == TRADE_TAPE_DTYPE.itemsize
+
+
+class TradeTape:
+    path:str
+    record_count:int #Records already written to the file
+    
+    __buffer:bytearray
+    __buffer_capacity:int
+    __buffered_records:int
+    __file:BinaryIO
+
+    
+    def __init__(self, path:str, buffer_capacity:int=4096) -> None:
+        assert buffer_capacity > 0
+        
+        self.path = path
+        self.record_count = 0
+
+        self.__buffer = bytearray(TRADE_TAPE_STRUCT.size * buffer_capacity)
+        self.__buffer_capacity = buffer_capacity
+        self.__buffered_records = 0
+
+        self.__file = open(self.path, "wb")
+
+        
+    def append(self, trade:Trade) -> None:
+        TRADE_TAPE_STRUCT.pack_into(
+            self.__buffer,
+            self.__buffered_records * TRADE_TAPE_STRUCT.size,
+            trade.trade_id,
+            trade.symbol,
+            trade.timestamp,
+            trade.macro_tick,
+            trade.micro_tick,
+            trade.seller_agent_id,
+            trade.sell_order_id,
+            trade.buyer_agent_id,
+            trade.buy_order_id,
+            trade.price,
+            trade.quantity,
+            trade.fee
+        )
+        self.__buffered_records += 1
+
+        if self.__buffered_records == self.__buffer_capacity:
+            self.flush()
+
+            
+    def flush(self) -> None:
+        if self.__buffered_records == 0:
+            return
+
+        self.__file.write(memoryview(self.__buffer)[:self.__buffered_records * TRADE_TAPE_STRUCT.size])
+        self.__file.flush()
+
+        self.record_count += self.__buffered_records
+        self.__buffered_records = 0
+
+
+    def close(self) -> None:
+        self.flush()
+        self.__file.close()
+
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_TradeTape__file"]
+
+        return state
+
+
+    def __setstate__(self, state:Dict[str, Any]) -> None:
+        #Records written after the checkpoint are dropped, buffered ones come back with the state
+        self.__dict__.update(state)
+
+        self.__file = open(self.path, "r+b" if os.path.exists(self.path) else "wb")
+        self.__file.truncate(self.record_count * TRADE_TAPE_STRUCT.size)
+        self.__file.seek(0, os.SEEK_END)
+
+
+def read_trade_tape(path:str) -> np.ndarray:
+    #Only whole records are mapped, so the tape can be read while it is being written
+    record_count = os.path.getsize(path) // TRADE_TAPE_DTYPE.itemsize
+    if record_count == 0:
+        return np.zeros(0, dtype=TRADE_TAPE_DTYPE)
+
+    return np.memmap(path, dtype=TRADE_TAPE_DTYPE, mode="r", shape=(record_count,))
+
+
+def query_trade_tape(tape:np.ndarray, start:Tuple[int, int], end:Tuple[int, int]) -> np.ndarray:
+    #Trades are appended in hybrid tick order -> [start, end) is found with two binary searches
+    hybrid_tick_fn = lambda record: (int(record["macro_tick"]), int(record["micro_tick"]))
+
+    low = bisect.bisect_left(tape, start, key=hybrid_tick_fn)
+    high = bisect.bisect_left(tape, end, lo=low, key=hybrid_tick_fn)
+
+    return tape[low:high]
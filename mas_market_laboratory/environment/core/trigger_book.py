@@ -0,0 +1,128 @@
+from __future__ import annotations
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from sortedcontainers import SortedDict
+from collections import deque
+import operator
+
+from environment.models import Order
+from environment.models.order import STOP_ORDER_TYPES, OrderLifecycle, OrderEndReasons, Side
+
+
+
+class TriggerBook:
+    #Pending stop orders by stop price, closest trigger first on each side
+    buy_stops:SortedDict[int, Deque[Order]] #Triggered when last price >= stop price
+    sell_stops:SortedDict[int, Deque[Order]] #Triggered when last price <= stop price
+
+    order_map:Dict[int, Order] #OrderID -> Order
+    agent_orders:Dict[int, Dict[int, Order]] #AgentID -> OrderID -> Order
+
+
+    def __init__(self) -> None:
+        self.__create_clean_book()
+
+
+    def __create_clean_book(self) -> None:
+        sell_sort_key_fn:Callable[[int], int] = operator.neg #Picklable, unlike a lambda
+        self.buy_stops = SortedDict()
+        self.sell_stops = SortedDict(sell_sort_key_fn)
+        self.order_map = {}
+        self.agent_orders = {}
+
+
+    def is_order_exist(self, order_id:int) -> bool:
+        return order_id in self.order_map
+
+        
+    def add_order(self, order:Order) -> bool:
+        #Expectations
+        # 1-order_type = Stop / Stop limit
+        # 2-stop_price != None && stop_price > 0
+        # 3-lifecycle = WORKING
+        # 4-end_reason = NONE
+
+        assert order.order_type in STOP_ORDER_TYPES #1
+        assert order.stop_price is not None and order.stop_price > 0 #2
+        assert order.lifecycle == OrderLifecycle.WORKING #3
+        assert order.end_reason == OrderEndReasons.NONE #4
+
+        if self.is_order_exist(order.order_id):
+            return False
+
+        self.order_map[order.order_id] = order
+        self.agent_orders.setdefault(order.agent_id, {})[order.order_id] = order
+
+        target_stops = self.buy_stops if order.side == Side.BUY else self.sell_stops
+        if order.stop_price not in target_stops:
+            target_stops[order.stop_price] = deque()
+
+        target_stops[order.stop_price].append(order)
+
+        return True
+
+
+    def remove_order(self, order_id:int) -> Optional[Order]:
+        if not self.is_order_exist(order_id):
+            return None
+
+        order = self.order_map.pop(order_id)
+        self.__remove_agent_order(order)
+        
+        assert order.stop_price is not None
+        target_stops = self.buy_stops if order.side == Side.BUY else self.sell_stops
+        
+        target_stops[order.stop_price].remove(order)
+        if not target_stops[order.stop_price]:
+            del target_stops[order.stop_price]
+
+        return order
+
+
+    def remove_agent_orders(self, agent_id:int, side:Optional[Side]=None) -> Tuple[Order, ...]:
+        agent_orders = self.agent_orders.get(agent_id)
+        if not agent_orders:
+            return ()
+
+        removed_orders = []
+        for order in list(agent_orders.values()):
+            if side is not None and order.side != side: continue
+
+            removed_order = self.remove_order(order.order_id)
+            assert removed_order is order
+            removed_orders.append(order)
+
+        return tuple(removed_orders)
+
+    
+    def __remove_agent_order(self, order:Order) -> None:
+        agent_orders = self.agent_orders[order.agent_id]
+        del agent_orders[order.order_id]
+
+        if not agent_orders:
+            del self.agent_orders[order.agent_id]
+
+
+    def pop_triggered_orders(self, last_price:int) -> List[Order]:
+        #Only the crossed stop levels are visited, stop price priority then time priority
+        triggered_orders:List[Order] = []
+
+        while self.buy_stops and self.buy_stops.keys()[0] <= last_price:
+            _, stop_queue = self.buy_stops.popitem(0)
+            triggered_orders.extend(stop_queue)
+
+        while self.sell_stops and self.sell_stops.keys()[0] >= last_price:
+            _, stop_queue = self.sell_stops.popitem(0)
+            triggered_orders.extend(stop_queue)
+
+        for order in triggered_orders:
+            del self.order_map[order.order_id]
+            self.__remove_agent_order(order)
+
+        return triggered_orders
+
+    
+    def expire_book(self) -> Tuple[Order, ...]:
+        orders = tuple(self.order_map.values())
+        self.__create_clean_book()
+
+        return orders
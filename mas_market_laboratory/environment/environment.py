@@ -1,11 +1,11 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import time
 
 from environment.configs import get_environment_configuration
-from environment.core import CDAEngine, EconomyModule, SettlementLedger, StorageLedger
-from environment.models.order import Order, OrderLifecycle, OrderEndReasons, Side, OrderType
-from environment.views import AccountView, DepositView, MarketDataView, OrderView, EconomyInsightView
+from environment.core import AuditViolation, CDAEngine, ConservationAudit, EconomyModule, MessageThrottle, OrderFlowJournal, RiskGateway, SettlementLedger, StorageLedger
+from environment.models.order import LIMIT_ORDER_TYPES, RESTING_ORDER_TYPES, STOP_ORDER_TYPES, Order, OrderLifecycle, OrderEndReasons, Side, OrderType
+from environment.views import AccountView, BookEventView, BookSnapshotView, DepositView, DepthIndexView, MarketDataView, OrderImpactView, OrderView, EconomyInsightView
 
 from simulation.configs import get_simulation_configurations, get_simulation_realtime_data
 
@@ -13,22 +13,39 @@ from simulation.configs import get_simulation_configurations, get_simulation_rea
 
 class Environment:
     settlement_ledger:SettlementLedger
-    cda_engine:CDAEngine
+    cda_engines:Tuple[CDAEngine, ...] #Symbol -> CDAEngine
     storage_ledger:StorageLedger
     economy_module:EconomyModule
+    order_flow_journal:Optional[OrderFlowJournal]
+    message_throttle:MessageThrottle
+    risk_gateway:RiskGateway
+    conservation_audit:ConservationAudit
     
     __next_order_id:int
     
     def __init__(self) -> None:      
         self.storage_ledger = StorageLedger()
         self.settlement_ledger = SettlementLedger(self.storage_ledger)
-        self.cda_engine = CDAEngine(
-            storage_ledger=self.storage_ledger,
-            settlement_ledger=self.settlement_ledger
+
+        ENV_CONFIG = get_environment_configuration()
+        self.cda_engines = tuple(
+            CDAEngine(
+                storage_ledger=self.storage_ledger,
+                settlement_ledger=self.settlement_ledger,
+                symbol=symbol
+            )
+            for symbol in range(len(ENV_CONFIG.SYMBOLS))
         )
 
         self.economy_module = EconomyModule()        
+        self.message_throttle = MessageThrottle()
+        self.risk_gateway = RiskGateway(self.settlement_ledger, self.cda_engines)
+        self.conservation_audit = ConservationAudit(self.settlement_ledger, self.cda_engines, self.storage_ledger)
         self.__next_order_id = 0
+
+        self.order_flow_journal = None
+        if ENV_CONFIG.ORDER_FLOW_JOURNAL_PATH is not None:
+            self.order_flow_journal = OrderFlowJournal(ENV_CONFIG.ORDER_FLOW_JOURNAL_PATH)
         
 
     @property
@@ -38,6 +55,35 @@ class Environment:
 
         return order_id
 
+
+    def is_symbol_exist(self, symbol:int) -> bool:
+        return 0 <= symbol < len(self.cda_engines)
+
+
+    def __admit_message(self, agent_id:int) -> bool:
+        #Every agent message counts, before it is validated and before any Order is created
+        if self.message_throttle.admit_message(agent_id):
+            return True
+
+        self.storage_ledger.add_rejection(agent_id, OrderEndReasons.REJECTED_THROTTLED)
+        return False
+
+
+    def __admit_open_order(self, agent_id:int) -> bool:
+        if self.message_throttle.max_open_orders is None:
+            return True
+
+        open_order_count = 0
+        for cda_engine in self.cda_engines:
+            open_order_count += len(cda_engine.order_book.agent_orders.get(agent_id, ()))
+            open_order_count += len(cda_engine.trigger_book.agent_orders.get(agent_id, ()))
+
+        if self.message_throttle.admit_open_order(agent_id, open_order_count):
+            return True
+
+        self.storage_ledger.add_rejection(agent_id, OrderEndReasons.REJECTED_MAX_OPEN_ORDERS)
+        return False
+
     
     def register_agent(
             self,
@@ -45,6 +91,9 @@ class Environment:
             initial_cash:float=0.0,
             initial_shares:int=0
     ) -> Optional[AccountView]:
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_register_agent(agent_id, initial_cash, initial_shares)
+            
         if self.settlement_ledger.is_account_exist(agent_id): return
         if initial_cash < 0: return
         if initial_shares < 0: return
@@ -55,7 +104,8 @@ class Environment:
             initial_shares=initial_shares
         )
 
-        assert self.storage_ledger.add_account(account)
+        is_stored = self.storage_ledger.add_account(account)
+        assert is_stored
 
         return account.create_view()
         
@@ -66,26 +116,63 @@ class Environment:
             order_type:OrderType,
             side:Side,
             quantity:int,
-            price:Optional[float]=None
+            price:Optional[float]=None,
+            stop_price:Optional[float]=None,
+            good_till:Optional[Tuple[int, int]]=None,
+            symbol:int=0
     ) -> Optional[OrderView]:
+        #good_till = (macro_tick, micro_tick) a resting or stop order expires at the start of (see expire_due_orders)
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_create_order(agent_id, order_type, side, quantity, price, stop_price, good_till, symbol)
+            
         if not self.settlement_ledger.is_account_exist(agent_id):
             return
 
+        if not self.__admit_message(agent_id):
+            return
+
+        if not self.is_symbol_exist(symbol):
+            return
+
         if not quantity > 0:
             return
 
         ENV_CONFIG = get_environment_configuration()
         
-        if order_type == OrderType.LIMIT:
+        if order_type in LIMIT_ORDER_TYPES or order_type == OrderType.STOP_LIMIT:
             if price is None or price <= 0:
                 return
             price = int(price * ENV_CONFIG.PRICE_SCALE)
             
-        elif order_type == OrderType.MARKET:
+        elif order_type in (OrderType.MARKET, OrderType.STOP):
             if price is not None:
                 return
 
+        if order_type in STOP_ORDER_TYPES:
+            if stop_price is None or stop_price <= 0:
+                return
+            stop_price = int(stop_price * ENV_CONFIG.PRICE_SCALE)
+
+        elif stop_price is not None:
+            return
+
         SIM_REALTIME_DATA = get_simulation_realtime_data()
+        if good_till is not None:
+            if order_type not in RESTING_ORDER_TYPES and order_type not in STOP_ORDER_TYPES:
+                return
+            if not good_till > (SIM_REALTIME_DATA.MACRO_TICK, SIM_REALTIME_DATA.MICRO_TICK):
+                return
+
+        if self.risk_gateway.is_enabled:
+            end_reason = self.risk_gateway.check_order(agent_id, order_type, side, quantity, price, stop_price, symbol)
+            if end_reason != OrderEndReasons.NONE:
+                self.storage_ledger.add_rejection(agent_id, end_reason)
+                return
+
+        if order_type in RESTING_ORDER_TYPES or order_type in STOP_ORDER_TYPES:
+            if not self.__admit_open_order(agent_id):
+                return
+        
         order = Order(
             order_id=self.order_id,
             agent_id=agent_id,
@@ -97,18 +184,63 @@ class Environment:
             quantity=quantity,
             price=price,
             lifecycle=OrderLifecycle.NEW,
-            end_reason=OrderEndReasons.NONE
+            end_reason=OrderEndReasons.NONE,
+            stop_price=stop_price,
+            good_till=good_till,
+            symbol=symbol
         )
 
-        assert self.storage_ledger.add_order(order)
+        is_stored = self.storage_ledger.add_order(order)
+        assert is_stored
         
-        self.cda_engine.process_new_order(order)
+        self.cda_engines[symbol].process_new_order(order)
         
         return order.create_view()
 
 
+    def simulate_order(
+            self,
+            agent_id:int,
+            order_type:OrderType,
+            side:Side,
+            quantity:int,
+            price:Optional[float]=None,
+            symbol:int=0
+    ) -> Optional[OrderImpactView]:
+        #Dry run of create_order, read only -> not journaled and no order id is consumed
+        #Stops are not simulated, they do nothing until triggered
+        if not self.settlement_ledger.is_account_exist(agent_id):
+            return
+
+        if not self.is_symbol_exist(symbol):
+            return
+
+        if order_type in STOP_ORDER_TYPES:
+            return
+
+        if not quantity > 0:
+            return
+
+        ENV_CONFIG = get_environment_configuration()
+
+        if order_type in LIMIT_ORDER_TYPES:
+            if price is None or price <= 0:
+                return
+            price = int(price * ENV_CONFIG.PRICE_SCALE)
+            
+        elif order_type == OrderType.MARKET:
+            if price is not None:
+                return
+
+        return self.cda_engines[symbol].simulate_order(agent_id, order_type, side, quantity, price).create_view()
+
+        
     def cancel_order(self, agent_id:int, order_id:int) -> None:
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_cancel_order(agent_id, order_id)
+            
         if not self.settlement_ledger.is_account_exist(agent_id): return
+        if not self.__admit_message(agent_id): return
 
         order = self.storage_ledger.get_order(order_id)
         if order is None: return
@@ -116,11 +248,101 @@ class Environment:
         if order.lifecycle != OrderLifecycle.WORKING: return
         if order.end_reason != OrderEndReasons.NONE: return
         
-        self.cda_engine.cancel_order(order_id)
+        self.cda_engines[order.symbol].cancel_order(order_id)
+        
+
+    def cancel_all(self, agent_id:int, side:Optional[Side]=None, symbol:Optional[int]=None) -> Tuple[OrderView, ...]:
+        #Pulls every resting and pending stop order of the agent (one side / one symbol only if given)
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_cancel_agent_orders(agent_id, side, None, None, symbol)
+
+        if not self.settlement_ledger.is_account_exist(agent_id): return ()
+        if not self.__admit_message(agent_id): return ()
+        if symbol is not None and not self.is_symbol_exist(symbol): return ()
+
+        cda_engines = self.cda_engines if symbol is None else (self.cda_engines[symbol],)
+        orders = tuple(order for cda_engine in cda_engines for order in cda_engine.cancel_agent_orders(agent_id, side))
+
+        return tuple(order.create_view() for order in orders)
+
+
+    def cancel_range(self, agent_id:int, side:Side, price_bounds:Tuple[float, float], symbol:int=0) -> Tuple[OrderView, ...]:
+        #Pulls the agent's resting orders on side with min_price <= price <= max_price (pending stops are left)
+        min_price, max_price = price_bounds
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_cancel_agent_orders(agent_id, side, min_price, max_price, symbol)
+
+        if not self.settlement_ledger.is_account_exist(agent_id): return ()
+        if not self.__admit_message(agent_id): return ()
+        if not self.is_symbol_exist(symbol): return ()
+        if not min_price <= max_price: return ()
+
+        ENV_CONFIG = get_environment_configuration()
+
+        #Bounds are scaled like create_order prices, so a bound equal to an order's price always matches it
+        orders = self.cda_engines[symbol].cancel_agent_orders(
+            agent_id,
+            side,
+            int(min_price * ENV_CONFIG.PRICE_SCALE),
+            int(max_price * ENV_CONFIG.PRICE_SCALE)
+        )
+
+        return tuple(order.create_view() for order in orders)
+
+    
+    def amend_order(self, agent_id:int, order_id:int, quantity:int, price:float) -> Optional[OrderView]:
+        #quantity = new remaining quantity, same price & less quantity keeps the queue priority
+        #Returns None if the amend is invalid or cannot be funded, the order is left untouched then
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_amend_order(agent_id, order_id, quantity, price)
+            
+        if not self.settlement_ledger.is_account_exist(agent_id): return
+        if not self.__admit_message(agent_id): return
+
+        order = self.storage_ledger.get_order(order_id)
+        if order is None: return
+        if order.agent_id != agent_id: return
+        if order.lifecycle != OrderLifecycle.WORKING: return
+        if order.end_reason != OrderEndReasons.NONE: return
+        if order.order_type in STOP_ORDER_TYPES: return #Pending stops are not in the book
+
+        if not quantity > 0: return
+        if not price > 0: return
+
+        ENV_CONFIG = get_environment_configuration()
+        scaled_price = int(price * ENV_CONFIG.PRICE_SCALE)
+
+        if self.risk_gateway.is_enabled:
+            end_reason = self.risk_gateway.check_order_limits(quantity, scaled_price, order.symbol)
+            if end_reason != OrderEndReasons.NONE:
+                self.storage_ledger.add_rejection(agent_id, end_reason)
+                return
+        
+        is_amended = self.cda_engines[order.symbol].amend_order(order_id, quantity, scaled_price)
+        if not is_amended: return
+
+        return order.create_view()
         
 
+    def expire_due_orders(self) -> Tuple[OrderView, ...]:
+        #Run at the start of each micro tick, before the agents act
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_expire_due_orders()
+
+        orders = tuple(order for cda_engine in self.cda_engines for order in cda_engine.expire_due_orders())
+
+        return tuple(order.create_view() for order in orders)
+
+    
     def expire_session(self) -> None:
-        self.cda_engine.expire_session()
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_expire_session()
+            self.order_flow_journal.flush()
+
+        for cda_engine in self.cda_engines:
+            cda_engine.expire_session()
+
+        self.settlement_ledger.apply_netted_credits()
 
 
     def create_deposit(
@@ -129,6 +351,9 @@ class Environment:
             term:int,
             deposited_cash:float
     ) -> Optional[DepositView]:
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_create_deposit(agent_id, term, deposited_cash)
+            
         if not self.settlement_ledger.is_account_exist(agent_id):
             return
 
@@ -152,22 +377,89 @@ class Environment:
 
         if deposit is None: return
 
-        assert self.storage_ledger.add_deposit(deposit)
+        is_stored = self.storage_ledger.add_deposit(deposit)
+        assert is_stored
 
         return deposit.create_view()
 
+
+    def check_matured_deposits(self) -> None:
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_mature_deposits()
+
+        self.settlement_ledger.check_matured_deposits()
+        
+    
+    def get_throttle_counters(self) -> Dict[int, Tuple[int, int, int]]:
+        #AgentID -> messages, throttled messages, open order limit rejections (since the start, only while throttling is on)
+        message_throttle = self.message_throttle
+        agent_ids = message_throttle.message_counts.keys() | message_throttle.open_order_rejection_counts.keys()
+
+        return {
+            agent_id: (
+                message_throttle.message_counts.get(agent_id, 0),
+                message_throttle.throttled_counts.get(agent_id, 0),
+                message_throttle.open_order_rejection_counts.get(agent_id, 0)
+            )
+            for agent_id in sorted(agent_ids)
+        }
+
+
+    def audit(self) -> Tuple[AuditViolation, ...]:
+        #On demand conservation audit (the periodic one runs with get_market_data every AUDIT_INTERVAL micro ticks)
+        return self.conservation_audit.audit()
+        
     
     def get_economy_insight(self) -> EconomyInsightView:
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_economy_insight()
+            
         economy_insight = self.economy_module.get_economy_insight()
 
-        assert self.storage_ledger.add_economy_insight(economy_insight)
+        is_stored = self.storage_ledger.add_economy_insight(economy_insight)
+        assert is_stored
 
         return economy_insight.create_view()
         
 
-    def get_market_data(self) -> MarketDataView:
-        market_data = self.cda_engine.get_market_data()
+    def get_market_data(self, symbol:int=0) -> MarketDataView:
+        #Once per micro tick and symbol (micro trade stats reset, batch / call auctions clear here)
+        assert self.is_symbol_exist(symbol)
+        
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.record_market_data(symbol)
+            
+        market_data = self.cda_engines[symbol].get_market_data()
+        self.settlement_ledger.apply_netted_credits() #The previous micro tick (and this uncross) settles here
+        self.conservation_audit.audit_if_due()
 
-        assert self.storage_ledger.add_market_data(market_data)
+        is_stored = self.storage_ledger.add_market_data(market_data)
+        assert is_stored
         
         return market_data.create_view()
+
+
+    def get_book_events(self, symbol:int=0) -> Tuple[BookEventView, ...]:
+        #Book changes since the previous market data of symbol, in sequence order
+        return tuple(book_event.create_view() for book_event in self.cda_engines[symbol].book_events)
+
+
+    def get_book_snapshot(self, symbol:int=0) -> BookSnapshotView:
+        return self.cda_engines[symbol].get_book_snapshot().create_view()
+
+
+    def get_bid_depth(self, symbol:int=0) -> DepthIndexView:
+        #Live, what a seller would hit: depth_up_to(p) = bid size at prices >= p
+        return self.cda_engines[symbol].get_bid_depth().create_view()
+
+
+    def get_ask_depth(self, symbol:int=0) -> DepthIndexView:
+        #Live, what a buyer would lift: depth_up_to(p) = ask size at prices <= p
+        return self.cda_engines[symbol].get_ask_depth().create_view()
+
+
+    def close(self) -> None:
+        if self.order_flow_journal is not None:
+            self.order_flow_journal.close()
+
+        self.storage_ledger.close()
@@ -1,10 +1,13 @@
 from .account import Account
+from .book_event import BookEvent
+from .book_snapshot import BookSnapshot
 from .deposit import Deposit
 from .economy_insight import EconomyInsight
 from .market_data import MarketData
 from .order import Order
+from .order_impact import OrderImpact
 from .trade import Trade
 
 
 
-__all__ = ["Account", "Deposit", "EconomyInsight", "MarketData", "Order", "Trade"]
+__all__ = ["Account", "BookEvent", "BookSnapshot", "Deposit", "EconomyInsight", "MarketData", "Order", "OrderImpact", "Trade"]
@@ -12,12 +12,14 @@ class Account:
     agent_id:int
 
     cash:int
-    shares:int
+    shares:Dict[int, int] #Symbol -> shares, every symbol has an entry
 
     reserved_cash:Dict[int, Tuple[int, int]] = field(default_factory=dict) #OrderID -> (quantity, price)
     reserved_shares:Dict[int, int] = field(default_factory=dict) #OrderID -> quantity
 
     deposited_cash:Dict[int, int] = field(default_factory=dict) #DepositID -> depositted
+
+    version:int = 0 #Bumped on every mutation, keys the AccountView caches
     
 
     def get_total_reserved_cash(self) -> int:
@@ -31,6 +33,14 @@ class Account:
         return total
         
 
+    def get_total_shares(self) -> int:
+        total = 0
+        for shares in self.shares.values():
+            total += shares
+
+        return total
+
+    
     def get_total_reserved_shares(self) -> int:
         if not self.reserved_shares:
             return 0
@@ -0,0 +1,48 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Optional
+
+from environment.views import BookEventView
+from environment.configs import get_environment_configuration
+
+from .order import Side
+
+
+
+class BookEventType(Enum):
+    ADD = auto() #quantity = added quantity
+    CANCEL = auto() #quantity = removed quantity
+    FILL = auto() #quantity = filled quantity
+    LEVEL_UPDATE = auto() #Level changed without a fill, add or cancel
+    CLEAR = auto() #Whole book removed (session expiry)
+
+
+@dataclass(frozen=True)
+class BookEvent:
+    sequence:int
+    event_type:BookEventType
+
+    order_id:Optional[int]
+    side:Optional[Side]
+    price:Optional[int]
+    quantity:int
+
+    #Level state after the event, level_count = 0 -> level removed
+    level_size:int
+    level_count:int
+
+
+    def create_view(self) -> BookEventView:
+        ENV_CONFIG = get_environment_configuration()
+
+        return BookEventView(
+            sequence=self.sequence,
+            event_type=self.event_type,
+            order_id=self.order_id,
+            side=self.side,
+            price=self.price / ENV_CONFIG.PRICE_SCALE if self.price is not None else None,
+            quantity=self.quantity,
+            level_size=self.level_size,
+            level_count=self.level_count
+        )
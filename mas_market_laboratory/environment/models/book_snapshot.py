@@ -0,0 +1,25 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Tuple
+
+from environment.views import BookSnapshotView
+from environment.configs import get_environment_configuration
+
+
+
+@dataclass(frozen=True)
+class BookSnapshot:
+    sequence:int
+
+    bids:Tuple[Tuple[int, int, int], ...] #For each price level = price - size - #of orders
+    asks:Tuple[Tuple[int, int, int], ...] #For each price level = price - size - #of orders
+
+
+    def create_view(self) -> BookSnapshotView:
+        ENV_CONFIG = get_environment_configuration()
+
+        return BookSnapshotView(
+            sequence=self.sequence,
+            bids=tuple((p / ENV_CONFIG.PRICE_SCALE, v, c) for p, v, c in self.bids),
+            asks=tuple((p / ENV_CONFIG.PRICE_SCALE, v, c) for p, v, c in self.asks)
+        )
@@ -3,7 +3,6 @@ from dataclasses import dataclass
 from typing import Optional, Tuple
 
 from environment.views import MarketDataView
-from environment.configs import get_environment_configuration
 
 
 
@@ -12,6 +11,8 @@ class MarketData:
     timestamp:float
     macro_tick:int
     micro_tick:int
+    symbol:int
+    book_sequence:int #OrderBook.sequence the book-derived fields were computed at
 
     trade_count:int
     trade_volume:int
@@ -35,71 +36,8 @@ class MarketData:
     imbalance_N:Optional[float]
     vwap_macro:Optional[int]
     vwap_micro:Optional[int]
+    indicative_clearing_price:Optional[int] #Uniform price of the last batch / call auction uncross, published once
 
     
     def create_view(self) -> MarketDataView:
-        ENV_CONFIG = get_environment_configuration()
-
-        last_traded_price = None
-        if self.last_traded_price is not None:
-            last_traded_price = self.last_traded_price / ENV_CONFIG.PRICE_SCALE
-
-        L1_bids = None
-        if self.L1_bids is not None:
-            L1_bids = (self.L1_bids[0] / ENV_CONFIG.PRICE_SCALE, self.L1_bids[1], self.L1_bids[2])
-
-        L1_asks = None
-        if self.L1_asks is not None:
-            L1_asks = (self.L1_asks[0] / ENV_CONFIG.PRICE_SCALE, self.L1_asks[1], self.L1_asks[2])
-
-        spread = None
-        if self.spread is not None:
-            spread = self.spread / ENV_CONFIG.PRICE_SCALE
-
-        mid_price = None
-        if self.mid_price is not None:
-            mid_price = self.mid_price / ENV_CONFIG.PRICE_SCALE
-
-        micro_price = None
-        if self.micro_price is not None:
-            micro_price = self.micro_price / ENV_CONFIG.PRICE_SCALE
-
-        L2_bids = None
-        if self.L2_bids is not None:
-            L2_bids = tuple((p / ENV_CONFIG.PRICE_SCALE, v, c) for p, v, c in self.L2_bids)
-
-        L2_asks = None
-        if self.L2_asks is not None:
-            L2_asks = tuple((p / ENV_CONFIG.PRICE_SCALE, v, c) for p, v, c in self.L2_asks)
-
-        vwap_macro = None
-        if self.vwap_macro is not None:
-            vwap_macro = self.vwap_macro / ENV_CONFIG.PRICE_SCALE
-
-        vwap_micro = None
-        if self.vwap_micro is not None:
-            vwap_micro = self.vwap_micro / ENV_CONFIG.PRICE_SCALE
-            
-            
-        return MarketDataView(
-            timestamp=self.timestamp,
-            macro_tick=self.macro_tick,
-            micro_tick=self.micro_tick,
-            trade_count=self.trade_count,
-            trade_volume=self.trade_volume,
-            last_traded_price=last_traded_price,
-            last_trade_size=self.last_trade_size,
-            L1_bids=L1_bids,
-            L1_asks=L1_asks,
-            spread=spread,
-            mid_price=mid_price,
-            micro_price=micro_price,
-            L2_bids=L2_bids,
-            L2_asks=L2_asks,
-            N=self.N,
-            bids_depth_N=self.bids_depth_N,
-            asks_depth_N=self.asks_depth_N,
-            imbalance_N=self.imbalance_N,
-            vwap_macro=vwap_macro,
-            vwap_micro=vwap_micro
-        )
+        return MarketDataView(self)
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from enum import Enum, auto
 from dataclasses import dataclass, field
 
@@ -12,6 +12,11 @@ from .trade import Trade
 class OrderType(Enum):
     LIMIT = auto()
     MARKET = auto()
+    IOC = auto() #Limit, the unfilled remainder is killed instead of resting
+    FOK = auto() #Limit, fills completely at once or does nothing
+    POST_ONLY = auto() #Limit, rejected if it would take liquidity
+    STOP = auto() #Becomes MARKET once the last trade price reaches stop_price
+    STOP_LIMIT = auto() #Becomes LIMIT once the last trade price reaches stop_price
 
 
 class Side(Enum):
@@ -33,6 +38,20 @@ class OrderEndReasons(Enum):
     REJECTED_INSUFFICIENT_FUND = auto()
     REJECTED_INSUFFICIENT_MARKET_DEPTH = auto()
     KILLED_WASH_TRADE = auto()
+    KILLED_IOC = auto()
+    KILLED_FOK = auto()
+    REJECTED_POST_ONLY_WOULD_CROSS = auto()
+    REJECTED_DURING_CALL = auto() #Needs continuous matching, only resting orders are collected for an auction
+    REJECTED_THROTTLED = auto() #Message rate limit, rejected at the gateway (counted, no Order is created)
+    REJECTED_MAX_OPEN_ORDERS = auto() #Open order limit, rejected at the gateway (counted, no Order is created)
+    REJECTED_MAX_ORDER_SIZE = auto() #Pre-trade risk, rejected at the gateway (counted, no Order is created)
+    REJECTED_MAX_NOTIONAL = auto() #Pre-trade risk, rejected at the gateway (counted, no Order is created)
+    REJECTED_PRICE_COLLAR = auto() #Pre-trade risk, rejected at the gateway (counted, no Order is created)
+
+
+LIMIT_ORDER_TYPES = frozenset((OrderType.LIMIT, OrderType.IOC, OrderType.FOK, OrderType.POST_ONLY)) #Priced, funds reserved up front
+RESTING_ORDER_TYPES = frozenset((OrderType.LIMIT, OrderType.POST_ONLY)) #May rest in the book
+STOP_ORDER_TYPES = frozenset((OrderType.STOP, OrderType.STOP_LIMIT)) #Held in the trigger book until triggered
     
     
 @dataclass
@@ -52,11 +71,17 @@ class Order:
 
     lifecycle:OrderLifecycle
     end_reason:OrderEndReasons
+
+    stop_price:Optional[int] = None #Kept after the stop is triggered (order_type turns into MARKET / LIMIT)
+    good_till:Optional[Tuple[int, int]] = None #(macro_tick, micro_tick) the order expires at the start of
+    symbol:int = 0 #Index in SYMBOLS, routes the order to its CDAEngine
     
     remaining_quantity:int = field(init=False)
     
     trades:Dict[int, Trade] = field(default_factory=dict)
 
+    version:int = 0 #Bumped on every fill (remaining_quantity / trades), keys the OrderView caches
+
     
     def __post_init__(self) -> None:
         self.remaining_quantity = self.quantity
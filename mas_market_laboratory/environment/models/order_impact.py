@@ -0,0 +1,40 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional
+
+from environment.views import OrderImpactView
+from environment.configs import get_environment_configuration
+
+from .order import OrderLifecycle, OrderEndReasons
+
+
+
+@dataclass(frozen=True)
+class OrderImpact:
+    #What an order would get if it was sent now, nothing is reserved, traded or stored
+    filled_quantity:int
+    notional:int #sum of price * quantity
+    fees:int
+    average_price:Optional[int]
+    last_price:Optional[int] #Worst price reached
+    levels_touched:int
+
+    remaining_quantity:int #Rests on the book if lifecycle = WORKING, dropped otherwise
+    lifecycle:OrderLifecycle
+    end_reason:OrderEndReasons
+
+    
+    def create_view(self) -> OrderImpactView:
+        ENV_CONFIG = get_environment_configuration()
+
+        return OrderImpactView(
+            filled_quantity=self.filled_quantity,
+            notional=self.notional / ENV_CONFIG.PRICE_SCALE,
+            fees=self.fees / ENV_CONFIG.PRICE_SCALE,
+            average_price=self.average_price / ENV_CONFIG.PRICE_SCALE if self.average_price is not None else None,
+            last_price=self.last_price / ENV_CONFIG.PRICE_SCALE if self.last_price is not None else None,
+            levels_touched=self.levels_touched,
+            remaining_quantity=self.remaining_quantity,
+            lifecycle=self.lifecycle,
+            end_reason=self.end_reason
+        )
@@ -25,12 +25,15 @@ class Trade:
     
     fee:int
 
+    symbol:int = 0
+
     
     def create_view(self) -> TradeView:
         ENV_CONFIG = get_environment_configuration()
         
         return TradeView(
             trade_id=self.trade_id,
+            symbol=self.symbol,
             timestamp=self.timestamp,
             macro_tick=self.macro_tick,
             micro_tick=self.micro_tick,
@@ -1,10 +1,15 @@
 from .account_view import AccountView
+from .book_builder import BookBuilder
+from .book_event_view import BookEventView
+from .book_snapshot_view import BookSnapshotView
 from .deposit_view import DepositView
+from .depth_index_view import DepthIndexView
 from .economy_insight_view import EconomyInsightView
 from .market_data_view import MarketDataView
+from .order_impact_view import OrderImpactView
 from .order_view import OrderView
 from .trade_view import TradeView
 
 
 
-__all__ = ["AccountView", "DepositView", "EconomyInsightView", "MarketDataView", "OrderView", "TradeView"]
+__all__ = ["AccountView", "BookBuilder", "BookEventView", "BookSnapshotView", "DepositView", "DepthIndexView", "EconomyInsightView", "MarketDataView", "OrderImpactView", "OrderView", "TradeView"]
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Dict, Tuple
+from typing import TYPE_CHECKING, Mapping, Optional, Tuple
+from types import MappingProxyType
 
 from environment.configs import get_environment_configuration
 
@@ -9,9 +10,21 @@ if TYPE_CHECKING:
 
 
 class AccountView:
+    #Derived mappings are cached against Account.version and returned read-only
+    __shares:Optional[Tuple[int, Mapping[int, int]]] #version - value
+    __reserved_cash:Optional[Tuple[int, Mapping[int, Tuple[int, float]]]] #version - value
+    __reserved_shares:Optional[Tuple[int, Mapping[int, int]]] #version - value
+    __deposited_cash:Optional[Tuple[int, Mapping[int, float]]] #version - value
+
+    
     def __init__(self, account:Account) -> None:
         self.__account = account
 
+        self.__shares = None
+        self.__reserved_cash = None
+        self.__reserved_shares = None
+        self.__deposited_cash = None
+
         
     @property
     def account_id(self) -> int:
@@ -30,25 +43,37 @@ class AccountView:
 
 
     @property
-    def shares(self) -> int:
-        return self.__account.shares
+    def shares(self) -> Mapping[int, int]:
+        #Symbol -> shares
+        if self.__shares is None or self.__shares[0] != self.__account.version:
+            self.__shares = (self.__account.version, MappingProxyType(self.__account.shares.copy()))
+
+        return self.__shares[1]
 
 
     @property
-    def reserved_cash(self) -> Dict[int, Tuple[int, float]]:
-        ENV_CONFIG = get_environment_configuration()
-        
-        return {k: (v[0], v[1] / ENV_CONFIG.PRICE_SCALE) for k, v in self.__account.reserved_cash.items()}
+    def reserved_cash(self) -> Mapping[int, Tuple[int, float]]:
+        if self.__reserved_cash is None or self.__reserved_cash[0] != self.__account.version:
+            ENV_CONFIG = get_environment_configuration()
+            reserved_cash = {k: (v[0], v[1] / ENV_CONFIG.PRICE_SCALE) for k, v in self.__account.reserved_cash.items()}
+            self.__reserved_cash = (self.__account.version, MappingProxyType(reserved_cash))
+
+        return self.__reserved_cash[1]
 
 
     @property
-    def reserved_shares(self) -> Dict[int, int]:
-        return self.__account.reserved_shares.copy()
+    def reserved_shares(self) -> Mapping[int, int]:
+        if self.__reserved_shares is None or self.__reserved_shares[0] != self.__account.version:
+            self.__reserved_shares = (self.__account.version, MappingProxyType(self.__account.reserved_shares.copy()))
+
+        return self.__reserved_shares[1]
 
 
     @property
-    def deposited_cash(self) -> Dict[int, float]:
-        ENV_CONFIG = get_environment_configuration()
+    def deposited_cash(self) -> Mapping[int, float]:
+        if self.__deposited_cash is None or self.__deposited_cash[0] != self.__account.version:
+            ENV_CONFIG = get_environment_configuration()
+            deposited_cash = {k: v / ENV_CONFIG.PRICE_SCALE for k, v in self.__account.deposited_cash.items()}
+            self.__deposited_cash = (self.__account.version, MappingProxyType(deposited_cash))
 
-        return {k: v / ENV_CONFIG.PRICE_SCALE for k, v in self.__account.deposited_cash.items()}
-        
+        return self.__deposited_cash[1]
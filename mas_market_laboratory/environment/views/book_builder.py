@@ -0,0 +1,88 @@
+from __future__ import annotations
+from typing import Iterable, Optional, Tuple
+from sortedcontainers import SortedDict
+import operator
+
+from .book_event_view import BookEventView
+from .book_snapshot_view import BookSnapshotView
+
+
+
+class BookBuilder:
+    #Agent side L2 book, kept in sync with the book event feed.
+    #A sequence gap (missed publication) makes it stale until the next snapshot.
+    sequence:Optional[int]
+    bids:SortedDict[float, Tuple[int, int]] #price -> (size, #of orders)
+    asks:SortedDict[float, Tuple[int, int]] #price -> (size, #of orders)
+
+    
+    def __init__(self) -> None:
+        self.sequence = None
+        self.bids = SortedDict(operator.neg)
+        self.asks = SortedDict()
+
+
+    @property
+    def is_synced(self) -> bool:
+        return self.sequence is not None
+
+    
+    def apply_snapshot(self, snapshot:BookSnapshotView) -> None:
+        self.bids = SortedDict(operator.neg, {p: (v, c) for p, v, c in snapshot.bids})
+        self.asks = SortedDict({p: (v, c) for p, v, c in snapshot.asks})
+        self.sequence = snapshot.sequence
+
+
+    def apply_events(self, events:Iterable[BookEventView]) -> bool:
+        if self.sequence is None:
+            return False
+        
+        for event in events:
+            if event.sequence <= self.sequence: #Already part of the snapshot
+                continue
+
+            if event.sequence != self.sequence + 1:
+                self.sequence = None
+                return False
+
+            self.sequence = event.sequence
+            
+            #Enums are compared by name, the models cannot be imported from the views
+            if event.event_type.name == "CLEAR":
+                self.bids.clear()
+                self.asks.clear()
+                continue
+
+            assert event.side is not None
+            assert event.price is not None
+            levels = self.bids if event.side.name == "BUY" else self.asks
+            if event.level_count == 0:
+                levels.pop(event.price, None)
+            else:
+                levels[event.price] = (event.level_size, event.level_count)
+
+        return True
+
+
+    def get_best_bid(self) -> Optional[Tuple[float, int, int]]:
+        if not self.bids:
+            return None
+
+        price, (size, count) = self.bids.peekitem(0)
+        return price, size, count
+
+    
+    def get_best_ask(self) -> Optional[Tuple[float, int, int]]:
+        if not self.asks:
+            return None
+
+        price, (size, count) = self.asks.peekitem(0)
+        return price, size, count
+
+
+    def get_l2_bids(self) -> Tuple[Tuple[float, int, int], ...]:
+        return tuple((p, v, c) for p, (v, c) in self.bids.items())
+
+    
+    def get_l2_asks(self) -> Tuple[Tuple[float, int, int], ...]:
+        return tuple((p, v, c) for p, (v, c) in self.asks.items())
@@ -0,0 +1,22 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from environment.models.book_event import BookEventType
+    from environment.models.order import Side
+
+
+
+@dataclass(frozen=True)
+class BookEventView:
+    sequence:int
+    event_type:BookEventType
+
+    order_id:Optional[int]
+    side:Optional[Side]
+    price:Optional[float]
+    quantity:int
+
+    level_size:int
+    level_count:int
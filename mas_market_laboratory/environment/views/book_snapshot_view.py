@@ -0,0 +1,12 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Tuple
+
+
+
+@dataclass(frozen=True)
+class BookSnapshotView:
+    sequence:int
+
+    bids:Tuple[Tuple[float, int, int], ...] #For each price level = price - size - #of orders
+    asks:Tuple[Tuple[float, int, int], ...] #For each price level = price - size - #of orders
@@ -0,0 +1,42 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional
+
+from environment.configs import get_environment_configuration
+
+if TYPE_CHECKING:
+    from environment.core.depth_index import DepthIndex
+
+
+
+class DepthIndexView:
+    #Read-only window on one book side, always reflects the live book
+    def __init__(self, depth_index:DepthIndex) -> None:
+        self.__depth_index = depth_index
+
+
+    @property
+    def total_quantity(self) -> int:
+        return self.__depth_index.total_quantity
+
+
+    def depth_up_to(self, price:float) -> int:
+        ENV_CONFIG = get_environment_configuration()
+        return self.__depth_index.depth_up_to(int(price * ENV_CONFIG.PRICE_SCALE))
+
+
+    def price_for_quantity(self, quantity:int) -> Optional[float]:
+        price = self.__depth_index.price_for_quantity(quantity)
+        if price is None:
+            return None
+
+        ENV_CONFIG = get_environment_configuration()
+        return price / ENV_CONFIG.PRICE_SCALE
+
+
+    def sweep_cost(self, quantity:int) -> Optional[float]:
+        cost = self.__depth_index.sweep_cost(quantity)
+        if cost is None:
+            return None
+
+        ENV_CONFIG = get_environment_configuration()
+        return cost / ENV_CONFIG.PRICE_SCALE
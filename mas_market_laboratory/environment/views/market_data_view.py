@@ -1,34 +1,167 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Optional, Tuple
+from dataclasses import FrozenInstanceError
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+from environment.configs import get_environment_configuration
+
+if TYPE_CHECKING:
+    from environment.models import MarketData
 
 
 
-@dataclass(frozen=True)
 class MarketDataView:
-    timestamp:float
-    macro_tick:int
-    micro_tick:int
+    #Wraps the integer MarketData, each field is converted on first access and cached.
+    #Immutable, so a single instance is shared by every agent in the tick.
+    
+    def __init__(self, market_data:MarketData) -> None:
+        ENV_CONFIG = get_environment_configuration()
+
+        object.__setattr__(self, "_MarketDataView__market_data", market_data)
+        object.__setattr__(self, "_MarketDataView__price_scale", ENV_CONFIG.PRICE_SCALE)
+
+
+    def __setattr__(self, name:str, value:Any) -> None:
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+
+    def __delattr__(self, name:str) -> None:
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+
+    def __scale(self, price:Optional[int]) -> Optional[float]:
+        if price is None:
+            return None
+
+        return price / self.__price_scale
+
+    
+    @property
+    def timestamp(self) -> float:
+        return self.__market_data.timestamp
+
+
+    @property
+    def macro_tick(self) -> int:
+        return self.__market_data.macro_tick
+
+
+    @property
+    def micro_tick(self) -> int:
+        return self.__market_data.micro_tick
+
+
+    @property
+    def symbol(self) -> int:
+        return self.__market_data.symbol
+
+
+    @property
+    def book_sequence(self) -> int:
+        return self.__market_data.book_sequence
+
+
+    @property
+    def trade_count(self) -> int:
+        return self.__market_data.trade_count
+
+
+    @property
+    def trade_volume(self) -> int:
+        return self.__market_data.trade_volume
+
+
+    @cached_property
+    def last_traded_price(self) -> Optional[float]:
+        return self.__scale(self.__market_data.last_traded_price)
+
+
+    @property
+    def last_trade_size(self) -> Optional[int]:
+        return self.__market_data.last_trade_size
+
+
+    @cached_property
+    def L1_bids(self) -> Optional[Tuple[float, int, int]]:
+        L1_bids = self.__market_data.L1_bids
+        if L1_bids is None:
+            return None
+
+        return (L1_bids[0] / self.__price_scale, L1_bids[1], L1_bids[2])
+
+
+    @cached_property
+    def L1_asks(self) -> Optional[Tuple[float, int, int]]:
+        L1_asks = self.__market_data.L1_asks
+        if L1_asks is None:
+            return None
+
+        return (L1_asks[0] / self.__price_scale, L1_asks[1], L1_asks[2])
+
+
+    @cached_property
+    def spread(self) -> Optional[float]:
+        return self.__scale(self.__market_data.spread)
+
+
+    @cached_property
+    def mid_price(self) -> Optional[float]:
+        return self.__scale(self.__market_data.mid_price)
+
+
+    @cached_property
+    def micro_price(self) -> Optional[float]:
+        return self.__scale(self.__market_data.micro_price)
+
+
+    @cached_property
+    def L2_bids(self) -> Optional[Tuple[Tuple[float, int, int], ...]]:
+        L2_bids = self.__market_data.L2_bids
+        if L2_bids is None:
+            return None
+
+        return tuple((p / self.__price_scale, v, c) for p, v, c in L2_bids)
+
+
+    @cached_property
+    def L2_asks(self) -> Optional[Tuple[Tuple[float, int, int], ...]]:
+        L2_asks = self.__market_data.L2_asks
+        if L2_asks is None:
+            return None
+
+        return tuple((p / self.__price_scale, v, c) for p, v, c in L2_asks)
+
+
+    @property
+    def N(self) -> int:
+        return self.__market_data.N
+
+
+    @property
+    def bids_depth_N(self) -> int:
+        return self.__market_data.bids_depth_N
+
+
+    @property
+    def asks_depth_N(self) -> int:
+        return self.__market_data.asks_depth_N
+
 
-    trade_count:int
-    trade_volume:int
+    @property
+    def imbalance_N(self) -> Optional[float]:
+        return self.__market_data.imbalance_N
 
-    last_traded_price:Optional[float]
-    last_trade_size:Optional[int]
+    
+    @cached_property
+    def vwap_macro(self) -> Optional[float]:
+        return self.__scale(self.__market_data.vwap_macro)
 
-    L1_bids:Optional[Tuple[float, int, int]]
-    L1_asks:Optional[Tuple[float, int, int]]
 
-    spread:Optional[float]
-    mid_price:Optional[float]
-    micro_price:Optional[float]
+    @cached_property
+    def vwap_micro(self) -> Optional[float]:
+        return self.__scale(self.__market_data.vwap_micro)
 
-    L2_bids:Optional[Tuple[Tuple[float, int, int], ...]]
-    L2_asks:Optional[Tuple[Tuple[float, int, int], ...]]
 
-    N:int
-    bids_depth_N:int
-    asks_depth_N:int
-    imbalance_N:Optional[float]
-    vwap_macro:Optional[float]
-    vwap_micro:Optional[float]
+    @cached_property
+    def indicative_clearing_price(self) -> Optional[float]:
+        return self.__scale(self.__market_data.indicative_clearing_price)
@@ -0,0 +1,21 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from environment.models.order import OrderLifecycle, OrderEndReasons
+
+
+
+@dataclass(frozen=True)
+class OrderImpactView:
+    filled_quantity:int
+    notional:float
+    fees:float
+    average_price:Optional[float]
+    last_price:Optional[float]
+    levels_touched:int
+
+    remaining_quantity:int
+    lifecycle:OrderLifecycle
+    end_reason:OrderEndReasons
@@ -15,6 +15,7 @@ if TYPE_CHECKING:
 class OrderView:
     def __init__(self, order:Order) -> None:
         self.__order = order
+        self.__trades:Optional[Tuple[int, Tuple[TradeView, ...]]] = None #version - value (not a dataclass field)
 
         
     @property
@@ -26,6 +27,11 @@ class OrderView:
     def agent_id(self) -> int:
         return self.__order.agent_id
 
+
+    @property
+    def symbol(self) -> int:
+        return self.__order.symbol
+
     
     @property
     def timestamp(self) -> float:
@@ -66,6 +72,20 @@ class OrderView:
         return self.__order.price / ENV_CONFIG.PRICE_SCALE
     
 
+    @property
+    def stop_price(self) -> Optional[float]:
+        if self.__order.stop_price is None:
+            return None
+
+        ENV_CONFIG = get_environment_configuration()
+        return self.__order.stop_price / ENV_CONFIG.PRICE_SCALE
+    
+
+    @property
+    def good_till(self) -> Optional[Tuple[int, int]]:
+        return self.__order.good_till
+    
+
     @property
     def lifecycle(self) -> OrderLifecycle:
         return self.__order.lifecycle
@@ -83,8 +103,11 @@ class OrderView:
     
     @property
     def trades(self) -> Tuple[TradeView, ...]:
-        trade_views = []
-        for trade in self.__order.trades.values():
-            trade_views.append(trade.create_view())
+        if self.__trades is None or self.__trades[0] != self.__order.version:
+            trade_views = []
+            for trade in self.__order.trades.values():
+                trade_views.append(trade.create_view())
+
+            self.__trades = (self.__order.version, tuple(trade_views))
 
-        return tuple(trade_views)
+        return self.__trades[1]
@@ -6,6 +6,7 @@ from dataclasses import dataclass
 @dataclass(frozen=True)
 class TradeView:
     trade_id:int
+    symbol:int
 
     timestamp:float
     macro_tick:int
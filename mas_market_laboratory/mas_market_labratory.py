@@ -2,22 +2,49 @@ import sys
 
 from environment import Environment
 
-from simulation.core import SimulationInitializer
+from simulation.core import ReplayEngine, SimulationCheckpoint, SimulationInitializer
 
 
 
 def main():
-    if len(sys.argv) != 2:
-        print(f"Invalid Usage! Correct Usage: 'python {sys.argv[0]} [someconfig.json]'")
+    usage = (
+        f"Invalid Usage! Correct Usage: 'python {sys.argv[0]} [someconfig.json]'"
+        f" or 'python {sys.argv[0]} [someconfig.json] --replay [journal] [reference_trade_tape]'"
+        f" or 'python {sys.argv[0]} [someconfig.json] --resume [checkpoint]'"
+    )
+    
+    if len(sys.argv) < 2:
+        print(usage)
         return
 
     if sys.argv[1][-5:] != ".json":
-        print(f"Invalid Usage! Correct Usage: 'python {sys.argv[0]} [someconfig.json]'")
+        print(usage)
+        return
+
+    if len(sys.argv) == 2:
+        SimulationInitializer.INITIALIZE_CONFIGS(sys.argv[1])
+        environment = Environment()
         return
-        
 
-    SimulationInitializer.INITIALIZE_CONFIGS(sys.argv[1])
-    environment = Environment()
+    if sys.argv[2] == "--replay" and len(sys.argv) in (4, 5):
+        SimulationInitializer.INITIALIZE_CONFIGS(sys.argv[1])
+        report = ReplayEngine(sys.argv[3]).run(sys.argv[4] if len(sys.argv) == 5 else None)
+        print(
+            f"Replayed {report.event_count} events -> {report.trade_count} trades in {report.elapsed:.3f}s"
+            f" ({report.event_count / max(report.elapsed, 1e-9):.0f} events/s), trade stream matches: {report.trade_stream_matches}"
+        )
+        return
+
+    if sys.argv[2] == "--resume" and len(sys.argv) == 4:
+        SimulationInitializer.INITIALIZE_CONFIGS(sys.argv[1])
+        environment, report = SimulationCheckpoint.LOAD(sys.argv[3])
+        print(
+            f"Resumed from {report.path} at ({report.macro_tick}, {report.micro_tick})"
+            f" -> {report.size} bytes loaded in {report.elapsed:.3f}s"
+        )
+        return
+    
+    print(usage)
 
     
 if __name__ == "__main__":
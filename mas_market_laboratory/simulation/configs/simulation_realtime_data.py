@@ -65,6 +65,13 @@ class SimulationRealTimeData:
 
         return True
 
+
+    def set_hybrid_time(self, macro_tick:int, micro_tick:int) -> None:
+        assert 0 <= micro_tick < self.__simulation_micro_tick
+
+        self.__macro_tick = macro_tick
+        self.__micro_tick = micro_tick
+
     
     def set_economy_insight(self, economy_insight_view:EconomyInsightView) -> None:
         assert economy_insight_view.macro_tick == self.__macro_tick
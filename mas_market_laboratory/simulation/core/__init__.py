@@ -1,5 +1,7 @@
+from .checkpoint import CheckpointReport, SimulationCheckpoint
 from .initializer import SimulationInitializer
+from .replay_engine import ReplayEngine, ReplayReport
 
 
 
-__all__ = ["SimulationInitializer"]
+__all__ = ["CheckpointReport", "SimulationCheckpoint", "SimulationInitializer", "ReplayEngine", "ReplayReport"]
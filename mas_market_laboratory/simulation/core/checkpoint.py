@@ -0,0 +1,85 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+import pickle
+import time
+import os
+
+from environment import Environment
+
+from simulation.configs import get_simulation_realtime_data, set_simulation_realtime_data
+
+
+
+CHECKPOINT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class CheckpointReport:
+    path:str
+    macro_tick:int
+    micro_tick:int
+    size:int #bytes
+    elapsed:float #seconds
+
+
+class SimulationCheckpoint:
+    #Order book, accounts, open deposits, economy RNG and paths, id counters, realtime ticks
+    #and the storage flush position are all reachable from the Environment and the realtime data.
+    #Checkpoints are meant to be taken at macro boundaries, after StorageLedger.flush, so the
+    #pending storage state (and the checkpoint size) does not grow with the run length.
+
+    @staticmethod
+    def SAVE(environment:Environment, path:str) -> CheckpointReport:
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+
+        start = time.perf_counter()
+
+        #In memory storage has to be on disk for the flush position to mean anything
+        environment.storage_ledger.backup()
+        
+        checkpoint:Dict[str, Any] = {
+            "version": CHECKPOINT_VERSION,
+            "environment": environment,
+            "simulation_realtime_data": SIM_REALTIME_DATA
+        }
+
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, path)
+
+        return CheckpointReport(
+            path=path,
+            macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+            micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+            size=os.path.getsize(path),
+            elapsed=time.perf_counter() - start
+        )
+
+
+    @staticmethod
+    def LOAD(path:str) -> Tuple[Environment, CheckpointReport]:
+        #Configurations are not part of the checkpoint -> INITIALIZE_CONFIGS with the original config first
+        start = time.perf_counter()
+        
+        with open(path, "rb") as checkpoint_file:
+            checkpoint:Dict[str, Any] = pickle.load(checkpoint_file)
+
+        assert checkpoint["version"] == CHECKPOINT_VERSION
+
+        environment = checkpoint["environment"]
+        assert isinstance(environment, Environment)
+        
+        SIM_REALTIME_DATA = checkpoint["simulation_realtime_data"]
+        set_simulation_realtime_data(SIM_REALTIME_DATA)
+
+        return environment, CheckpointReport(
+            path=path,
+            macro_tick=SIM_REALTIME_DATA.MACRO_TICK,
+            micro_tick=SIM_REALTIME_DATA.MICRO_TICK,
+            size=os.path.getsize(path),
+            elapsed=time.perf_counter() - start
+        )
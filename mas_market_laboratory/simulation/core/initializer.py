@@ -1,10 +1,10 @@
 import json
 from typing import Any, Dict, List
 
-from environment.configs.environment_configuration import EnvironmentConfiguration, EconomyScenario
+from environment.configs.environment_configuration import EnvironmentConfiguration, EconomyScenario, MatchingMode, StorageProfile
 from environment.configs import set_environment_configuration
 from environment.views.economy_insight_view import EconomyInsightView
-from environment.views.market_data_view import MarketDataView
+from environment.models.market_data import MarketData
 
 from simulation.configs import set_simulation_configuration, set_simulation_realtime_data
 from simulation.configs.simulation_configurations import SimulationConfigurations, get_simulation_configurations 
@@ -80,20 +80,85 @@ class SimulationInitializer:
             deposit_terms=tuple(deposit_terms)
         )
 
+        symbols = environment_config["symbols"]
+        assert isinstance(symbols, List)
+        assert len(symbols) > 0
+        assert len(set(symbols)) == len(symbols)
+        assert all(isinstance(symbol, str) for symbol in symbols)
         price_scale = environment_config["price_scale"]
         assert isinstance(price_scale, int)
         db_path = environment_config["db_path"]
         assert isinstance(db_path, str)
+        storage_profile = environment_config["storage_profile"]
+        assert isinstance(storage_profile, str)
+        assert storage_profile.upper() in StorageProfile.__members__
+        trade_tape_path = environment_config["trade_tape_path"]
+        assert trade_tape_path is None or isinstance(trade_tape_path, str)
+        order_flow_journal_path = environment_config["order_flow_journal_path"]
+        assert order_flow_journal_path is None or isinstance(order_flow_journal_path, str)
         insight_l2_depth = environment_config["insight_l2_depth"]
         assert isinstance(insight_l2_depth, int)
+        book_event_feed = environment_config["book_event_feed"]
+        assert isinstance(book_event_feed, bool)
+        depth_index_bucket_width = environment_config["depth_index_bucket_width"]
+        assert isinstance(depth_index_bucket_width, float)
+        depth_index_max_price = environment_config["depth_index_max_price"]
+        assert isinstance(depth_index_max_price, float)
+        market_data_store_on_change = environment_config["market_data_store_on_change"]
+        assert isinstance(market_data_store_on_change, bool)
+        matching_mode = environment_config["matching_mode"]
+        assert isinstance(matching_mode, str)
+        assert matching_mode.upper() in MatchingMode.__members__
+        opening_auction = environment_config["opening_auction"]
+        assert isinstance(opening_auction, bool)
+        closing_auction = environment_config["closing_auction"]
+        assert isinstance(closing_auction, bool)
+        message_rate_limit = environment_config["message_rate_limit"]
+        assert message_rate_limit is None or isinstance(message_rate_limit, int)
+        message_burst_limit = environment_config["message_burst_limit"]
+        assert message_burst_limit is None or isinstance(message_burst_limit, int)
+        open_order_limit = environment_config["open_order_limit"]
+        assert open_order_limit is None or isinstance(open_order_limit, int)
+        pre_trade_funds_check = environment_config["pre_trade_funds_check"]
+        assert isinstance(pre_trade_funds_check, bool)
+        max_order_quantity = environment_config["max_order_quantity"]
+        assert max_order_quantity is None or isinstance(max_order_quantity, int)
+        max_order_notional = environment_config["max_order_notional"]
+        assert max_order_notional is None or isinstance(max_order_notional, float)
+        price_collar_ppm = environment_config["price_collar_ppm"]
+        assert price_collar_ppm is None or isinstance(price_collar_ppm, int)
+        netted_settlement = environment_config["netted_settlement"]
+        assert isinstance(netted_settlement, bool)
+        audit_interval = environment_config["audit_interval"]
+        assert audit_interval is None or isinstance(audit_interval, int)
         fee_rate_ppm = environment_config["fee_rate_ppm"]
         assert isinstance(fee_rate_ppm, int)
         
         set_environment_configuration(
             EnvironmentConfiguration(
+                SYMBOLS=tuple(symbols),
                 PRICE_SCALE=price_scale,
                 DB_PATH=db_path,
+                STORAGE_PROFILE=StorageProfile[storage_profile.upper()],
+                TRADE_TAPE_PATH=trade_tape_path,
+                ORDER_FLOW_JOURNAL_PATH=order_flow_journal_path,
                 INSIGHT_L2_DEPTH=insight_l2_depth,
+                BOOK_EVENT_FEED=book_event_feed,
+                DEPTH_INDEX_BUCKET_WIDTH=int(depth_index_bucket_width * price_scale),
+                DEPTH_INDEX_MAX_PRICE=int(depth_index_max_price * price_scale),
+                MARKET_DATA_STORE_ON_CHANGE=market_data_store_on_change,
+                MATCHING_MODE=MatchingMode[matching_mode.upper()],
+                OPENING_AUCTION=opening_auction,
+                CLOSING_AUCTION=closing_auction,
+                MESSAGE_RATE_LIMIT=message_rate_limit,
+                MESSAGE_BURST_LIMIT=message_burst_limit,
+                OPEN_ORDER_LIMIT=open_order_limit,
+                PRE_TRADE_FUNDS_CHECK=pre_trade_funds_check,
+                MAX_ORDER_QUANTITY=max_order_quantity,
+                MAX_ORDER_NOTIONAL=int(max_order_notional * price_scale) if max_order_notional is not None else None,
+                PRICE_COLLAR_PPM=price_collar_ppm,
+                NETTED_SETTLEMENT=netted_settlement,
+                AUDIT_INTERVAL=audit_interval,
                 ECONOMY_SCENARIO=scenario,
                 FEE_RATE_PPM=fee_rate_ppm
             )
@@ -130,10 +195,12 @@ class SimulationInitializer:
             tv_interval=(-1, -1),
             deposit_rates={-1: -1}
         )
-        init_market_data_view = MarketDataView(
+        init_market_data = MarketData(
             timestamp=-1,
             macro_tick=-1,
             micro_tick=-1,
+            symbol=0,
+            book_sequence=-1,
             trade_count=-1,
             trade_volume=-1,
             last_traded_price=None,
@@ -150,7 +217,8 @@ class SimulationInitializer:
             asks_depth_N=-1,
             imbalance_N=None,
             vwap_macro=None,
-            vwap_micro=None
+            vwap_micro=None,
+            indicative_clearing_price=None
         )
         
         set_simulation_realtime_data(
@@ -160,6 +228,6 @@ class SimulationInitializer:
                 simulation_macro_tick=SIM_CONFIG.SIMULATION_MACRO_TICK,
                 simulation_micro_tick=SIM_CONFIG.SIMULATION_MICRO_TICK,
                 economy_insight_view=init_econ_insight_view,
-                market_data_view=init_market_data_view
+                market_data_view=init_market_data.create_view()
             )
         )
@@ -0,0 +1,129 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import time
+
+from environment import Environment
+from environment.configs import get_environment_configuration, set_environment_configuration
+from environment.configs.models import StorageProfile
+from environment.core import OrderFlowEvent, read_order_flow_journal, read_trade_tape
+
+from simulation.configs import get_simulation_realtime_data
+
+
+
+@dataclass(frozen=True)
+class ReplayReport:
+    event_count:int
+    trade_count:int
+    elapsed:float #seconds
+    trade_stream_matches:Optional[bool] #None if there was no reference tape
+
+
+class ReplayEngine:
+    journal_path:str
+    environment:Environment
+
+    
+    def __init__(self, journal_path:str) -> None:
+        self.journal_path = journal_path
+
+        #The replay must neither record itself nor touch the original run's artifacts
+        ENV_CONFIG = get_environment_configuration()
+        set_environment_configuration(
+            ENV_CONFIG.model_copy(
+                update={
+                    "DB_PATH": ":memory:",
+                    "STORAGE_PROFILE": StorageProfile.MEMORY,
+                    "TRADE_TAPE_PATH": None,
+                    "ORDER_FLOW_JOURNAL_PATH": None
+                }
+            )
+        )
+
+        self.environment = Environment()
+
+        
+    def run(self, reference_trade_tape_path:Optional[str]=None) -> ReplayReport:
+        SIM_REALTIME_DATA = get_simulation_realtime_data()
+        environment = self.environment
+
+        events = list(read_order_flow_journal(self.journal_path))
+        
+        start = time.perf_counter()
+        
+        hybrid_time = (SIM_REALTIME_DATA.MACRO_TICK, SIM_REALTIME_DATA.MICRO_TICK)
+        for event, macro_tick, micro_tick, payload in events:
+            if hybrid_time != (macro_tick, micro_tick):
+                hybrid_time = (macro_tick, micro_tick)
+                SIM_REALTIME_DATA.set_hybrid_time(macro_tick, micro_tick)
+
+            if event == OrderFlowEvent.CREATE_ORDER:
+                environment.create_order(*payload) #type:ignore[arg-type]
+
+            elif event == OrderFlowEvent.CANCEL_ORDER:
+                environment.cancel_order(*payload) #type:ignore[arg-type]
+
+            elif event == OrderFlowEvent.AMEND_ORDER:
+                environment.amend_order(*payload) #type:ignore[arg-type]
+
+            elif event == OrderFlowEvent.CANCEL_AGENT_ORDERS:
+                agent_id, side, min_price, max_price, symbol = payload
+                if min_price is None and max_price is None:
+                    environment.cancel_all(agent_id, side, symbol) #type:ignore[arg-type]
+                else:
+                    environment.cancel_range(agent_id, side, (min_price, max_price), symbol) #type:ignore[arg-type]
+
+            elif event == OrderFlowEvent.MARKET_DATA:
+                market_data_view = environment.get_market_data(*payload) #type:ignore[arg-type]
+                if market_data_view.symbol == 0: #The realtime data carries the primary symbol
+                    SIM_REALTIME_DATA.set_market_data_view(market_data_view)
+
+            elif event == OrderFlowEvent.CREATE_DEPOSIT:
+                environment.create_deposit(*payload) #type:ignore[arg-type]
+
+            elif event == OrderFlowEvent.EXPIRE_DUE_ORDERS:
+                environment.expire_due_orders()
+
+            elif event == OrderFlowEvent.EXPIRE_SESSION:
+                environment.expire_session()
+
+            elif event == OrderFlowEvent.ECONOMY_INSIGHT:
+                SIM_REALTIME_DATA.set_economy_insight(environment.get_economy_insight())
+
+            elif event == OrderFlowEvent.MATURE_DEPOSITS:
+                environment.check_matured_deposits()
+                
+            elif event == OrderFlowEvent.REGISTER_AGENT:
+                environment.register_agent(*payload) #type:ignore[arg-type]
+
+            else:
+                assert False
+                
+        elapsed = time.perf_counter() - start
+
+        trade_stream_matches = None
+        if reference_trade_tape_path is not None:
+            trade_stream_matches = self.__compare_trade_stream(reference_trade_tape_path)
+        
+        return ReplayReport(
+            event_count=len(events),
+            trade_count=len(environment.storage_ledger.trades),
+            elapsed=elapsed,
+            trade_stream_matches=trade_stream_matches
+        )
+
+
+    def __compare_trade_stream(self, reference_trade_tape_path:str) -> bool:
+        #Timestamps are wall clock and are not compared
+        reference_tape = read_trade_tape(reference_trade_tape_path)
+        replayed_trades = sorted(self.environment.storage_ledger.trades.values(), key=lambda trade: trade.trade_id)
+
+        if len(reference_tape) != len(replayed_trades):
+            return False
+
+        fields = ("trade_id", "symbol", "macro_tick", "micro_tick", "seller_agent_id", "sell_order_id", "buyer_agent_id", "buy_order_id", "price", "quantity", "fee")
+        reference:List[Tuple[int, ...]] = list(zip(*(reference_tape[field].tolist() for field in fields)))
+        replayed:List[Tuple[int, ...]] = [tuple(getattr(trade, field) for field in fields) for trade in replayed_trades]
+
+        return reference == replayed